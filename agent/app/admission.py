@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Optional, Set
+
+from ..core.config import SETTINGS
+from ..core.metrics import METRICS
+
+SESSION_QUEUE = "queue"
+SESSION_REJECT = "reject"
+
+REJECT_QUEUE_FULL = "queue_full"
+REJECT_SESSION_BUSY = "session_busy"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after_s: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+@dataclass(eq=False)
+class Ticket:
+    session_id: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    admitted_at: Optional[float] = None
+    released: bool = False
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def admitted(self) -> bool:
+        return self.admitted_at is not None
+
+    def wait_ms(self) -> int:
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return int((end - self.enqueued_at) * 1000)
+
+
+class AdmissionController:
+    """
+    `/v1/chat/stream` 동시 실행 제어.
+
+    - 전역 동시 실행 턴 수 `max_concurrent`, 대기열 `max_queue`(가득 차면 즉시 거절 → 429)
+    - 세션당 실행 중인 턴은 1개(같은 checkpoint thread 경합 방지). 같은 세션의 추가 턴은
+      `session_policy`에 따라 대기열에 넣거나(queue) 즉시 거절(reject)
+    - 대기열은 FIFO지만, 세션이 이미 실행 중인 티켓은 건너뛰고 다음 티켓을 먼저 입장시킴
+    - 단일 이벤트 루프에서만 호출되므로 별도 lock 없이 동기 코드로 상태를 바꿉니다.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, session_policy: str = SESSION_QUEUE):
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue = max(max_queue, 0)
+        self.session_policy = session_policy if session_policy in {SESSION_QUEUE, SESSION_REJECT} else SESSION_QUEUE
+        self._active = 0
+        self._active_sessions: Set[str] = set()
+        self._session_tickets: Dict[str, int] = {}
+        self._waiters: Deque[Ticket] = deque()
+        # 턴 소요 시간 EMA(ms): 대기 예상 시간 계산용
+        self._turn_ms = 10000.0
+
+    def enter(self, session_id: str) -> Ticket:
+        """즉시 입장하거나 대기열에 등록된 티켓을 반환. 거절이면 AdmissionRejected."""
+        if self._session_tickets.get(session_id) and self.session_policy == SESSION_REJECT:
+            self._reject(REJECT_SESSION_BUSY)
+        if len(self._waiters) >= self.max_queue and not self._can_run_now(session_id):
+            self._reject(REJECT_QUEUE_FULL)
+        ticket = Ticket(session_id=session_id)
+        self._session_tickets[session_id] = self._session_tickets.get(session_id, 0) + 1
+        if self._can_run_now(session_id):
+            self._admit(ticket)
+        else:
+            self._waiters.append(ticket)
+            METRICS.inc("admission_queued_total")
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        """턴 종료(정상/에러/취소/대기 중 이탈) 시 호출. 여러 번 호출해도 안전합니다."""
+        if ticket.released:
+            return
+        ticket.released = True
+        left = self._session_tickets.get(ticket.session_id, 1) - 1
+        if left > 0:
+            self._session_tickets[ticket.session_id] = left
+        else:
+            self._session_tickets.pop(ticket.session_id, None)
+        if ticket.admitted:
+            self._active -= 1
+            self._active_sessions.discard(ticket.session_id)
+            turn_ms = (time.monotonic() - (ticket.admitted_at or ticket.enqueued_at)) * 1000
+            self._turn_ms = 0.8 * self._turn_ms + 0.2 * turn_ms
+        else:
+            try:
+                self._waiters.remove(ticket)
+            except ValueError:
+                pass
+        self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """대기열 내 1-based 순번(입장했으면 0)."""
+        if ticket.admitted:
+            return 0
+        try:
+            return self._waiters.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def estimated_wait_ms(self, position: int) -> int:
+        if position <= 0:
+            return 0
+        rounds = (position + self.max_concurrent - 1) // self.max_concurrent
+        return int(rounds * self._turn_ms)
+
+    async def wait(self, ticket: Ticket, timeout_ms: int, poll_ms: int = 1000) -> AsyncIterator[dict]:
+        """
+        입장할 때까지 대기하며, 순번이 바뀔 때마다(최소 `poll_ms` 간격으로 확인) 상태 dict를 내보냅니다.
+        `timeout_ms`(0이면 무제한)를 넘기면 AdmissionTimeout.
+        """
+        last_position = -1
+        deadline = ticket.enqueued_at + timeout_ms / 1000.0 if timeout_ms > 0 else None
+        while not ticket.admitted:
+            position = self.position(ticket)
+            if position != last_position:
+                last_position = position
+                yield {"position": position, "estimated_wait_ms": self.estimated_wait_ms(position)}
+            wait_s = poll_ms / 1000.0
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    METRICS.inc("admission_timeouts_total")
+                    raise AdmissionTimeout(f"대기열에서 {timeout_ms}ms 안에 입장하지 못했습니다.")
+                wait_s = min(wait_s, remaining)
+            try:
+                await asyncio.wait_for(ticket.event.wait(), timeout=wait_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "session_policy": self.session_policy,
+            "avg_turn_ms": int(self._turn_ms),
+        }
+
+    def _can_run_now(self, session_id: str) -> bool:
+        if self._active >= self.max_concurrent or session_id in self._active_sessions:
+            return False
+        # 같은 세션의 앞선 대기 티켓보다 먼저 입장하지 않도록(턴 순서 보장).
+        # 다른 세션의 대기 티켓은 _dispatch가 빈 슬롯마다 즉시 입장시키므로, 남아 있다면 모두 세션 대기 중입니다.
+        return not any(w.session_id == session_id for w in self._waiters)
+
+    def _admit(self, ticket: Ticket) -> None:
+        ticket.admitted_at = time.monotonic()
+        self._active += 1
+        self._active_sessions.add(ticket.session_id)
+        METRICS.inc("admission_admitted_total")
+        METRICS.observe("admission_queue_wait_ms", ticket.wait_ms())
+        ticket.event.set()
+
+    def _dispatch(self) -> None:
+        if not self._waiters:
+            return
+        blocked: Set[str] = set()
+        for ticket in list(self._waiters):
+            if self._active >= self.max_concurrent:
+                break
+            sid = ticket.session_id
+            if sid in self._active_sessions or sid in blocked:
+                blocked.add(sid)
+                continue
+            self._waiters.remove(ticket)
+            self._admit(ticket)
+
+    def _reject(self, reason: str) -> None:
+        METRICS.inc("admission_rejected_total")
+        METRICS.inc(f"admission_rejected_{reason}")
+        retry_after_s = max(int(self._turn_ms / 1000), 1)
+        raise AdmissionRejected(reason, retry_after_s)
+
+
+ADMISSION = AdmissionController(
+    max_concurrent=SETTINGS.chat_max_concurrent,
+    max_queue=SETTINGS.chat_max_queue,
+    session_policy=SETTINGS.chat_session_policy,
+)
@@ -0,0 +1,293 @@
+"""
+배치 채팅 실행(오프라인 품질/지연 회귀 테스트용). SSE 없이 GRAPH_APP을 직접 실행합니다.
+
+CLI:
+  python -m agent.app.batch --input queries.jsonl --out results.jsonl --concurrency 4 [--text]
+
+입력 jsonl 한 줄: {"user_query": "...", "session_id": "optional"}
+(session_id가 같은 항목은 입력 순서대로 순차 실행되어 멀티턴 대화로 재현됩니다.)
+
+배치는 서빙 그래프와 checkpoint를 공유하지 않도록 배치마다 별도 MemorySaver로 컴파일한 그래프를 쓰고,
+session_id는 `batch-<batch_id>-...`로 이름공간을 나눠 실제 세션과 겹치지 않게 합니다.
+서버 안에서 실행하면 항목마다 admission 티켓을 받아 채팅 턴과 같은 전역 동시 실행 한도를 씁니다.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ..core.config import SETTINGS
+from ..graph.budget import LatencyBudget, latency_budget_scope
+from ..integrations.bedrock import stream_bedrock_text
+from ..utils.sse import merge_updates
+from .admission import AdmissionController, AdmissionRejected, AdmissionTimeout
+from .startup import aget_graph_app
+
+
+def _node_timer(started: float):
+    """LangGraph debug 스트림의 task/task_result로 노드별 실제 실행 구간을 측정."""
+    starts: Dict[str, float] = {}
+    timings: List[Dict[str, Any]] = []
+
+    def on_debug(event: Any) -> None:
+        if not isinstance(event, dict):
+            return
+        payload = event.get("payload") or {}
+        task_id = payload.get("id")
+        name = payload.get("name")
+        if not task_id or not name:
+            return
+        now = time.monotonic()
+        if event.get("type") == "task":
+            starts[task_id] = now
+        elif event.get("type") == "task_result":
+            t0 = starts.pop(task_id, started)
+            timings.append(
+                {
+                    "node": name,
+                    "start_ms": int((t0 - started) * 1000),
+                    "duration_ms": int((now - t0) * 1000),
+                    "error": payload.get("error"),
+                }
+            )
+
+    return on_debug, timings
+
+
+async def isolated_graph_app() -> Any:
+    """서빙 그래프와 같은 노드 구성이지만 checkpoint(MemorySaver)를 따로 쓰는 그래프."""
+    await aget_graph_app()  # 그래프 모듈 import(최초 1회, 서빙 그래프와 공유)
+    from ..graph.shopping_graph import build_graph
+
+    return await asyncio.to_thread(build_graph)
+
+
+@asynccontextmanager
+async def _admission_slot(
+    admission: Optional[AdmissionController], session_id: str, timeout_ms: int
+) -> AsyncIterator[None]:
+    """
+    admission 티켓을 받아 입장할 때까지 기다림. 대기열이 가득 차면(429 대상) `retry_after_s`만큼 쉬고 재시도하며,
+    `timeout_ms`를 넘기면 AdmissionTimeout.
+    """
+    if admission is None:
+        yield
+        return
+    deadline = time.monotonic() + timeout_ms / 1000.0 if timeout_ms > 0 else None
+    while True:
+        try:
+            ticket = admission.enter(session_id)
+            break
+        except AdmissionRejected as e:
+            if deadline is not None and time.monotonic() + e.retry_after_s > deadline:
+                raise AdmissionTimeout(f"대기열이 가득 차 {timeout_ms}ms 안에 입장하지 못했습니다.") from None
+            await asyncio.sleep(e.retry_after_s)
+    try:
+        async for _ in admission.wait(ticket, timeout_ms):
+            pass
+        yield
+    finally:
+        admission.release(ticket)
+
+
+async def run_item(
+    user_query: str,
+    session_id: str,
+    with_text: bool = False,
+    latency_budget_ms: Optional[int] = None,
+    graph_app: Any = None,
+) -> Dict[str, Any]:
+    """한 건을 그래프로 실행하고 구조화된 결과(추천 코드, 노드별 시간, 선택적으로 composer 텍스트)를 반환."""
+    started = time.monotonic()
+    budget_ms = SETTINGS.latency_budget_ms if latency_budget_ms is None else latency_budget_ms
+    budget = LatencyBudget(total_ms=max(int(budget_ms), 0))
+    config = {"configurable": {"thread_id": session_id}}
+    state: Dict[str, Any] = {}
+    on_debug, timings = _node_timer(started)
+    result: Dict[str, Any] = {"session_id": session_id, "user_query": user_query, "ok": True}
+
+    if graph_app is None:
+        graph_app = await isolated_graph_app()
+    try:
+        with latency_budget_scope(budget):
+            async for mode, step in graph_app.astream(
+                {"user_query": user_query}, config=config, stream_mode=["updates", "debug"]
+            ):
+                if mode == "debug":
+                    on_debug(step)
+                    continue
+                if not isinstance(step, dict):
+                    continue
+                for node_name, node_update in step.items():
+                    if isinstance(node_update, dict):
+                        merge_updates(state, node_update)
+                    else:
+                        state[node_name] = node_update
+    except Exception as e:
+        result.update({"ok": False, "error": str(e), "error_type": type(e).__name__})
+
+    graph_ms = int((time.monotonic() - started) * 1000)
+    api_response = state.get("api_response") if isinstance(state.get("api_response"), dict) else {}
+
+    if with_text and result["ok"]:
+        prompt = api_response.get("composer_prompt")
+        if isinstance(prompt, str) and prompt.strip():
+            t0 = time.monotonic()
+            parts: List[str] = []
+            try:
+                async for delta in stream_bedrock_text(prompt):
+                    if not parts:
+                        result["composer_first_token_ms"] = int((time.monotonic() - t0) * 1000)
+                    parts.append(delta)
+            except Exception as e:
+                result["text_error"] = f"{type(e).__name__}: {e}"
+            text = "".join(parts)
+            result["text"] = text
+            result["composer_ms"] = int((time.monotonic() - t0) * 1000)
+            if text:
+                # 같은 세션의 다음 항목이 멀티턴 히스토리를 보도록 assistant 메시지 반영(chat_stream과 동일)
+                messages = list(state.get("messages", []))
+                messages.append({"role": "assistant", "content": text})
+                try:
+                    await graph_app.aupdate_state(
+                        config, {"messages": messages, "llm_text": text, "final_response": text}
+                    )
+                except Exception:
+                    pass
+
+    structured = state.get("structured_data")
+    result.update(
+        {
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+            "graph_ms": graph_ms,
+            "node_timings": sorted(timings, key=lambda t: t["start_ms"]),
+            "structured_rows": len(structured) if isinstance(structured, list) else 0,
+            "structured_fallback_used": state.get("structured_fallback_used", False),
+            "review_style_codes": state.get("unstructured_style_codes", []),
+            "recommended_style_codes": api_response.get("recommended_style_codes", []),
+            "recommended_products_count": len(api_response.get("recommended_products", []) or []),
+            "degradations": list(budget.degradations),
+        }
+    )
+    return result
+
+
+async def run_batch(
+    items: List[Dict[str, Any]],
+    concurrency: int,
+    with_text: bool = False,
+    latency_budget_ms: Optional[int] = None,
+    admission: Optional[AdmissionController] = None,
+) -> List[Dict[str, Any]]:
+    """
+    `items`를 최대 `concurrency`개씩 동시에 실행합니다(결과는 입력 순서).
+
+    session_id가 같은 항목은 같은 checkpoint thread를 공유하므로 입력 순서대로 순차 실행합니다.
+    session_id가 없으면 항목마다 새 세션을 씁니다. 세션은 모두 `batch-<batch_id>-` 접두어로 격리됩니다.
+    `admission`을 주면 항목마다 티켓을 받아 실행(서버의 전역 동시 실행 한도/세션당 1턴 규칙을 따름).
+    """
+    batch_id = uuid.uuid4().hex[:8]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    by_session: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        sid = f"batch-{batch_id}-{item.get('session_id') or i}"
+        by_session.setdefault(sid, []).append(i)
+
+    sem = asyncio.Semaphore(max(concurrency, 1))
+    graph_app = await isolated_graph_app()
+
+    async def run_session(sid: str, indices: List[int]) -> None:
+        for i in indices:
+            user_query = str(items[i].get("user_query") or "")
+            async with sem:
+                try:
+                    async with _admission_slot(admission, sid, SETTINGS.chat_queue_timeout_ms):
+                        res = await run_item(
+                            user_query,
+                            sid,
+                            with_text=with_text,
+                            latency_budget_ms=latency_budget_ms,
+                            graph_app=graph_app,
+                        )
+                except AdmissionTimeout as e:
+                    res = {
+                        "session_id": sid,
+                        "user_query": user_query,
+                        "ok": False,
+                        "error": str(e),
+                        "error_type": type(e).__name__,
+                    }
+            results[i] = {"index": i, **res}
+
+    await asyncio.gather(*(run_session(sid, idx) for sid, idx in by_session.items()))
+    return [r for r in results if r is not None]
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """배치 전체 요약: 성공/실패 수, elapsed p50/p95, 노드별 평균/최대 시간."""
+    elapsed = sorted(r.get("elapsed_ms", 0) for r in results)
+
+    def pct(q: float) -> int:
+        if not elapsed:
+            return 0
+        return elapsed[min(int(q * len(elapsed)), len(elapsed) - 1)]
+
+    nodes: Dict[str, Dict[str, float]] = {}
+    for r in results:
+        for t in r.get("node_timings", []):
+            n = nodes.setdefault(t["node"], {"count": 0, "sum_ms": 0, "max_ms": 0})
+            n["count"] += 1
+            n["sum_ms"] += t["duration_ms"]
+            n["max_ms"] = max(n["max_ms"], t["duration_ms"])
+    return {
+        "count": len(results),
+        "ok": sum(1 for r in results if r.get("ok")),
+        "failed": sum(1 for r in results if not r.get("ok")),
+        "elapsed_ms_p50": pct(0.5),
+        "elapsed_ms_p95": pct(0.95),
+        "nodes": {
+            name: {"avg_ms": int(n["sum_ms"] / n["count"]), "max_ms": int(n["max_ms"]), "count": int(n["count"])}
+            for name, n in nodes.items()
+        },
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", required=True, help='jsonl: {"user_query": "...", "session_id": "optional"}')
+    p.add_argument("--out", default="", help="결과 jsonl 경로(미지정 시 stdout)")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--text", action="store_true", help="composer 텍스트까지 생성(Bedrock 호출)")
+    p.add_argument("--latency-budget-ms", type=int, default=None)
+    args = p.parse_args()
+
+    items: List[Dict[str, Any]] = []
+    with Path(args.input).open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                items.append(json.loads(line))
+
+    results = asyncio.run(
+        run_batch(items, args.concurrency, with_text=args.text, latency_budget_ms=args.latency_budget_ms)
+    )
+    lines = [json.dumps(r, ensure_ascii=False) for r in results]
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
+    else:
+        for line in lines:
+            print(line)
+    print(json.dumps({"summary": summarize(results)}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
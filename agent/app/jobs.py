@@ -0,0 +1,702 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..core.config import SETTINGS
+from ..core.metrics import METRICS
+from ..core.storage import ensure_dir, get_data_dir, utc_now_iso
+from ..utils.sse import dumps_json
+
+logger = logging.getLogger("uvicorn.error")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+JOB_CANCELLED = "cancelled"
+FINAL_STATUSES = {JOB_DONE, JOB_ERROR, JOB_CANCELLED}
+
+_TRIAL_RE = re.compile(r"Trial\s+(\d+)\s*/\s*(\d+)")
+_STEP_RE = re.compile(r"==>\s*STEP\s*(\d+)")
+_BUDGET_RE = re.compile(r"\[budget\]\s+(\{.*\})")
+
+# 진행률/로그 tail 계산 시 로그 파일 끝에서 읽는 최대 바이트
+_LOG_TAIL_BYTES = 256 * 1024
+
+
+def _parse_progress(line: str, progress: dict) -> bool:
+    """compile 로그의 `Trial n / m`, `==> STEP n`, `[budget] {...}` 줄을 progress에 반영. 값이 바뀌면 True."""
+    before = dict(progress)
+    m = _TRIAL_RE.search(line)
+    if m:
+        progress["trial"] = int(m.group(1))
+        progress["trial_total"] = int(m.group(2))
+    m2 = _STEP_RE.search(line)
+    if m2:
+        progress["step"] = int(m2.group(1))
+    m3 = _BUDGET_RE.search(line)
+    if m3:
+        try:
+            progress["budget"] = json.loads(m3.group(1))
+        except ValueError:
+            pass
+    return progress != before
+
+
+def jobs_dir() -> Path:
+    return get_data_dir() / "jobs"
+
+
+@dataclass
+class JobRecord:
+    job_id: str
+    kind: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = JOB_QUEUED
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    pid: Optional[int] = None
+    created_at: str = field(default_factory=utc_now_iso)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    updated_at: str = field(default_factory=utc_now_iso)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "JobRecord":
+        known = {k: data[k] for k in cls.__dataclass_fields__ if k in data}
+        return cls(**known)
+
+
+# --- worker process 쪽 ---------------------------------------------------------
+
+
+def _task_build_datasets(params: Dict[str, Any]) -> dict:
+    from ..train.build_dataset import build_datasets
+
+    return build_datasets(
+        chat_log=Path(params["chat_log"]),
+        feedback_log=Path(params["feedback_log"]),
+        out_ranker=Path(params["out_ranker"]),
+        out_relax=Path(params["out_relax"]),
+        out_fusion=Path(params["out_fusion"]),
+        full=bool(params.get("full", False)),
+    )
+
+
+def _task_compile(params: Dict[str, Any]) -> dict:
+    # dspy/학습 모듈은 무거워서 worker process 안에서만 불러옵니다.
+    from ..train.compile import COMPILERS, compile_module
+    from ..train.lm import compile_budget, compile_lm_stats, configure_compile_lm
+
+    module = params["module"]
+    ds = Path(params["dataset"])
+    out = Path(params["out"])
+    if module not in COMPILERS:
+        raise ValueError("invalid module")
+    configure_compile_lm(model=SETTINGS.dspy_model, cache_mode=params.get("lm_cache_mode"))
+    print(f"[compile] module={module} dataset={ds} out={out}", flush=True)
+    result = compile_module(
+        module,
+        ds,
+        out,
+        num_threads=params.get("num_threads"),
+        incremental=bool(params.get("incremental")),
+        budget=compile_budget(params.get("max_lm_calls"), params.get("max_tokens"), params.get("max_seconds")),
+    )
+    return {"module": module, **result, "lm": compile_lm_stats()}
+
+
+def _task_compile_all(params: Dict[str, Any]) -> dict:
+    from ..train.compile import compile_all, default_paths
+    from ..train.lm import compile_budget, configure_compile_lm
+
+    # targets에 없는 모듈은 기본 (dataset, artifact) 경로
+    overrides = params.get("targets") or {}
+    targets = {
+        m: (Path(overrides[m]["dataset"]), Path(overrides[m]["out"])) if m in overrides else default_paths(m)
+        for m in params["modules"]
+    }
+    configure_compile_lm(model=SETTINGS.dspy_model, cache_mode=params.get("lm_cache_mode"))
+    return compile_all(
+        targets,
+        parallel=bool(params.get("parallel", True)),
+        num_threads=params.get("num_threads"),
+        incremental=bool(params.get("incremental")),
+        budget=compile_budget(params.get("max_lm_calls"), params.get("max_tokens"), params.get("max_seconds")),
+    )
+
+
+def _task_evaluate(params: Dict[str, Any]) -> dict:
+    from ..train.compile import default_paths
+    from ..train.evaluate import compare, evaluate
+    from ..train.lm import configure_compile_lm
+
+    module = params["module"]
+    default_dataset, default_artifact = default_paths(module)
+    dataset = Path(params["dataset"]) if params.get("dataset") else default_dataset
+    # artifact 미지정이면 서버가 로드하는 artifact, ""면 artifact 미적용 프로그램
+    artifact = str(default_artifact) if params.get("artifact") is None else params["artifact"]
+    options = {
+        "k": int(params.get("k") or 10),
+        "num_threads": params.get("num_threads"),
+        "limit": params.get("limit"),
+        "include_trained": bool(params.get("include_trained")),
+    }
+    configure_compile_lm(
+        model=SETTINGS.dspy_model,
+        cache_mode=params.get("lm_cache_mode") or SETTINGS.eval_lm_cache_mode,
+        dspy_cache=False,
+    )
+    if params.get("baseline") is not None:
+        return compare(
+            module,
+            dataset,
+            baseline=params["baseline"],
+            candidate=artifact,
+            tolerance=float(params.get("tolerance", 0.01)),
+            **options,
+        )
+    return evaluate(module, dataset, artifact, **options)
+
+
+def _task_chat_batch(params: Dict[str, Any]) -> dict:
+    # 서버 프로세스 밖에서 실행하므로 서버 admission/checkpoint와 무관(동시 실행 수는 concurrency로 제한)
+    from .batch import run_batch, summarize
+
+    results = asyncio.run(
+        run_batch(
+            params["items"],
+            int(params["concurrency"]),
+            with_text=bool(params.get("with_text")),
+            latency_budget_ms=params.get("latency_budget_ms"),
+        )
+    )
+    return {"concurrency": params["concurrency"], "summary": summarize(results), "results": results}
+
+
+_TASKS: Dict[str, Callable[[Dict[str, Any]], dict]] = {
+    "build_datasets": _task_build_datasets,
+    "compile": _task_compile,
+    "compile_all": _task_compile_all,
+    "evaluate": _task_evaluate,
+    "chat_batch": _task_chat_batch,
+}
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _worker_main(kind: str, params: Dict[str, Any], job_dir: str) -> None:
+    """
+    worker process 진입점(spawn).
+
+    stdout/stderr(fd 1/2 포함)와 root logging을 job의 `log.txt`로 돌리므로,
+    C 확장/하위 라이브러리 출력까지 job 로그에 남고 서버 프로세스의 stdout은 건드리지 않습니다.
+    """
+    root = Path(job_dir)
+    log_fd = os.open(root / "log.txt", os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    os.dup2(log_fd, 1)
+    os.dup2(log_fd, 2)
+    os.close(log_fd)
+    sys.stdout = sys.stderr = open(1, "w", encoding="utf-8", buffering=1, closefd=False)
+    logging.basicConfig(
+        level=logging.INFO, stream=sys.stdout, format="%(asctime)s %(levelname)s %(name)s: %(message)s", force=True
+    )
+    try:
+        result = _TASKS[kind](params)
+        _write_json(root / "result.json", {"ok": True, "result": result})
+    except BaseException as e:
+        traceback.print_exc()
+        _write_json(root / "result.json", {"ok": False, "error": f"{type(e).__name__}: {e}"})
+        sys.stdout.flush()
+        os._exit(1)
+    sys.stdout.flush()
+
+
+# --- server 쪽 -----------------------------------------------------------------
+
+
+class JobManager:
+    """
+    admin 데이터셋 빌드/compile/평가, 대용량 채팅 배치 job 실행기.
+
+    - job 하나당 spawn된 worker process 하나(서버 이벤트 루프/GIL과 분리). 동시에 최대 `max_workers`개,
+      나머지는 FIFO 대기
+    - 상태는 `<AGENT_DATA_DIR>/jobs/<job_id>/state.json`, 출력은 같은 폴더의 `log.txt`에 저장되어 재시작 후에도 조회 가능
+      (재시작 시 queued/running이던 job은 error로 정리)
+    - 취소: 대기 중이면 바로 cancelled, 실행 중이면 SIGTERM 후 `cancel_grace_s` 뒤 SIGKILL
+    - 끝난 job은 `ttl_s`가 지나거나 `keep`개를 넘으면 오래된 것부터 폴더째 삭제
+    - 단일 이벤트 루프에서만 호출되므로 별도 lock 없이 상태를 바꿉니다.
+    """
+
+    def __init__(self, root: Path, max_workers: int, keep: int, ttl_s: float, cancel_grace_s: float):
+        self.root = root
+        self.max_workers = max(max_workers, 1)
+        self.keep = max(keep, 1)
+        self.ttl_s = max(ttl_s, 0.0)
+        self.cancel_grace_s = max(cancel_grace_s, 0.0)
+        self._jobs: "OrderedDict[str, JobRecord]" = OrderedDict()
+        self._pending: Deque[str] = deque()
+        self._procs: Dict[str, Any] = {}
+        self._after: Dict[str, Callable[[dict], dict]] = {}
+        self._cancel_requested: set[str] = set()
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._feeds: Dict[str, "JobFeed"] = {}
+        # worker 종료를 기다리는 _watch task(GC 방지 + 종료 시 정리용)
+        self._watchers: set[asyncio.Task] = set()
+        self._loaded = False
+
+    # 조회 ----------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        self._load()
+        return self._jobs.get(job_id)
+
+    def list(self, limit: int = 50) -> List[JobRecord]:
+        self._load()
+        return list(reversed(self._jobs.values()))[: max(limit, 0)]
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def log_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "log.txt"
+
+    def log_tail(self, job_id: str, lines: int = 120) -> List[str]:
+        """`log.txt` 끝부분의 마지막 `lines`줄."""
+        path = self.log_path(job_id)
+        if not path.exists():
+            return []
+        with path.open("rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(size - _LOG_TAIL_BYTES, 0))
+            data = f.read()
+        text = data.decode("utf-8", errors="replace").splitlines()
+        if size > _LOG_TAIL_BYTES and text:
+            text = text[1:]  # 잘린 첫 줄
+        return text[-lines:] if lines > 0 else []
+
+    def progress(self, job_id: str) -> dict:
+        """compile 로그의 `Trial n / m`, `==> STEP n` 줄로 진행 상황을 추정."""
+        progress: dict = {}
+        for line in self.log_tail(job_id, lines=5000):
+            _parse_progress(line, progress)
+        return progress
+
+    def feed(self, job_id: str) -> Optional["JobFeed"]:
+        """job 로그/진행률 SSE feed(시청자 수와 무관하게 job당 하나)."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        feed = self._feeds.get(job_id)
+        if feed is None:
+            feed = JobFeed(self, job, SETTINGS.job_stream_buffer_lines, SETTINGS.job_stream_poll_ms / 1000.0)
+            self._feeds[job_id] = feed
+        return feed
+
+    def snapshot(self) -> dict:
+        self._load()
+        return {
+            "running": len(self._procs),
+            "queued": len(self._pending),
+            "total": len(self._jobs),
+            "max_workers": self.max_workers,
+        }
+
+    # 실행/취소 -----------------------------------------------------------------
+
+    def submit(
+        self, kind: str, params: Dict[str, Any], after: Optional[Callable[[dict], dict]] = None
+    ) -> JobRecord:
+        """
+        job을 등록하고 빈 worker가 있으면 바로 시작합니다.
+        `after`는 성공 시 서버 프로세스에서(워커 스레드로) 결과를 받아 후처리(예: artifact reload)합니다.
+        """
+        if kind not in _TASKS:
+            raise ValueError(f"unknown job kind: {kind}")
+        self._load()
+        job = JobRecord(job_id=str(uuid.uuid4()), kind=kind, params=dict(params))
+        ensure_dir(self.job_dir(job.job_id))
+        self._jobs[job.job_id] = job
+        self._finished[job.job_id] = asyncio.Event()
+        if after is not None:
+            self._after[job.job_id] = after
+        self._pending.append(job.job_id)
+        self._save(job)
+        METRICS.inc(f"jobs_submitted_{kind}")
+        self._dispatch()
+        return job
+
+    async def wait(self, job_id: str) -> JobRecord:
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        event = self._finished.get(job_id)
+        if event is not None and not job.done:
+            await event.wait()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[JobRecord]:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == JOB_QUEUED:
+            try:
+                self._pending.remove(job_id)
+            except ValueError:
+                pass
+            self._finish(job, JOB_CANCELLED, error="cancelled")
+            return job
+        proc = self._procs.get(job_id)
+        if proc is not None and job_id not in self._cancel_requested:
+            self._cancel_requested.add(job_id)
+            proc.terminate()
+            if self.cancel_grace_s > 0:
+                asyncio.get_running_loop().call_later(self.cancel_grace_s, self._kill, job_id)
+            else:
+                self._kill(job_id)
+        return job
+
+    async def shutdown(self) -> None:
+        """서버 종료 시 실행 중인 worker를 정리(남은 job은 다음 시작 때 error로 기록됨)."""
+        for job_id in list(self._procs):
+            self.cancel(job_id)
+        procs = list(self._procs.values())
+        if procs:
+            await asyncio.to_thread(lambda: [p.join(self.cancel_grace_s + 1) for p in procs])
+        # worker가 끝났으면 _watch도 곧 끝남. 그래도 남은 것(join이 안 끝난 worker 등)은 취소
+        watchers = list(self._watchers)
+        if watchers:
+            _, pending = await asyncio.wait(watchers, timeout=1.0)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+
+    # 내부 ----------------------------------------------------------------------
+
+    def _dispatch(self) -> None:
+        while self._pending and len(self._procs) < self.max_workers:
+            job_id = self._pending.popleft()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != JOB_QUEUED:
+                continue
+            ctx = multiprocessing.get_context("spawn")
+            proc = ctx.Process(
+                target=_worker_main,
+                args=(job.kind, job.params, str(self.job_dir(job_id))),
+                name=f"job-{job.kind}-{job_id[:8]}",
+            )
+            try:
+                proc.start()
+            except Exception as e:
+                self._finish(job, JOB_ERROR, error=f"failed to start worker: {e}")
+                continue
+            self._procs[job_id] = proc
+            job.status = JOB_RUNNING
+            job.pid = proc.pid
+            job.started_at = utc_now_iso()
+            self._save(job)
+            watcher = asyncio.create_task(self._watch(job_id, proc))
+            self._watchers.add(watcher)
+            watcher.add_done_callback(self._watch_done)
+
+    def _watch_done(self, task: asyncio.Task) -> None:
+        self._watchers.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("job watcher failed", exc_info=task.exception())
+
+    async def _watch(self, job_id: str, proc: Any) -> None:
+        t0 = time.monotonic()
+        await asyncio.to_thread(proc.join)
+        self._procs.pop(job_id, None)
+        job = self._jobs[job_id]
+        METRICS.observe(f"jobs_{job.kind}_ms", (time.monotonic() - t0) * 1000)
+        try:
+            if job_id in self._cancel_requested:
+                self._cancel_requested.discard(job_id)
+                self._finish(job, JOB_CANCELLED, error="cancelled")
+                return
+            outcome = self._read_outcome(job_id)
+            if outcome is None:
+                self._finish(job, JOB_ERROR, error=f"worker exited with code {proc.exitcode}")
+            elif not outcome.get("ok"):
+                self._finish(job, JOB_ERROR, error=str(outcome.get("error")))
+            else:
+                result = outcome.get("result")
+                after = self._after.pop(job_id, None)
+                if after is not None:
+                    try:
+                        result = await asyncio.to_thread(after, result)
+                    except Exception as e:
+                        self._finish(job, JOB_ERROR, error=f"post-processing failed: {e}", result=result)
+                        return
+                self._finish(job, JOB_DONE, result=result)
+        finally:
+            self._dispatch()
+
+    def _kill(self, job_id: str) -> None:
+        proc = self._procs.get(job_id)
+        if proc is not None and proc.is_alive():
+            proc.kill()
+
+    def _read_outcome(self, job_id: str) -> Optional[dict]:
+        path = self.job_dir(job_id) / "result.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+
+    def _finish(self, job: JobRecord, status: str, error: Optional[str] = None, result: Optional[dict] = None) -> None:
+        job.status = status
+        job.error = error
+        job.result = result
+        job.finished_at = utc_now_iso()
+        self._after.pop(job.job_id, None)
+        self._save(job)
+        METRICS.inc(f"jobs_{status}_total")
+        event = self._finished.pop(job.job_id, None)
+        if event is not None:
+            event.set()
+        self._evict()
+
+    def _save(self, job: JobRecord) -> None:
+        job.updated_at = utc_now_iso()
+        try:
+            ensure_dir(self.job_dir(job.job_id))
+            _write_json(self.job_dir(job.job_id) / "state.json", asdict(job))
+        except Exception as e:
+            logger.warning("failed to persist job %s: %s", job.job_id, e)
+
+    def _load(self) -> None:
+        """처음 접근할 때 디스크의 job을 읽어옵니다(이전 프로세스에서 끝나지 못한 job은 error 처리)."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.root.exists():
+            return
+        loaded: List[JobRecord] = []
+        for state in self.root.glob("*/state.json"):
+            try:
+                job = JobRecord.from_dict(json.loads(state.read_text(encoding="utf-8")))
+            except Exception:
+                continue
+            if not job.done:
+                job.status = JOB_ERROR
+                job.error = "interrupted by server restart"
+                job.finished_at = job.finished_at or utc_now_iso()
+                self._save(job)
+            loaded.append(job)
+        for job in sorted(loaded, key=lambda j: j.created_at):
+            self._jobs[job.job_id] = job
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.done]
+        drop: List[str] = []
+        if self.ttl_s > 0:
+            for job in finished:
+                try:
+                    age = now - datetime.fromisoformat(job.finished_at or job.updated_at).timestamp()
+                except ValueError:
+                    age = 0.0
+                if age > self.ttl_s:
+                    drop.append(job.job_id)
+        excess = len(finished) - len(drop) - self.keep
+        if excess > 0:
+            for job in finished:
+                if excess <= 0:
+                    break
+                if job.job_id not in drop:
+                    drop.append(job.job_id)
+                    excess -= 1
+        for job_id in drop:
+            self._jobs.pop(job_id, None)
+            self._feeds.pop(job_id, None)
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if drop:
+            METRICS.inc("jobs_evicted_total", len(drop))
+
+
+def _frame(event: str, data: Dict[str, Any], offset: Optional[int] = None) -> bytes:
+    id_line = f"id: {offset}\n".encode("utf-8") if offset is not None else b""
+    return id_line + b"event: " + event.encode("utf-8") + b"\ndata: " + dumps_json(data) + b"\n\n"
+
+
+class JobFeed:
+    """
+    job 하나의 로그/진행률 SSE feed.
+
+    - poll task 하나가 `log.txt`에서 새로 추가된 완성 줄만 읽어 `log` 프레임으로 한 번 인코딩하고,
+      진행률(trial/step)이나 상태가 바뀌면 `progress`/`status` 프레임을 추가
+    - 최근 프레임은 공유 ring buffer에 보관하고, 시청자는 각자 커서(seq)만 들고 같은 bytes를 읽음
+    - SSE 이벤트 id는 그 줄까지의 로그 바이트 오프셋. 재연결 시 그 오프셋 이후 줄부터 이어 받고,
+      buffer에서 밀려난 구간은 해당 시청자만 디스크에서 직접 읽음
+    - 시청자가 없으면 poll을 멈추고, job이 끝나면 남은 로그까지 읽은 뒤 `done`을 보내고 종료
+    """
+
+    def __init__(self, manager: JobManager, job: JobRecord, max_frames: int, poll_s: float):
+        self.manager = manager
+        self.job = job
+        self.log_path = manager.log_path(job.job_id)
+        self.poll_s = max(poll_s, 0.05)
+        self.offset = 0
+        self.progress: dict = {}
+        self.finished = False
+        self._status = job.status
+        # (seq, 로그 오프셋, frame)
+        self._frames: Deque[Tuple[int, int, bytes]] = deque(maxlen=max(max_frames, 1))
+        self._next_seq = 1
+        self._floor = 0  # buffer에 남은 가장 앞 log 프레임 직전까지의 오프셋
+        self._loaded = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[bytes]:
+        """`after` 바이트 오프셋 이후의 로그부터 job이 끝날 때까지 프레임을 내보냅니다."""
+        self._subscribers += 1
+        self._ensure_running()
+        try:
+            await self._loaded.wait()
+            yield _frame(
+                "snapshot",
+                {
+                    "job_id": self.job.job_id,
+                    "status": self.job.status,
+                    "progress": dict(self.progress),
+                    "offset": self.offset,
+                },
+            )
+            after = max(int(after), 0)
+            if after < self._floor:
+                # buffer에서 밀려난 구간: 이 시청자만 디스크에서 읽음
+                for end, line in await asyncio.to_thread(_read_lines, self.log_path, after, self._floor):
+                    yield _frame("log", {"line": line}, end)
+                after = self._floor
+            cursor = self._seek(after)
+            while True:
+                changed = self._changed
+                oldest = self._frames[0][0] if self._frames else self._next_seq
+                if cursor + 1 < oldest:
+                    # 느린 시청자가 buffer를 놓친 경우: 빠진 로그를 디스크에서 보충
+                    for end, line in await asyncio.to_thread(_read_lines, self.log_path, after, self._floor):
+                        yield _frame("log", {"line": line}, end)
+                    after = max(after, self._floor)
+                    cursor = self._seek(after)
+                for seq, end, frame in list(islice(self._frames, max(cursor + 1 - oldest, 0), None)):
+                    cursor = seq
+                    after = end
+                    yield frame
+                if self.finished and cursor >= self._next_seq - 1:
+                    yield _frame(
+                        "done",
+                        {
+                            "job_id": self.job.job_id,
+                            "status": self.job.status,
+                            "result": self.job.result,
+                            "error": self.job.error,
+                        },
+                        self.offset,
+                    )
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=SETTINGS.job_stream_ping_s)
+                except asyncio.TimeoutError:
+                    # 프록시 idle timeout 방지용 comment
+                    yield b": ping\n\n"
+        finally:
+            self._subscribers -= 1
+            if self._subscribers <= 0 and (self.finished or self._task is None or self._task.done()):
+                self.manager._feeds.pop(self.job.job_id, None)
+
+    def _seek(self, after: int) -> int:
+        """오프셋 `after` 이후 첫 프레임 직전의 seq(같은 오프셋의 progress/status는 snapshot으로 대신함)."""
+        return next((seq - 1 for seq, end, _ in self._frames if end > after), self._next_seq - 1)
+
+    def _ensure_running(self) -> None:
+        if self.finished or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            done_before_read = self.job.done
+            lines = await asyncio.to_thread(_read_lines, self.log_path, self.offset, None)
+            for end, line in lines:
+                self._append(end, _frame("log", {"line": line}, end))
+                if _parse_progress(line, self.progress):
+                    self._append(end, _frame("progress", dict(self.progress), end))
+                self.offset = end
+            if self.job.status != self._status:
+                self._status = self.job.status
+                self._append(self.offset, _frame("status", {"status": self._status}, self.offset))
+            # job이 끝난 뒤의 읽기까지 반영했으면 더 쓰일 로그가 없음
+            self.finished = done_before_read
+            self._loaded.set()
+            self._notify()
+            if self.finished or self._subscribers <= 0:
+                if self._subscribers <= 0:
+                    self.manager._feeds.pop(self.job.job_id, None)
+                return
+            await asyncio.sleep(self.poll_s)
+
+    def _append(self, end: int, frame: bytes) -> None:
+        if len(self._frames) == self._frames.maxlen:
+            self._floor = self._frames[0][1]
+        self._frames.append((self._next_seq, end, frame))
+        self._next_seq += 1
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+def _read_lines(path: Path, start: int, end: Optional[int]) -> List[Tuple[int, str]]:
+    """[start, end) 구간의 완성 줄을 (줄 끝 오프셋, 텍스트)로. 개행으로 끝나지 않은 마지막 줄은 제외."""
+    if not path.exists():
+        return []
+    with path.open("rb") as f:
+        f.seek(start)
+        data = f.read() if end is None else f.read(max(end - start, 0))
+    cut = data.rfind(b"\n")
+    if cut == -1:
+        return []
+    out: List[Tuple[int, str]] = []
+    pos = start
+    for raw in data[: cut + 1].splitlines(keepends=True):
+        pos += len(raw)
+        out.append((pos, raw.rstrip(b"\r\n").decode("utf-8", errors="replace")))
+    return out
+
+
+JOBS = JobManager(
+    root=jobs_dir(),
+    max_workers=SETTINGS.job_max_workers,
+    keep=SETTINGS.job_keep,
+    ttl_s=SETTINGS.job_ttl_s,
+    cancel_grace_s=SETTINGS.job_cancel_grace_s,
+)
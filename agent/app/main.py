@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import time
+from contextlib import asynccontextmanager, suppress
+
+_IMPORT_T0 = time.perf_counter()
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 
+from ..core.analytics import chat_analytics
 from ..core.config import SETTINGS
+from ..core.log_writer import LOG_WRITER
+from .jobs import JOBS
 from .routes_admin import router as admin_router
 from .routes_chat import router as chat_router
+from .startup import STARTUP, warm_up
 
 # Use uvicorn's logger so it shows up in container logs by default.
 logger = logging.getLogger("uvicorn.error")
@@ -18,8 +26,38 @@ API_DEBUG = os.getenv("API_DEBUG", "").strip().lower() == "true"
 API_DEBUG_BODY = os.getenv("API_DEBUG_BODY", "").strip().lower() == "true"
 MAX_BODY_LOG = int(os.getenv("API_DEBUG_MAX_BODY", "2000") or "2000")
 
+async def _refresh_analytics() -> None:
+    try:
+        await asyncio.to_thread(chat_analytics().refresh)
+    except Exception:
+        logger.exception("analytics catch-up refresh failed")
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    LOG_WRITER.start()
+    # 무거운 초기화는 백그라운드로: /health는 바로 응답하고, /ready는 warm-up이 끝나야 200
+    warm_task = asyncio.create_task(warm_up()) if STARTUP.warmup_enabled else None
+    # analytics 집계가 밀려 있으면(첫 실행/재시작) 첫 /admin/analytics 요청 전에 백그라운드로 따라잡기
+    analytics_task = asyncio.create_task(_refresh_analytics())
+    try:
+        yield
+    finally:
+        if warm_task is not None and not warm_task.done():
+            warm_task.cancel()
+        # 스레드에서 도는 refresh 자체는 멈출 수 없으므로 task만 취소하고 정리를 기다림
+        if not analytics_task.done():
+            analytics_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await analytics_task
+        # 실행 중인 admin job worker 정리
+        await JOBS.shutdown()
+        # 종료 시 queue에 남은 chat/feedback 로그를 모두 기록
+        await LOG_WRITER.stop()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="Shopping Assistant Agent API", version="0.2.0")
+    app = FastAPI(title="Shopping Assistant Agent API", version="0.2.0", lifespan=_lifespan)
 
     @app.middleware("http")
     async def _log_requests(request: Request, call_next):
@@ -64,4 +102,5 @@ def create_app() -> FastAPI:
 
 
 app = create_app()
+STARTUP.record("import_app", (time.perf_counter() - _IMPORT_T0) * 1000)
 
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import suppress
+from itertools import islice
+from typing import AsyncIterator, Callable, Deque, Optional, Tuple
+
+from ..core.config import SETTINGS
+from ..core.metrics import METRICS
+from ..utils.sse import SseEncoder
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """`Last-Event-ID`(`{message_id}:{seq}`)를 (message_id, seq)로. 형식이 다르면 None."""
+    if not value:
+        return None
+    message_id, sep, seq = value.strip().rpartition(":")
+    if not sep or not message_id or not seq.isdigit():
+        return None
+    return message_id, int(seq)
+
+
+class TurnStream:
+    """
+    채팅 턴 하나의 SSE 이벤트 버퍼.
+
+    - 턴(producer)은 연결과 분리된 task로 실행되고, 만든 프레임을 `id: {message_id}:{seq}`를 붙여 ring buffer에 적재
+    - 연결(subscriber)은 원하는 seq 이후부터 읽고, 새 프레임이 오면 이어서 받음(재연결 = 같은 버퍼에 다시 구독)
+    - 구독자가 모두 떠난 뒤 `grace_s` 안에 아무도 다시 붙지 않으면 턴을 취소(클라이언트 이탈)
+    - `publish`는 기다리지 않으므로(버퍼 적재만) 전송 backpressure는 턴까지 오지 않습니다. 대신 구독자가 실시간
+      프레임 하나를 넘기는 데 걸린 시간을 `send_observer`(예: `TokenCoalescer.observe_send`)로 알려 줍니다.
+    """
+
+    def __init__(self, message_id: str, session_id: str, enc: SseEncoder, max_events: int, grace_s: float):
+        self.message_id = message_id
+        self.session_id = session_id
+        self.enc = enc
+        self.grace_s = max(grace_s, 0.0)
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._events: Deque[Tuple[int, bytes]] = deque(maxlen=max(max_events, 1))
+        self._next_seq = 1
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._grace: Optional[asyncio.TimerHandle] = None
+        self.send_observer: Optional[Callable[[float], None]] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def start(self, frames: AsyncIterator[bytes]) -> None:
+        self.task = asyncio.create_task(self._run(frames))
+
+    def publish(self, frame: bytes) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        self._events.append((seq, f"id: {self.message_id}:{seq}\n".encode("utf-8") + frame))
+        self._notify()
+        return seq
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncIterator[bytes]:
+        """`after_seq` 다음 이벤트부터 턴이 끝날 때까지 프레임을 내보냅니다."""
+        self._attach()
+        replayed = 0
+        live_from = self.last_seq
+        try:
+            while True:
+                changed = self._changed
+                oldest = self._events[0][0] if self._events else self._next_seq
+                if after_seq + 1 < oldest:
+                    # ring buffer에서 밀려난 구간: 클라이언트가 빠진 부분을 알 수 있게 표시하고 남은 것부터 전송
+                    METRICS.inc("sse_replay_gaps")
+                    yield self.enc.event("replay_gap", {"missed_from": after_seq + 1, "missed_to": oldest - 1})
+                    after_seq = oldest - 1
+                start = after_seq + 1 - oldest
+                for seq, frame in list(islice(self._events, max(start, 0), None)):
+                    after_seq = seq
+                    if seq <= live_from:
+                        replayed += 1
+                        yield frame
+                        continue
+                    t0 = time.monotonic()
+                    yield frame
+                    if self.send_observer is not None:
+                        self.send_observer(time.monotonic() - t0)
+                if self.done and after_seq >= self.last_seq:
+                    return
+                await changed.wait()
+        finally:
+            if replayed:
+                METRICS.inc("sse_replayed_events", replayed)
+            self._detach()
+
+    async def _run(self, frames: AsyncIterator[bytes]) -> None:
+        try:
+            async for frame in frames:
+                self.publish(frame)
+        finally:
+            aclose = getattr(frames, "aclose", None)
+            if aclose is not None:
+                with suppress(Exception):
+                    await aclose()
+            self.finished_at = time.monotonic()
+            if self._grace is not None:
+                self._grace.cancel()
+                self._grace = None
+            self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _attach(self) -> None:
+        self._subscribers += 1
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+
+    def _detach(self) -> None:
+        self._subscribers -= 1
+        if self._subscribers > 0 or self.done or self.task is None:
+            return
+        if self.grace_s <= 0:
+            self._abandon()
+        else:
+            self._grace = asyncio.get_running_loop().call_later(self.grace_s, self._abandon)
+
+    def _abandon(self) -> None:
+        self._grace = None
+        if self._subscribers == 0 and self.task is not None and not self.task.done():
+            METRICS.inc("chat_abandoned_turns")
+            self.task.cancel()
+
+
+class TurnRegistry:
+    """message_id -> TurnStream. 끝난 턴은 `ttl_s` 동안(최대 `max_turns`개) 재연결/중복 제출용으로 보관."""
+
+    def __init__(self, max_turns: int, ttl_s: float):
+        self.max_turns = max(max_turns, 1)
+        self.ttl_s = max(ttl_s, 0.0)
+        self._turns: "OrderedDict[str, TurnStream]" = OrderedDict()
+
+    def get(self, message_id: str) -> Optional[TurnStream]:
+        self._evict()
+        return self._turns.get(message_id)
+
+    def create(self, message_id: str, session_id: str, enc: SseEncoder) -> TurnStream:
+        self._evict()
+        turn = TurnStream(
+            message_id,
+            session_id,
+            enc,
+            max_events=SETTINGS.sse_replay_max_events,
+            grace_s=SETTINGS.sse_resume_grace_ms / 1000.0,
+        )
+        self._turns[message_id] = turn
+        return turn
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for mid, turn in list(self._turns.items()):
+            if turn.finished_at is not None and now - turn.finished_at > self.ttl_s:
+                del self._turns[mid]
+        if len(self._turns) <= self.max_turns:
+            return
+        # 용량 초과: 진행 중인 턴은 남기고 오래된 완료 턴부터 제거
+        for mid, turn in list(self._turns.items()):
+            if len(self._turns) <= self.max_turns:
+                break
+            if turn.done:
+                del self._turns[mid]
+
+
+TURNS = TurnRegistry(max_turns=SETTINGS.sse_replay_max_turns, ttl_s=SETTINGS.sse_replay_ttl_s)
@@ -1,33 +1,26 @@
 from __future__ import annotations
 
 import asyncio
-import io
-import json
-import logging
 import os
-import re
-import uuid
-from contextlib import redirect_stderr, redirect_stdout
-from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from dataclasses import asdict
 from pathlib import Path
-from typing import Optional
-from typing import Dict
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from ..core.artifacts import reload_all
+from ..core.analytics import chat_analytics
 from ..core.config import LOADED_DOTENV_FILES, SETTINGS
 from ..core.curation import CurationState, load_curation_state, save_curation_state
+from ..core.log_index import chat_log_index
+from ..core.metrics import METRICS
+from ..core.log_segments import segmented_log
 from ..core.storage import chat_log_path, feedback_log_path
-from ..dspy_modules.intent import ensure_dspy_configured
-from ..train.build_dataset import build_datasets
-from ..train.compile import (
-    compile_fusion_decision,
-    compile_product_ranker,
-    compile_relaxed_constraints,
-)
+from ..utils.sse import cancel_on_disconnect
+from .admission import ADMISSION
+from .jobs import JOB_DONE, JOBS, JobRecord
+from .startup import STARTUP
 
 
 router = APIRouter()
@@ -39,102 +32,18 @@ def _require_admin(x_admin_key: Optional[str]) -> None:
             raise HTTPException(status_code=401, detail="invalid admin key")
 
 
-def _read_jsonl_tail(path: Path, limit: int) -> list[dict]:
-    if limit <= 0:
-        return []
-    if not path.exists():
-        return []
-    rows: list[dict] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                if isinstance(obj, dict):
-                    rows.append(obj)
-            except Exception:
-                continue
-    return rows[-limit:]
-
-
-@dataclass
-class _Job:
-    status: str  # queued|running|done|error
-    result: Optional[dict] = None
-    error: Optional[str] = None
-    logs: list[str] = field(default_factory=list)
-    progress: dict = field(default_factory=dict)
-    updated_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-
-
-def _job_append(job_id: str, line: str) -> None:
-    job = _JOBS.get(job_id)
-    if not job:
-        return
-    if not isinstance(line, str) or not line:
-        return
-    # keep only recent logs (avoid unbounded growth)
-    job.logs.append(line.rstrip("\n"))
-    if len(job.logs) > 400:
-        job.logs = job.logs[-400:]
-    job.updated_at = datetime.now(timezone.utc).isoformat()
-
-
-_TRIAL_RE = re.compile(r"Trial\s+(\d+)\s*/\s*(\d+)")
-_STEP_RE = re.compile(r"==>\s*STEP\s*(\d+)")
-
-
-def _job_parse_progress(job_id: str, line: str) -> None:
-    job = _JOBS.get(job_id)
-    if not job:
-        return
-    m = _TRIAL_RE.search(line)
-    if m:
-        job.progress["trial"] = int(m.group(1))
-        job.progress["trial_total"] = int(m.group(2))
-    m2 = _STEP_RE.search(line)
-    if m2:
-        job.progress["step"] = int(m2.group(1))
-    job.updated_at = datetime.now(timezone.utc).isoformat()
-
-
-class _JobLogWriter(io.TextIOBase):
-    def __init__(self, job_id: str):
-        self.job_id = job_id
-        self._buf = ""
-
-    def write(self, s: str) -> int:
-        if not isinstance(s, str):
-            s = str(s)
-        self._buf += s
-        # flush per line
-        while "\n" in self._buf:
-            line, self._buf = self._buf.split("\n", 1)
-            _job_append(self.job_id, line)
-            _job_parse_progress(self.job_id, line)
-        return len(s)
-
-    def flush(self) -> None:
-        if self._buf:
-            _job_append(self.job_id, self._buf)
-            _job_parse_progress(self.job_id, self._buf)
-            self._buf = ""
-
-
-_JOBS: Dict[str, _Job] = {}
-
-
-def _new_job_id() -> str:
-    return str(uuid.uuid4())
-
-
 @router.get("/health")
 async def health() -> dict:
     return {"ok": True}
 
 
+@router.get("/ready")
+async def ready() -> JSONResponse:
+    """warm-up(그래프/LM/artifact 로드)이 끝난 뒤에만 200. Kubernetes readinessProbe용."""
+    snap = STARTUP.snapshot()
+    return JSONResponse(status_code=200 if snap["ready"] else 503, content={"ok": snap["ready"], **snap})
+
+
 @router.get("/debug/env")
 async def debug_env() -> dict:
     def mask(v: Optional[str]) -> Optional[str]:
@@ -165,28 +74,85 @@ async def debug_env() -> dict:
     }
 
 
+@router.get("/admin/metrics")
+async def admin_metrics(x_admin_key: Optional[str] = Header(default=None)) -> dict:
+    _require_admin(x_admin_key)
+    return {"ok": True, **METRICS.snapshot(), "admission": ADMISSION.snapshot(), "jobs": JOBS.snapshot()}
+
+
+@router.get("/admin/analytics")
+async def admin_analytics(days: int = 0, top: int = 20, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+    """chat 로그 운영 지표(증분 집계). days=0이면 전체 누적, 아니면 최근 N일."""
+    _require_admin(x_admin_key)
+    report = await asyncio.to_thread(chat_analytics().report, max(int(days), 0), max(1, min(int(top), 100)))
+    return {"ok": True, **report}
+
+
 @router.post("/admin/reload_artifacts")
 async def admin_reload_artifacts(x_admin_key: Optional[str] = Header(default=None)) -> dict:
     _require_admin(x_admin_key)
-    return {"ok": True, "result": reload_all()}
+    from ..core.artifacts import reload_all
+
+    return {"ok": True, "result": await asyncio.to_thread(reload_all)}
+
+
+async def _tail(path: Path, limit: int, before: Optional[int]) -> dict:
+    limit = max(1, min(int(limit), 2000))
+    # 현재 파일에서 부족하면 압축 세그먼트까지 이어서 읽음(오프셋은 세그먼트를 포함한 논리 오프셋)
+    rows, next_before = await asyncio.to_thread(segmented_log(path).tail, limit, before)
+    return {"ok": True, "path": str(path), "rows": rows, "next_before": next_before}
 
 
 @router.get("/admin/logs/chat")
-async def admin_logs_chat(limit: int = 200, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+async def admin_logs_chat(
+    limit: int = 200, before: Optional[int] = None, x_admin_key: Optional[str] = Header(default=None)
+) -> dict:
     _require_admin(x_admin_key)
-    limit = max(1, min(int(limit), 2000))
-    rows = _read_jsonl_tail(chat_log_path(), limit=limit)
-    return {"ok": True, "path": str(chat_log_path()), "rows": rows}
+    return await _tail(chat_log_path(), limit, before)
+
+
+@router.get("/admin/logs/chat/search")
+async def admin_logs_chat_search(
+    message_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    error_type: Optional[str] = None,
+    errors_only: bool = False,
+    fallback_used: Optional[bool] = None,
+    cancelled: Optional[bool] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_elapsed_ms: Optional[int] = None,
+    limit: int = 200,
+    before: Optional[int] = None,
+    x_admin_key: Optional[str] = Header(default=None),
+) -> dict:
+    """chat 로그 SQLite 색인으로 필터 조회(조회 시 새로 추가된 줄만 증분 색인)."""
+    _require_admin(x_admin_key)
+    index = chat_log_index()
+    rows, next_before = await asyncio.to_thread(
+        index.query,
+        message_id=message_id,
+        session_id=session_id,
+        error_type=error_type,
+        errors_only=errors_only,
+        fallback_used=fallback_used,
+        cancelled=cancelled,
+        since=since,
+        until=until,
+        min_elapsed_ms=min_elapsed_ms,
+        limit=max(1, min(int(limit), 2000)),
+        before=before,
+    )
+    stats = await asyncio.to_thread(index.stats)
+    return {"ok": True, "path": str(index.log_path), "rows": rows, "next_before": next_before, "index": stats}
 
 
 @router.get("/admin/logs/feedback")
 async def admin_logs_feedback(
-    limit: int = 200, x_admin_key: Optional[str] = Header(default=None)
+    limit: int = 200, before: Optional[int] = None, x_admin_key: Optional[str] = Header(default=None)
 ) -> dict:
     _require_admin(x_admin_key)
-    limit = max(1, min(int(limit), 2000))
-    rows = _read_jsonl_tail(feedback_log_path(), limit=limit)
-    return {"ok": True, "path": str(feedback_log_path()), "rows": rows}
+    return await _tail(feedback_log_path(), limit, before)
 
 
 class BuildDatasetsRequest(BaseModel):
@@ -195,125 +161,218 @@ class BuildDatasetsRequest(BaseModel):
     out_ranker: str = Field(default="agent/data/datasets/ranker.jsonl")
     out_relax: str = Field(default="agent/data/datasets/relaxed_constraints.jsonl")
     out_fusion: str = Field(default="agent/data/datasets/fusion.jsonl")
+    full: bool = Field(default=False)
     async_run: bool = Field(default=True)
 
 
+async def _run_job(kind: str, params: dict, async_run: bool, after=None) -> dict:
+    """job을 worker process로 실행. async_run=false면 끝날 때까지 기다려 결과를 바로 반환."""
+    job = JOBS.submit(kind, params, after=after)
+    if async_run:
+        return {"ok": True, "job_id": job.job_id}
+    job = await JOBS.wait(job.job_id)
+    if job.status != JOB_DONE:
+        raise HTTPException(status_code=500, detail=job.error or job.status)
+    return {"ok": True, "job_id": job.job_id, "result": job.result}
+
+
 @router.post("/admin/datasets/build")
 async def admin_build_datasets(
     req: BuildDatasetsRequest, x_admin_key: Optional[str] = Header(default=None)
 ) -> dict:
     _require_admin(x_admin_key)
+    params = req.model_dump(exclude={"async_run"})
+    return await _run_job("build_datasets", params, req.async_run)
 
-    def run() -> dict:
-        return build_datasets(
-            chat_log=Path(req.chat_log),
-            feedback_log=Path(req.feedback_log),
-            out_ranker=Path(req.out_ranker),
-            out_relax=Path(req.out_relax),
-            out_fusion=Path(req.out_fusion),
-        )
-
-    if not req.async_run:
-        return {"ok": True, "result": await asyncio.to_thread(run)}
 
-    job_id = _new_job_id()
-    _JOBS[job_id] = _Job(status="queued")
-
-    async def task() -> None:
-        _JOBS[job_id].status = "running"
-        try:
-            result = await asyncio.to_thread(run)
-            _JOBS[job_id].status = "done"
-            _JOBS[job_id].result = result
-        except Exception as e:
-            _JOBS[job_id].status = "error"
-            _JOBS[job_id].error = str(e)
-
-    asyncio.create_task(task())
-    return {"ok": True, "job_id": job_id}
+_COMPILE_MODULES = ("relaxed_constraints", "product_ranker", "fusion_decision")
 
 
 class CompileRequest(BaseModel):
     module: str = Field(..., description="relaxed_constraints|product_ranker|fusion_decision")
     dataset: str = Field(..., description="jsonl dataset path")
     out: str = Field(..., description="artifact output path (.json)")
+    num_threads: Optional[int] = Field(default=None, ge=1, description="후보 평가 thread 수(기본 COMPILE_NUM_THREADS)")
+    lm_cache_mode: Optional[str] = Field(default=None, description="off|on|replay|record (기본 LM_CACHE_MODE)")
+    incremental: bool = Field(default=False, description="현재 artifact(out)에서 출발해 새/바뀐 예제만 반영")
+    # compile 예산(None이면 COMPILE_MAX_*; 0이면 무제한). 넘으면 그때까지의 최선 프로그램을 저장
+    max_lm_calls: Optional[int] = Field(default=None, ge=0, description="LM 실제 호출 수 한도")
+    max_tokens: Optional[int] = Field(default=None, ge=0, description="LM 토큰(prompt+completion) 한도")
+    max_seconds: Optional[float] = Field(default=None, ge=0, description="경과 시간 한도(초)")
+    reload_artifacts: bool = Field(default=True)
+    async_run: bool = Field(default=True)
+
+
+class CompileTarget(BaseModel):
+    dataset: str
+    out: str
+
+
+class CompileAllRequest(BaseModel):
+    # 생략한 모듈은 기본 경로(agent/data/datasets/*, DSPY_ARTIFACTS_DIR)로 compile
+    targets: Dict[str, CompileTarget] = Field(default_factory=dict)
+    modules: List[str] = Field(default_factory=lambda: list(_COMPILE_MODULES))
+    parallel: bool = Field(default=True)
+    num_threads: Optional[int] = Field(default=None, ge=1)
+    lm_cache_mode: Optional[str] = Field(default=None, description="off|on|replay|record (기본 LM_CACHE_MODE)")
+    incremental: bool = Field(default=False)
+    # job 전체(모든 모듈 합산) 예산
+    max_lm_calls: Optional[int] = Field(default=None, ge=0)
+    max_tokens: Optional[int] = Field(default=None, ge=0)
+    max_seconds: Optional[float] = Field(default=None, ge=0)
     reload_artifacts: bool = Field(default=True)
     async_run: bool = Field(default=True)
 
 
+def _check_lm_cache_mode(mode: Optional[str]) -> None:
+    if mode is not None and mode not in {"off", "on", "replay", "record"}:
+        raise HTTPException(status_code=400, detail="invalid lm_cache_mode")
+
+
+def _reload_after_compile(result: dict) -> dict:
+    # 컴파일은 worker process에서 끝났으므로, 새 artifact는 서버 프로세스에서 reload해야 반영됩니다.
+    from ..core.artifacts import reload_all
+
+    return {**(result or {}), "reload": reload_all()}
+
+
 @router.post("/admin/compile")
 async def admin_compile(req: CompileRequest, x_admin_key: Optional[str] = Header(default=None)) -> dict:
     _require_admin(x_admin_key)
+    if req.module not in _COMPILE_MODULES:
+        raise HTTPException(status_code=400, detail="invalid module")
+    _check_lm_cache_mode(req.lm_cache_mode)
+    params = {
+        "module": req.module,
+        "dataset": req.dataset,
+        "out": req.out,
+        "num_threads": req.num_threads,
+        "lm_cache_mode": req.lm_cache_mode,
+        "incremental": req.incremental,
+        "max_lm_calls": req.max_lm_calls,
+        "max_tokens": req.max_tokens,
+        "max_seconds": req.max_seconds,
+    }
+    after = _reload_after_compile if req.reload_artifacts else None
+    return await _run_job("compile", params, req.async_run, after=after)
 
-    def run(job_id: Optional[str] = None) -> dict:
-        ensure_dspy_configured(model=SETTINGS.dspy_model)
-        ds = Path(req.dataset)
-        out = Path(req.out)
-        if job_id:
-            _job_append(job_id, f"[compile] module={req.module} dataset={ds} out={out}")
-        if req.module == "relaxed_constraints":
-            compile_relaxed_constraints(ds, out)
-        elif req.module == "product_ranker":
-            compile_product_ranker(ds, out)
-        elif req.module == "fusion_decision":
-            compile_fusion_decision(ds, out)
-        else:
-            raise ValueError("invalid module")
-        reload_result = reload_all() if req.reload_artifacts else None
-        return {"module": req.module, "dataset": str(ds), "out": str(out), "reload": reload_result}
-
-    if not req.async_run:
-        return {"ok": True, "result": await asyncio.to_thread(run)}
-
-    job_id = _new_job_id()
-    _JOBS[job_id] = _Job(status="queued")
-
-    async def task() -> None:
-        _JOBS[job_id].status = "running"
-        _JOBS[job_id].updated_at = datetime.now(timezone.utc).isoformat()
-        try:
-            # Capture both print() and logging output during compile
-            writer = _JobLogWriter(job_id)
-            handler = logging.StreamHandler(writer)
-            handler.setLevel(logging.INFO)
-            root = logging.getLogger()
-            root.addHandler(handler)
-            try:
-                with redirect_stdout(writer), redirect_stderr(writer):
-                    result = await asyncio.to_thread(run, job_id)
-            finally:
-                root.removeHandler(handler)
-                writer.flush()
-            _JOBS[job_id].status = "done"
-            _JOBS[job_id].result = result
-        except Exception as e:
-            _JOBS[job_id].status = "error"
-            _JOBS[job_id].error = str(e)
-        finally:
-            _JOBS[job_id].updated_at = datetime.now(timezone.utc).isoformat()
-
-    asyncio.create_task(task())
-    return {"ok": True, "job_id": job_id}
 
+@router.post("/admin/compile/all")
+async def admin_compile_all(req: CompileAllRequest, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+    _require_admin(x_admin_key)
+    modules = list(dict.fromkeys(req.modules))
+    if not modules or any(m not in _COMPILE_MODULES for m in [*modules, *req.targets]):
+        raise HTTPException(status_code=400, detail="invalid module")
+    _check_lm_cache_mode(req.lm_cache_mode)
+    params = {
+        "modules": modules,
+        "targets": {m: t.model_dump() for m, t in req.targets.items() if m in modules},
+        "parallel": req.parallel,
+        "num_threads": req.num_threads,
+        "lm_cache_mode": req.lm_cache_mode,
+        "incremental": req.incremental,
+        "max_lm_calls": req.max_lm_calls,
+        "max_tokens": req.max_tokens,
+        "max_seconds": req.max_seconds,
+    }
+    after = _reload_after_compile if req.reload_artifacts else None
+    return await _run_job("compile_all", params, req.async_run, after=after)
 
-@router.get("/admin/jobs/{job_id}")
-async def admin_job_status(job_id: str, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+
+class EvaluateRequest(BaseModel):
+    module: str = Field(..., description="relaxed_constraints|product_ranker|fusion_decision")
+    dataset: Optional[str] = Field(default=None, description="held-out jsonl dataset (기본: 모듈 기본(compile) 데이터셋)")
+    artifact: Optional[str] = Field(default=None, description='평가할 artifact (기본: 서버 artifact, ""면 미적용)')
+    baseline: Optional[str] = Field(default=None, description="지정하면 baseline과 artifact를 나란히 비교")
+    k: int = Field(default=10, ge=1, le=100)
+    limit: Optional[int] = Field(default=None, ge=1)
+    include_trained: bool = Field(default=False, description="artifact가 compile에 쓴 예제도 평가(기본 제외)")
+    num_threads: Optional[int] = Field(default=None, ge=1)
+    tolerance: float = Field(default=0.01, ge=0)
+    lm_cache_mode: Optional[str] = Field(default=None, description="off|on|replay|record (기본 EVAL_LM_CACHE_MODE)")
+    async_run: bool = Field(default=True)
+
+
+@router.post("/admin/evaluate")
+async def admin_evaluate(req: EvaluateRequest, x_admin_key: Optional[str] = Header(default=None)) -> dict:
     _require_admin(x_admin_key)
-    job = _JOBS.get(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="job not found")
+    if req.module not in _COMPILE_MODULES:
+        raise HTTPException(status_code=400, detail="invalid module")
+    _check_lm_cache_mode(req.lm_cache_mode)
+    return await _run_job("evaluate", req.model_dump(exclude={"async_run"}), req.async_run)
+
+
+def _job_view(job: JobRecord, logs: int = 120) -> dict:
     return {
-        "ok": True,
-        "job_id": job_id,
+        "job_id": job.job_id,
+        "kind": job.kind,
         "status": job.status,
+        "params": job.params,
         "result": job.result,
         "error": job.error,
-        "progress": job.progress,
-        "logs_tail": job.logs[-120:],  # keep response small
+        "progress": JOBS.progress(job.job_id),
+        "logs_tail": JOBS.log_tail(job.job_id, lines=logs),  # keep response small
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
         "updated_at": job.updated_at,
     }
 
 
+@router.get("/admin/jobs")
+async def admin_jobs(limit: int = 50, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+    _require_admin(x_admin_key)
+    jobs = [
+        {k: v for k, v in asdict(j).items() if k not in {"result", "pid"}}
+        for j in JOBS.list(max(1, min(int(limit), 500)))
+    ]
+    return {"ok": True, "jobs": jobs, **JOBS.snapshot()}
+
+
+@router.get("/admin/jobs/{job_id}")
+async def admin_job_status(job_id: str, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+    _require_admin(x_admin_key)
+    job = JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"ok": True, **(await asyncio.to_thread(_job_view, job))}
+
+
+@router.get("/admin/jobs/{job_id}/stream")
+async def admin_job_stream(
+    job_id: str,
+    request: Request,
+    after: int = 0,
+    last_event_id: Optional[str] = Header(default=None),
+    x_admin_key: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    """job 로그/진행률 SSE. 이벤트 id(로그 바이트 오프셋)를 `Last-Event-ID` 또는 `?after=`로 주면 그 이후부터."""
+    _require_admin(x_admin_key)
+    feed = JOBS.feed(job_id)
+    if feed is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if last_event_id and last_event_id.strip().isdigit():
+        after = int(last_event_id.strip())
+    return StreamingResponse(
+        cancel_on_disconnect(feed.subscribe(after), request.is_disconnected, SETTINGS.disconnect_poll_ms),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache, no-transform",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/admin/jobs/{job_id}/cancel")
+async def admin_job_cancel(job_id: str, x_admin_key: Optional[str] = Header(default=None)) -> dict:
+    _require_admin(x_admin_key)
+    job = JOBS.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"ok": True, "job_id": job_id, "status": job.status}
+
+
 @router.get("/admin/curation/state")
 async def admin_curation_state(x_admin_key: Optional[str] = Header(default=None)) -> dict:
     _require_admin(x_admin_key)
@@ -1,163 +1,150 @@
 from __future__ import annotations
 
-import json
-import os
+import asyncio
 import time
 import uuid
 from typing import Any, AsyncIterator, Dict, Optional
 
-import anyio
-import boto3
-from botocore.config import Config as BotoConfig
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from ..core.config import SETTINGS
-from ..core.storage import append_jsonl, chat_log_path, feedback_log_path, utc_now_iso
-from ..graph.shopping_graph import GRAPH_APP
-from ..utils.sse import SseEvent, chunk_text, merge_updates
+from ..core.log_writer import LOG_WRITER
+from ..core.metrics import METRICS
+from ..core.storage import chat_log_path, feedback_log_path, utc_now_iso
+from ..graph.budget import LatencyBudget, latency_budget_scope
+from ..integrations.bedrock import has_aws_creds, stream_bedrock_text
+from ..utils.sse import (
+    SseEncoder,
+    TokenCoalescer,
+    cancel_on_disconnect,
+    chunk_text,
+    coalesce_deltas,
+    merge_updates,
+)
+from .admission import ADMISSION, REJECT_SESSION_BUSY, AdmissionRejected, AdmissionTimeout, Ticket
+from .batch import run_batch, summarize
+from .jobs import JOBS
+from .replay import TURNS, TurnStream, parse_last_event_id
+from .startup import aget_graph_app
 
 
 router = APIRouter()
 
-def _has_aws_creds() -> bool:
-    # If any of these are present, boto3 has a good chance to resolve credentials.
-    if os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
-        return True
-    if os.getenv("AWS_PROFILE"):
-        return True
-    if os.getenv("AWS_WEB_IDENTITY_TOKEN_FILE"):
-        return True
-    if os.getenv("AWS_CONTAINER_CREDENTIALS_RELATIVE_URI") or os.getenv("AWS_CONTAINER_CREDENTIALS_FULL_URI"):
-        return True
-    return False
 
-
-def _bedrock_model_id() -> str:
-    m = SETTINGS.dspy_model
-    return m[len("bedrock/") :] if m.startswith("bedrock/") else m
-
-
-def _bedrock_stream_text(prompt: str) -> AsyncIterator[str]:
-    """Bedrock(Anthropic) streaming. Yields text deltas."""
-    # boto3 client is sync; we run it in a thread via anyio in the caller
-    raise RuntimeError("use _bedrock_stream_text_sync via anyio.to_thread")
+async def _metered(frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """응답 단위 SSE 프레임 수/바이트를 METRICS에 기록."""
+    count = 0
+    size = 0
+    try:
+        async for frame in frames:
+            count += 1
+            size += len(frame)
+            yield frame
+    finally:
+        METRICS.inc("sse_frames_total", count)
+        METRICS.inc("sse_bytes_total", size)
+        METRICS.observe("sse_frames_per_response", count)
+        METRICS.observe("sse_bytes_per_response", size)
 
 
-def _bedrock_stream_text_sync(prompt: str) -> list[str]:
-    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "ap-northeast-2"
-    client = boto3.client(
-        "bedrock-runtime",
-        region_name=region,
-        config=BotoConfig(read_timeout=300, connect_timeout=10, retries={"max_attempts": 2}),
-    )
-    model_id = _bedrock_model_id()
-    body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 10000,
-        "temperature": 0.2,
-        "messages": [
-            {"role": "user", "content": [{"type": "text", "text": prompt}]},
-        ],
-    }
-    resp = client.invoke_model_with_response_stream(modelId=model_id, body=json.dumps(body))
-    out: list[str] = []
-    stream = resp.get("body")
-    if stream is None:
-        return out
-    for event in stream:
-        chunk = event.get("chunk") if isinstance(event, dict) else None
-        if not chunk:
-            continue
-        raw = chunk.get("bytes")
-        if not raw:
-            continue
-        try:
-            payload = json.loads(raw.decode("utf-8"))
-        except Exception:
-            continue
-        # Anthropic stream event types: message_start/content_block_start/content_block_delta/message_delta/message_stop
-        if payload.get("type") == "content_block_delta":
-            delta = (payload.get("delta") or {}).get("text")
-            if isinstance(delta, str) and delta:
-                out.append(delta)
-    return out
-
-
-def _bedrock_stream_to_anyio_send(prompt: str, send) -> None:
-    """Run in a thread: stream Bedrock deltas into an anyio send stream."""
-    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "ap-northeast-2"
-    client = boto3.client(
-        "bedrock-runtime",
-        region_name=region,
-        config=BotoConfig(read_timeout=300, connect_timeout=10, retries={"max_attempts": 2}),
-    )
-    model_id = _bedrock_model_id()
-    body = {
-        "anthropic_version": "bedrock-2023-05-31",
-        "max_tokens": 10000,
-        "temperature": 0.2,
-        "messages": [
-            {"role": "user", "content": [{"type": "text", "text": prompt}]},
-        ],
-    }
+async def _released(ticket: Ticket, frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """응답이 끝나거나(정상/에러/취소) 대기 중 이탈하면 admission 슬롯을 반납."""
     try:
-        resp = client.invoke_model_with_response_stream(modelId=model_id, body=json.dumps(body))
-        stream = resp.get("body")
-        if stream is None:
-            return
-        for event in stream:
-            chunk = event.get("chunk") if isinstance(event, dict) else None
-            if not chunk:
-                continue
-            raw = chunk.get("bytes")
-            if not raw:
-                continue
-            try:
-                payload = json.loads(raw.decode("utf-8"))
-            except Exception:
-                continue
-            if payload.get("type") == "content_block_delta":
-                delta = (payload.get("delta") or {}).get("text")
-                if isinstance(delta, str) and delta:
-                    anyio.from_thread.run(send.send, delta)
+        async for frame in frames:
+            yield frame
     finally:
-        try:
-            anyio.from_thread.run(send.aclose)
-        except Exception:
-            pass
+        ADMISSION.release(ticket)
 
 
 class ChatRequest(BaseModel):
     session_id: str = Field(..., description="세션 식별자(멀티턴 메모리 thread_id)")
     user_query: str = Field(..., description="사용자 채팅 입력")
     client_message_id: Optional[str] = None
+    latency_budget_ms: Optional[int] = Field(
+        default=None, description="요청 지연 예산(ms). 미지정 시 LATENCY_BUDGET_MS, 0이면 예산 없음"
+    )
+
+
+def _stream_response(request: Request, turn: TurnStream, after_seq: int) -> StreamingResponse:
+    def _on_disconnect() -> None:
+        METRICS.inc("sse_client_disconnects")
+
+    return StreamingResponse(
+        _metered(
+            cancel_on_disconnect(
+                turn.subscribe(after_seq),
+                request.is_disconnected,
+                SETTINGS.disconnect_poll_ms,
+                on_disconnect=_on_disconnect,
+            )
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache, no-transform",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 @router.post("/v1/chat/stream")
-async def chat_stream(req: ChatRequest):
+async def chat_stream(
+    req: ChatRequest,
+    request: Request,
+    last_event_id: Optional[str] = Header(default=None),
+):
+    # 재연결(Last-Event-ID) 또는 같은 client_message_id 재제출: 그래프를 다시 돌리지 않고 기존 턴에 붙음
+    resume = parse_last_event_id(last_event_id)
+    resume_mid = resume[0] if resume is not None else req.client_message_id
+    existing = TURNS.get(resume_mid) if resume_mid else None
+    if existing is not None:
+        if existing.session_id != req.session_id:
+            raise HTTPException(status_code=409, detail="message_id belongs to another session")
+        after_seq = resume[1] if resume is not None and resume[0] == existing.message_id else 0
+        METRICS.inc("sse_resumes" if resume is not None else "chat_duplicate_submissions")
+        return _stream_response(request, existing, after_seq=after_seq)
+
     message_id = req.client_message_id or str(uuid.uuid4())
     started_at = time.time()
+    budget_ms = SETTINGS.latency_budget_ms if req.latency_budget_ms is None else req.latency_budget_ms
+    budget = LatencyBudget(total_ms=max(int(budget_ms), 0))
+    # 이벤트 id(`{message_id}:{seq}`)는 replay 버퍼가 붙입니다.
+    enc = SseEncoder(req.session_id, message_id, with_id=False)
+    coalescer = TokenCoalescer(SETTINGS.stream_flush_ms, SETTINGS.stream_flush_bytes)
 
-    async def event_iter() -> AsyncIterator[bytes]:
-        yield SseEvent(
-            event="start",
-            data={"session_id": req.session_id, "message_id": message_id},
-            id=message_id,
-        ).encode()
-
-        # UI에 즉시 반응이 보이도록 "요청 접수" 상태를 먼저 보냅니다.
-        yield SseEvent(
-            event="state",
-            data={
+    try:
+        ticket = ADMISSION.enter(req.session_id)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={
+                "ok": False,
                 "session_id": req.session_id,
                 "message_id": message_id,
-                "node": "accepted",
-                "update_keys": [],
+                "error": "동시 요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요."
+                if e.reason != REJECT_SESSION_BUSY
+                else "이 세션의 이전 요청이 아직 처리 중입니다.",
+                "reason": e.reason,
             },
-            id=message_id,
-        ).encode()
+            headers={"Retry-After": str(e.retry_after_s)},
+        )
+
+    async def event_iter() -> AsyncIterator[bytes]:
+        yield enc.event("start")
+
+        # 전역/세션 동시 실행 제한: 입장할 때까지 대기열 순번을 queued 이벤트로 알림
+        try:
+            async for update in ADMISSION.wait(ticket, SETTINGS.chat_queue_timeout_ms):
+                yield enc.event("queued", update)
+        except AdmissionTimeout as e:
+            yield enc.event("error", {"error": str(e), "error_type": "AdmissionTimeout"})
+            yield enc.event("done")
+            return
+
+        # UI에 즉시 반응이 보이도록 "요청 접수" 상태를 먼저 보냅니다.
+        yield enc.event("state", {"node": "accepted", "update_keys": []})
 
         # Fast-fail for common docker-compose misconfig (no AWS/DSPy env injected)
         if not SETTINGS.dspy_model:
@@ -165,20 +152,17 @@ async def chat_stream(req: ChatRequest):
                 "DSPY_MODEL이 설정되지 않았습니다. "
                 "docker-compose 사용 시 `agent/.env`에 DSPY_MODEL을 설정하세요."
             )
-            yield SseEvent(
-                event="error",
-                data={
-                    "session_id": req.session_id,
-                    "message_id": message_id,
+            yield enc.event(
+                "error",
+                {
                     "error": msg,
                     "error_type": "ConfigError",
                 },
-                id=message_id,
-            ).encode()
-            yield SseEvent(event="done", data={"session_id": req.session_id, "message_id": message_id}, id=message_id).encode()
+            )
+            yield enc.event("done")
             return
 
-        if not _has_aws_creds():
+        if not has_aws_creds():
             msg = (
                 "AWS 자격증명이 설정되지 않아 LLM 호출을 진행할 수 없습니다. "
                 "docker-compose 사용 시 `agent/.env`에 AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY(+AWS_REGION)를 설정하거나 "
@@ -186,22 +170,15 @@ async def chat_stream(req: ChatRequest):
             )
             # token으로도 보내 UI에 바로 표시되게 함
             async for piece in chunk_text(msg, SETTINGS.stream_chunk_chars):
-                yield SseEvent(
-                    event="token",
-                    data={"session_id": req.session_id, "message_id": message_id, "delta": piece},
-                    id=message_id,
-                ).encode()
-            yield SseEvent(
-                event="error",
-                data={
-                    "session_id": req.session_id,
-                    "message_id": message_id,
+                yield enc.token(piece)
+            yield enc.event(
+                "error",
+                {
                     "error": msg,
                     "error_type": "AuthError",
                 },
-                id=message_id,
-            ).encode()
-            yield SseEvent(event="done", data={"session_id": req.session_id, "message_id": message_id}, id=message_id).encode()
+            )
+            yield enc.event("done")
             return
 
         state: Dict[str, Any] = {}
@@ -209,107 +186,93 @@ async def chat_stream(req: ChatRequest):
         config = {"configurable": {"thread_id": req.session_id}}
 
         llm_streamed = False
+        llm_started = False
+        cancelled = False
+        nodes_done: list[str] = []
         error_obj: Optional[BaseException] = None
         llm_text_accum = ""
 
         try:
-            async for step in GRAPH_APP.astream(graph_input, config=config, stream_mode="updates"):
-                if not isinstance(step, dict) or not step:
-                    continue
-                for node_name, node_update in step.items():
-                    if isinstance(node_update, dict):
-                        merge_updates(state, node_update)
-                    else:
-                        state[node_name] = node_update
-
-                    yield SseEvent(
-                        event="state",
-                        data={
-                            "session_id": req.session_id,
-                            "message_id": message_id,
-                            "node": node_name,
-                            "update_keys": list(node_update.keys())
-                            if isinstance(node_update, dict)
-                            else [],
-                        },
-                        id=message_id,
-                    ).encode()
-
-                    # LLM 스트리밍: graph의 composer가 prompt를 준비하면 Bedrock 스트림을 시작
-                    if (not llm_streamed) and isinstance(state.get("api_response"), dict):
-                        prompt = state["api_response"].get("composer_prompt")
-                        if isinstance(prompt, str) and prompt.strip():
-                            try:
-                                if not _has_aws_creds():
-                                    raise RuntimeError(
-                                        "AWS 자격증명이 설정되지 않았습니다. "
-                                        "docker-compose 사용 시 `.env`에 AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY(+AWS_REGION) "
-                                        "또는 EKS(IRSA) 자격증명을 주입하세요."
-                                    )
-                                send, recv = anyio.create_memory_object_stream[str](max_buffer_size=200)
-                                # producer runs in background thread and pushes deltas into `send`
-                                async with recv:
-                                    async with anyio.create_task_group() as tg:
-                                        tg.start_soon(anyio.to_thread.run_sync, _bedrock_stream_to_anyio_send, prompt, send)
-                                        async for d in recv:
-                                            # UI에서 "스트리밍처럼" 보이도록 delta를 잘게 쪼개고 약간의 딜레이를 둡니다.
-                                            # (Bedrock이 큰 덩어리로 빠르게 반환하면 한 번에 보이는 것처럼 느껴질 수 있음)
-                                            step = max(int(SETTINGS.stream_chunk_chars), 1)
-                                            for i in range(0, len(d), step):
-                                                piece = d[i : i + step]
-                                                llm_text_accum += piece
-                                                yield SseEvent(
-                                                    event="token",
-                                                    data={
-                                                        "session_id": req.session_id,
-                                                        "message_id": message_id,
-                                                        "delta": piece,
-                                                    },
-                                                    id=message_id,
-                                                ).encode()
-                                                if SETTINGS.stream_delay_ms > 0:
-                                                    await anyio.sleep(SETTINGS.stream_delay_ms / 1000.0)
-                                # best-effort close send stream after consumption
+            graph_app = await aget_graph_app()
+            with latency_budget_scope(budget):
+                async for mode, step in graph_app.astream(
+                    graph_input, config=config, stream_mode=["updates", "custom"]
+                ):
+                    if mode == "custom":
+                        # 스트리밍 fusion: 추천 style_code가 완성되는 즉시 카드용 이벤트 전송
+                        fusion_code = step.get("fusion_code") if isinstance(step, dict) else None
+                        if isinstance(fusion_code, dict):
+                            yield enc.event("recommendation", fusion_code)
+                        continue
+                    if not isinstance(step, dict) or not step:
+                        continue
+                    for node_name, node_update in step.items():
+                        nodes_done.append(node_name)
+                        if isinstance(node_update, dict):
+                            merge_updates(state, node_update)
+                        else:
+                            state[node_name] = node_update
+
+                        yield enc.event(
+                            "state",
+                            {
+                                "node": node_name,
+                                "update_keys": list(node_update.keys())
+                                if isinstance(node_update, dict)
+                                else [],
+                            },
+                        )
+
+                        # LLM 스트리밍: graph의 composer가 prompt를 준비하면 Bedrock 스트림을 시작
+                        if (not llm_streamed) and isinstance(state.get("api_response"), dict):
+                            prompt = state["api_response"].get("composer_prompt")
+                            if isinstance(prompt, str) and prompt.strip():
                                 try:
-                                    await send.aclose()
+                                    if not has_aws_creds():
+                                        raise RuntimeError(
+                                            "AWS 자격증명이 설정되지 않았습니다. "
+                                            "docker-compose 사용 시 `.env`에 AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY(+AWS_REGION) "
+                                            "또는 EKS(IRSA) 자격증명을 주입하세요."
+                                        )
+                                    llm_started = True
+                                    # sleep 없이: 시간(STREAM_FLUSH_MS)/크기(STREAM_FLUSH_BYTES) 기준으로 delta를 묶어 전송
+                                    async for piece in coalesce_deltas(stream_bedrock_text(prompt), coalescer):
+                                        llm_text_accum += piece
+                                        yield enc.token(piece)
                                 except Exception:
-                                    pass
-                            except Exception:
-                                # fallback: 스트리밍 실패 시, 빈 응답 방지용(간단 chunk)
-                                fallback_text = (
-                                    "추천을 생성하는 중 오류가 발생했습니다. "
-                                    "환경변수(AWS/DSPY_MODEL 등) 설정을 확인한 뒤 다시 시도해 주세요."
-                                )
-                                async for piece in chunk_text(
-                                    fallback_text, SETTINGS.stream_chunk_chars
-                                ):
-                                    llm_text_accum += piece
-                                    yield SseEvent(
-                                        event="token",
-                                        data={
-                                            "session_id": req.session_id,
-                                            "message_id": message_id,
-                                            "delta": piece,
-                                        },
-                                        id=message_id,
-                                    ).encode()
-                            llm_streamed = True
+                                    # fallback: 스트리밍 실패 시, 빈 응답 방지용(간단 chunk)
+                                    fallback_text = (
+                                        "추천을 생성하는 중 오류가 발생했습니다. "
+                                        "환경변수(AWS/DSPY_MODEL 등) 설정을 확인한 뒤 다시 시도해 주세요."
+                                    )
+                                    async for piece in chunk_text(
+                                        fallback_text, SETTINGS.stream_chunk_chars
+                                    ):
+                                        llm_text_accum += piece
+                                        yield enc.token(piece)
+                                llm_streamed = True
+        except (asyncio.CancelledError, GeneratorExit):
+            # 클라이언트 연결 종료: 남은 노드/MCP 호출과 Bedrock 스트림은 취소 전파로 중단됨
+            cancelled = True
+            raise
         except Exception as e:
             error_obj = e
-            yield SseEvent(
-                event="error",
-                data={
-                    "session_id": req.session_id,
-                    "message_id": message_id,
+            yield enc.event(
+                "error",
+                {
                     "error": str(e),
                     "error_type": type(e).__name__,
                 },
-                id=message_id,
-            ).encode()
+            )
         finally:
             api_response = (
                 state.get("api_response") if isinstance(state.get("api_response"), dict) else {}
             )
+            if cancelled:
+                METRICS.inc("chat_cancelled_total")
+                # LLM 스트림 시작 전이면 남은 그래프 노드 + composer 스트림 전체를, 이후면 남은 토큰 생성을 아낌
+                METRICS.inc("chat_cancelled_before_llm" if not llm_started else "chat_cancelled_during_llm")
+                METRICS.observe("chat_cancelled_after_ms", int((time.time() - started_at) * 1000))
             try:
                 structured_products = state.get("structured_data", [])
                 if not isinstance(structured_products, list):
@@ -330,7 +293,7 @@ async def chat_stream(req: ChatRequest):
                             "url": p.get("url"),
                         }
                     )
-                append_jsonl(
+                await LOG_WRITER.write(
                     chat_log_path(),
                     {
                         "ts": utc_now_iso(),
@@ -340,6 +303,8 @@ async def chat_stream(req: ChatRequest):
                         "elapsed_ms": int((time.time() - started_at) * 1000),
                         "error": str(error_obj) if error_obj else None,
                         "error_type": type(error_obj).__name__ if error_obj else None,
+                        "cancelled": cancelled,
+                        "nodes_completed": nodes_done,
                         "structured": {
                             "constraints_used": state.get("structured_constraints_used"),
                             "constraints_attempts": state.get("structured_constraints_attempts", []),
@@ -356,17 +321,15 @@ async def chat_stream(req: ChatRequest):
                         "recommended_products_count": len(
                             api_response.get("recommended_products", []) or []
                         ),
+                        "latency": budget.snapshot(),
+                        "stream": {"token_frames": coalescer.frames, "token_bytes": coalescer.bytes},
                     },
                 )
             except Exception:
                 pass
 
         if error_obj is not None:
-            yield SseEvent(
-                event="done",
-                data={"session_id": req.session_id, "message_id": message_id},
-                id=message_id,
-            ).encode()
+            yield enc.event("done")
             return
 
         # 멀티턴 메모리 저장: assistant 메시지를 thread_id 상태에 반영
@@ -374,7 +337,7 @@ async def chat_stream(req: ChatRequest):
             messages = list(state.get("messages", []))
             if llm_text_accum:
                 messages.append({"role": "assistant", "content": llm_text_accum})
-                await GRAPH_APP.aupdate_state(
+                await graph_app.aupdate_state(
                     config,
                     {
                         "messages": messages,
@@ -385,34 +348,85 @@ async def chat_stream(req: ChatRequest):
         except Exception:
             pass
 
-        yield SseEvent(
-            event="final",
-            data={
-                "session_id": req.session_id,
-                "message_id": message_id,
+        yield enc.event(
+            "final",
+            {
                 "elapsed_ms": int((time.time() - started_at) * 1000),
                 "recommended_products": api_response.get("recommended_products", []),
                 "grouped_recommended_products": api_response.get("grouped_recommended_products", {}),
                 "recommended_style_codes": api_response.get("recommended_style_codes", []),
+                "degradations": list(budget.degradations),
             },
-            id=message_id,
-        ).encode()
-
-        yield SseEvent(
-            event="done",
-            data={"session_id": req.session_id, "message_id": message_id},
-            id=message_id,
-        ).encode()
-
-    return StreamingResponse(
-        event_iter(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        )
+
+        yield enc.event("done")
+
+    # 턴은 연결과 분리된 task로 실행하고, 이 연결은 replay 버퍼의 구독자로 붙습니다.
+    turn = TURNS.create(message_id, req.session_id, enc)
+    # 턴은 전송을 기다리지 않으므로, 구독 연결의 실제 전송 시간으로 token 프레임 크기를 조정
+    turn.send_observer = coalescer.observe_send
+    turn.start(_released(ticket, event_iter()))
+    return _stream_response(request, turn, after_seq=0)
+
+
+@router.get("/v1/chat/stream/{message_id}")
+async def chat_stream_resume(
+    message_id: str,
+    request: Request,
+    session_id: str = Query(..., description="턴을 시작한 session_id(다른 세션의 턴은 재전송하지 않음)"),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """진행 중이거나 끝난 턴에 다시 붙습니다(EventSource 재연결용). `Last-Event-ID` 이후 이벤트만 재전송."""
+    turn = TURNS.get(message_id)
+    if turn is None:
+        raise HTTPException(status_code=404, detail="stream not found or expired")
+    if turn.session_id != session_id:
+        raise HTTPException(status_code=409, detail="message_id belongs to another session")
+    resume = parse_last_event_id(last_event_id)
+    after_seq = resume[1] if resume is not None and resume[0] == message_id else 0
+    METRICS.inc("sse_resumes")
+    return _stream_response(request, turn, after_seq=after_seq)
+
+
+class ChatBatchItem(BaseModel):
+    user_query: str
+    session_id: Optional[str] = Field(default=None, description="같은 session_id 항목은 순서대로 멀티턴 실행")
+
+
+class ChatBatchRequest(BaseModel):
+    items: list[ChatBatchItem]
+    concurrency: int = Field(default=4, ge=1, description="동시 실행 수(CHAT_BATCH_MAX_CONCURRENCY로 제한)")
+    with_text: bool = Field(default=False, description="composer 텍스트까지 생성(Bedrock 호출)")
+    latency_budget_ms: Optional[int] = None
+    async_run: bool = Field(default=False, description="job으로 실행하고 job_id 반환(CHAT_BATCH_SYNC_MAX_ITEMS 초과 시 항상)")
+
+
+@router.post("/v1/chat/batch")
+async def chat_batch(req: ChatBatchRequest) -> dict:
+    if len(req.items) > SETTINGS.chat_batch_max_items:
+        raise HTTPException(
+            status_code=413, detail=f"items는 최대 {SETTINGS.chat_batch_max_items}개까지 가능합니다."
+        )
+    concurrency = min(req.concurrency, SETTINGS.chat_batch_max_concurrency)
+    items = [item.model_dump() for item in req.items]
+    if req.async_run or len(items) > SETTINGS.chat_batch_sync_max_items:
+        params = {
+            "items": items,
+            "concurrency": concurrency,
+            "with_text": req.with_text,
+            "latency_budget_ms": req.latency_budget_ms,
+        }
+        job = JOBS.submit("chat_batch", params)
+        return {"ok": True, "concurrency": concurrency, "job_id": job.job_id}
+    # 요청 안에서 실행하는 작은 배치: 항목마다 admission 티켓(채팅 턴과 같은 전역 한도)
+    results = await run_batch(
+        items,
+        concurrency,
+        with_text=req.with_text,
+        latency_budget_ms=req.latency_budget_ms,
+        admission=ADMISSION,
     )
+    return {"ok": True, "concurrency": concurrency, "summary": summarize(results), "results": results}
 
 
 class FeedbackRequest(BaseModel):
@@ -425,7 +439,7 @@ class FeedbackRequest(BaseModel):
 
 @router.post("/v1/feedback")
 async def feedback(req: FeedbackRequest) -> dict:
-    append_jsonl(
+    await LOG_WRITER.write(
         feedback_log_path(),
         {
             "ts": utc_now_iso(),
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..core.config import SETTINGS
+from ..core.metrics import METRICS
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class StartupReport:
+    """import/warm-up 단계별 소요 시간과 결과. `/ready`가 이 상태로 준비 여부를 판단합니다."""
+
+    def __init__(self) -> None:
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.warmup_enabled = SETTINGS.warmup_on_startup
+        self.warmup_started = False
+        self.warmup_finished = False
+
+    def record(
+        self, name: str, ms: float, ok: bool = True, error: Optional[str] = None, required: bool = True
+    ) -> None:
+        self.steps[name] = {"ms": int(ms), "ok": ok, "error": error, "required": required}
+        METRICS.observe(f"startup_{name}_ms", ms)
+        if ok:
+            logger.info("startup %s: %dms", name, ms)
+        else:
+            logger.warning("startup %s failed after %dms: %s", name, ms, error)
+
+    @property
+    def ready(self) -> bool:
+        if not self.warmup_enabled:
+            # lazy 모드(admin/health 전용 프로세스 등): 첫 요청이 필요한 것을 로드
+            return True
+        if not self.warmup_finished:
+            return False
+        return all(s["ok"] for s in self.steps.values() if s.get("required"))
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "mode": "warm" if self.warmup_enabled else "lazy",
+            "warmup_started": self.warmup_started,
+            "warmup_finished": self.warmup_finished,
+            "steps": dict(self.steps),
+        }
+
+
+STARTUP = StartupReport()
+
+_GRAPH_APP: Any = None
+_GRAPH_LOCK = threading.Lock()
+
+
+def get_graph_app() -> Any:
+    """
+    컴파일된 LangGraph 앱(지연 import).
+
+    `graph.shopping_graph`는 dspy/langgraph/mcp를 import하고 모듈 로드 시 그래프를 컴파일하므로,
+    health/admin 전용 프로세스에서는 실제로 필요할 때까지 불러오지 않습니다.
+    """
+    global _GRAPH_APP
+    if _GRAPH_APP is not None:
+        return _GRAPH_APP
+    with _GRAPH_LOCK:
+        if _GRAPH_APP is None:
+            t0 = time.perf_counter()
+            from ..graph.shopping_graph import GRAPH_APP
+
+            _GRAPH_APP = GRAPH_APP
+            if "import_graph" not in STARTUP.steps:
+                STARTUP.record("import_graph", (time.perf_counter() - t0) * 1000)
+    return _GRAPH_APP
+
+
+async def aget_graph_app() -> Any:
+    """이벤트 루프를 막지 않도록, 아직 로드 전이면 워커 스레드에서 import."""
+    if _GRAPH_APP is not None:
+        return _GRAPH_APP
+    return await asyncio.to_thread(get_graph_app)
+
+
+def _configure_lm() -> None:
+    from ..dspy_modules.intent import ensure_dspy_configured
+
+    ensure_dspy_configured(model=SETTINGS.dspy_model)
+
+
+def _load_artifacts() -> None:
+    from ..core.artifacts import reload_all
+
+    reload_all()
+
+
+def _bedrock_client() -> None:
+    from ..integrations.bedrock import get_bedrock_client, has_aws_creds
+
+    if not has_aws_creds():
+        raise RuntimeError("AWS credentials not configured")
+    get_bedrock_client()
+
+
+async def _probe_mcp() -> None:
+    from ..integrations.mcp_tools import probe_mcp_servers
+
+    await asyncio.wait_for(probe_mcp_servers(), timeout=SETTINGS.warmup_mcp_timeout_s)
+
+
+async def _run_step(name: str, fn: Callable[[], Any], required: bool) -> None:
+    t0 = time.perf_counter()
+    try:
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        STARTUP.record(
+            name,
+            (time.perf_counter() - t0) * 1000,
+            ok=False,
+            error=f"{type(e).__name__}: {e}",
+            required=required,
+        )
+        return
+    STARTUP.record(name, (time.perf_counter() - t0) * 1000, required=required)
+
+
+async def warm_up() -> None:
+    """
+    트래픽을 받기 전에 첫 요청이 치르던 비용을 미리 치릅니다.
+
+    - 그래프 import/컴파일, DSPy LM 설정, 모든 DSPy artifact 로드(필수)
+    - Bedrock 클라이언트 생성, MCP 서버 연결/initialize 확인(선택: 실패해도 준비 상태는 유지하고 결과만 보고)
+    """
+    STARTUP.warmup_started = True
+    t0 = time.perf_counter()
+    await _run_step("graph", lambda: asyncio.to_thread(get_graph_app), required=True)
+    await _run_step("dspy_lm", lambda: asyncio.to_thread(_configure_lm), required=True)
+    await _run_step("artifacts", lambda: asyncio.to_thread(_load_artifacts), required=True)
+    await _run_step("bedrock_client", lambda: asyncio.to_thread(_bedrock_client), required=False)
+    await _run_step("mcp", _probe_mcp, required=False)
+    STARTUP.warmup_finished = True
+    STARTUP.record("warmup_total", (time.perf_counter() - t0) * 1000, required=False)
@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import SETTINGS
+from .log_segments import segmented_log
+from .storage import chat_log_path
+
+# 재계산 중에도 진행 상황을 저장하는 간격(레코드 수)
+_SAVE_EVERY_RECORDS = 50000
+# 집계 규칙이 바뀌면 올림: 저장된 상태의 버전이 다르면 처음부터 다시 집계
+_STATE_VERSION = 2
+
+
+class QuantileSketch:
+    """
+    상대 오차 `alpha` 보장 quantile sketch(DDSketch 방식: 로그 스케일 버킷 카운트).
+
+    값 x는 `ceil(log_gamma(x))` 버킷에 들어가며, 버킷 대표값은 실제 값과 최대 alpha만큼 차이 납니다.
+    버킷 수는 값의 범위(ms 단위 지연이면 수백 개)에만 비례하고, 같은 alpha끼리 merge 가능합니다.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self.zeros += 1
+            return
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen > rank:
+                return 2 * self.gamma**idx / (self.gamma + 1)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "alpha": self.alpha,
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "zeros": self.zeros,
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(alpha=float(data.get("alpha", 0.01)))
+        sketch.buckets = {int(k): int(v) for k, v in (data.get("buckets") or {}).items()}
+        sketch.zeros = int(data.get("zeros", 0))
+        sketch.count = int(data.get("count", 0))
+        sketch.sum = float(data.get("sum", 0.0))
+        sketch.max = float(data.get("max", 0.0))
+        return sketch
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K sketch.
+
+    최대 `k`개 항목만 추적하고, 가득 찼을 때 새 항목은 최소 카운트 항목을 밀어내고 그 카운트+1로 시작합니다.
+    `count - error`는 실제 빈도의 하한이고, `count`는 상한입니다.
+    count별 항목 집합을 유지해 추가 한 번이 O(1)입니다.
+    """
+
+    def __init__(self, k: int):
+        self.k = max(k, 1)
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._min = 0
+
+    def add(self, item: str, n: int = 1) -> None:
+        count = self.counts.get(item)
+        if count is not None:
+            self._move(item, count, count + n)
+            return
+        if len(self.counts) < self.k:
+            self.counts[item] = n
+            self.errors[item] = 0
+            self._buckets.setdefault(n, {})[item] = None
+            self._min = n if len(self.counts) == 1 else min(self._min, n)
+            return
+        bucket = self._buckets[self._min]
+        victim, _ = bucket.popitem()
+        floor = self._min
+        if not bucket:
+            del self._buckets[floor]
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[item] = floor + n
+        self.errors[item] = floor
+        self._buckets.setdefault(floor + n, {})[item] = None
+        self._min = min(self._buckets)
+
+    def _move(self, item: str, old: int, new: int) -> None:
+        bucket = self._buckets[old]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[old]
+        self._buckets.setdefault(new, {})[item] = None
+        self.counts[item] = new
+        if old == self._min and old not in self._buckets:
+            self._min = min(self._buckets)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        """두 sketch를 합침(근사). 상위 k개만 남깁니다."""
+        counts = dict(self.counts)
+        errors = dict(self.errors)
+        for item, n in other.counts.items():
+            counts[item] = counts.get(item, 0) + n
+            errors[item] = errors.get(item, 0) + other.errors.get(item, 0)
+        self._load(counts, errors)
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        items = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[: max(n, 0)]
+        return [{"value": item, "count": count, "error": self.errors.get(item, 0)} for item, count in items]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "counts": self.counts, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], k: Optional[int] = None) -> "SpaceSaving":
+        sketch = cls(k or int(data.get("k", 100)))
+        sketch._load(
+            {str(i): int(c) for i, c in (data.get("counts") or {}).items()},
+            {str(i): int(e) for i, e in (data.get("errors") or {}).items()},
+        )
+        return sketch
+
+    def _load(self, counts: Dict[str, int], errors: Dict[str, int]) -> None:
+        kept = sorted(counts.items(), key=lambda kv: -kv[1])[: self.k]
+        self.counts = dict(kept)
+        self.errors = {item: errors.get(item, 0) for item in self.counts}
+        self._buckets = {}
+        for item, count in self.counts.items():
+            self._buckets.setdefault(count, {})[item] = None
+        self._min = min(self._buckets) if self._buckets else 0
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize_query(q: Any) -> Optional[str]:
+    if not isinstance(q, str):
+        return None
+    q = _WS_RE.sub(" ", q).strip().lower()
+    return q[:200] or None
+
+
+def _constraint_items(constraints: Any) -> Iterable[str]:
+    # chat 로그의 constraints_used는 정형검색 제약 문장(str). dict 형태(key=value)도 받음
+    if isinstance(constraints, str):
+        text = _normalize_query(constraints)
+        return [text] if text else []
+    if not isinstance(constraints, dict):
+        return []
+    items: List[str] = []
+    for key, value in constraints.items():
+        if value in (None, "", [], {}):
+            continue
+        values = value if isinstance(value, list) else [value]
+        for v in values:
+            if isinstance(v, (dict, list)):
+                v = json.dumps(v, ensure_ascii=False, sort_keys=True)
+            items.append(f"{key}={str(v)[:100]}")
+    return items
+
+
+class Aggregate:
+    """chat 로그 레코드 묶음(전체 또는 하루)의 집계."""
+
+    def __init__(self, topk: int):
+        self.topk = topk
+        self.count = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.fallback = 0
+        self.zero_rows = 0
+        self.error_types: Dict[str, int] = {}
+        self.elapsed = QuantileSketch()
+        self.queries = SpaceSaving(topk)
+        self.constraints = SpaceSaving(topk)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.count += 1
+        error_type = record.get("error_type")
+        if error_type:
+            self.errors += 1
+            self.error_types[error_type] = self.error_types.get(error_type, 0) + 1
+        if record.get("cancelled"):
+            self.cancelled += 1
+        elapsed = record.get("elapsed_ms")
+        if isinstance(elapsed, (int, float)):
+            self.elapsed.add(float(elapsed))
+        structured = record.get("structured") if isinstance(record.get("structured"), dict) else {}
+        if structured.get("fallback_used"):
+            self.fallback += 1
+        if not error_type and not record.get("cancelled") and structured.get("rows_count") == 0:
+            self.zero_rows += 1
+        query = _normalize_query(record.get("user_query"))
+        if query:
+            self.queries.add(query)
+        for item in _constraint_items(structured.get("constraints_used")):
+            self.constraints.add(item)
+
+    def merge(self, other: "Aggregate") -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.cancelled += other.cancelled
+        self.fallback += other.fallback
+        self.zero_rows += other.zero_rows
+        for k, v in other.error_types.items():
+            self.error_types[k] = self.error_types.get(k, 0) + v
+        self.elapsed.merge(other.elapsed)
+        self.queries.merge(other.queries)
+        self.constraints.merge(other.constraints)
+
+    def report(self, top: int) -> Dict[str, Any]:
+        n = self.count
+
+        def rate(x: int) -> float:
+            return round(x / n, 4) if n else 0.0
+
+        e = self.elapsed
+        return {
+            "count": n,
+            "elapsed_ms": {
+                "p50": int(e.quantile(0.5)),
+                "p90": int(e.quantile(0.9)),
+                "p95": int(e.quantile(0.95)),
+                "p99": int(e.quantile(0.99)),
+                "max": int(e.max),
+                "avg": int(e.sum / e.count) if e.count else 0,
+            },
+            "error_rate": rate(self.errors),
+            "cancelled_rate": rate(self.cancelled),
+            "fallback_rate": rate(self.fallback),
+            "zero_row_rate": rate(self.zero_rows),
+            "errors": dict(sorted(self.error_types.items(), key=lambda kv: -kv[1])),
+            "top_queries": self.queries.top(top),
+            "top_constraints": self.constraints.top(top),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "fallback": self.fallback,
+            "zero_rows": self.zero_rows,
+            "error_types": self.error_types,
+            "elapsed": self.elapsed.to_dict(),
+            "queries": self.queries.to_dict(),
+            "constraints": self.constraints.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], topk: int) -> "Aggregate":
+        agg = cls(topk)
+        agg.count = int(data.get("count", 0))
+        agg.errors = int(data.get("errors", 0))
+        agg.cancelled = int(data.get("cancelled", 0))
+        agg.fallback = int(data.get("fallback", 0))
+        agg.zero_rows = int(data.get("zero_rows", 0))
+        agg.error_types = {str(k): int(v) for k, v in (data.get("error_types") or {}).items()}
+        agg.elapsed = QuantileSketch.from_dict(data.get("elapsed") or {})
+        agg.queries = SpaceSaving.from_dict(data.get("queries") or {}, topk)
+        agg.constraints = SpaceSaving.from_dict(data.get("constraints") or {}, topk)
+        return agg
+
+
+class LogAnalytics:
+    """
+    chat 로그 운영 지표를 증분 집계합니다(`<log>.analytics.json`에 상태 저장).
+
+    - 마지막으로 집계한 논리 오프셋(`log_segments`) 이후에 추가된 줄만 읽어 전체/일별 Aggregate에 반영
+    - 조회는 저장된 sketch를 합쳐 보고만 하므로 로그 크기와 무관하게 빠름
+    - 일별 집계는 `days_kept`일만 보관(기간 조회용), 전체 집계는 계속 누적
+    """
+
+    def __init__(self, log_path: Path, topk: int, days_kept: int):
+        self.log_path = log_path
+        self.state_path = log_path.with_name(log_path.name + ".analytics.json")
+        self.topk = max(topk, 1)
+        self.days_kept = max(days_kept, 1)
+        self._log = segmented_log(log_path)
+        self._lock = threading.Lock()
+        self.offset = 0
+        self.total = Aggregate(self.topk)
+        self.days: Dict[str, Aggregate] = {}
+        self._loaded = False
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if data.get("version") != _STATE_VERSION:
+            return
+        self.offset = int(data.get("offset", 0))
+        self.total = Aggregate.from_dict(data.get("total") or {}, self.topk)
+        self.days = {d: Aggregate.from_dict(a, self.topk) for d, a in (data.get("days") or {}).items()}
+
+    def _save(self) -> None:
+        data = {
+            "version": _STATE_VERSION,
+            "offset": self.offset,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "total": self.total.to_dict(),
+            "days": {d: a.to_dict() for d, a in self.days.items()},
+        }
+        tmp = self.state_path.with_suffix(".tmp")
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    def refresh(self) -> Tuple[int, int]:
+        """새 레코드를 집계하고 (반영한 레코드 수, 현재 오프셋)을 반환."""
+        with self._lock:
+            self._load()
+            manifest = self._log.manifest()
+            if self._log.size(manifest) < self.offset:
+                # 로그가 초기화/교체됨: 처음부터 다시 집계
+                self.offset = 0
+                self.total = Aggregate(self.topk)
+                self.days = {}
+            added = 0
+            offset = self.offset
+            for pos, raw in self._log.iter_lines(offset):
+                offset = pos + len(raw) + 1
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except Exception:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                self.total.add(record)
+                day = str(record.get("ts") or "")[:10]
+                if day:
+                    agg = self.days.get(day)
+                    if agg is None:
+                        agg = self.days[day] = Aggregate(self.topk)
+                    agg.add(record)
+                added += 1
+                if added % _SAVE_EVERY_RECORDS == 0:
+                    self.offset = offset
+                    self._save()
+            if offset != self.offset or added:
+                self.offset = offset
+                for day in sorted(self.days)[: -self.days_kept]:
+                    del self.days[day]
+                self._save()
+            return added, self.offset
+
+    def report(self, days: int = 0, top: int = 20) -> Dict[str, Any]:
+        """`days`=0이면 전체 누적, 아니면 최근 `days`일(UTC, 오늘 포함)을 합친 지표."""
+        t0 = time.perf_counter()
+        added, offset = self.refresh()
+        with self._lock:
+            if days and days > 0:
+                since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+                agg = Aggregate(self.topk)
+                for day, day_agg in self.days.items():
+                    if day >= since:
+                        agg.merge(day_agg)
+                window = {"days": days, "since": since}
+            else:
+                agg = self.total
+                window = {"days": 0}
+            body = agg.report(top)
+        return {
+            "window": window,
+            **body,
+            "analytics": {
+                "offset": offset,
+                "lag_bytes": max(self._log.size() - offset, 0),
+                "new_records": added,
+                "days_range": sorted(self.days)[:1] + sorted(self.days)[-1:],
+                "took_ms": int((time.perf_counter() - t0) * 1000),
+            },
+        }
+
+
+_ANALYTICS: Dict[Path, LogAnalytics] = {}
+_ANALYTICS_LOCK = threading.Lock()
+
+
+def chat_analytics() -> LogAnalytics:
+    """현재 chat 로그 경로(AGENT_DATA_DIR 기준)에 대한 프로세스 공용 집계."""
+    path = chat_log_path()
+    with _ANALYTICS_LOCK:
+        analytics = _ANALYTICS.get(path)
+        if analytics is None:
+            analytics = LogAnalytics(path, topk=SETTINGS.analytics_topk, days_kept=SETTINGS.analytics_days_kept)
+            _ANALYTICS[path] = analytics
+        return analytics
@@ -76,17 +76,90 @@ class Settings:
 
     # DSPy / LLM
     dspy_model: str = _env("DSPY_MODEL")
+    # compile: optimizer의 후보 평가 thread 수 / LM 호출 제한(분당 호출 수, 동시 호출 수; 0이면 무제한)
+    compile_num_threads: int = int(_env("COMPILE_NUM_THREADS", "8"))
+    compile_lm_rpm: float = float(_env("COMPILE_LM_RPM", "0"))
+    compile_lm_max_concurrency: int = int(_env("COMPILE_LM_MAX_CONCURRENCY", "8"))
+    # incremental compile: 최대 round 수 / 개선 없는 round가 이만큼 이어지면 조기 종료 / 기존 예제 regression sample 수
+    compile_incremental_max_rounds: int = int(_env("COMPILE_INCREMENTAL_MAX_ROUNDS", "6"))
+    compile_incremental_patience: int = int(_env("COMPILE_INCREMENTAL_PATIENCE", "2"))
+    compile_incremental_regression_sample: int = int(_env("COMPILE_INCREMENTAL_REGRESSION_SAMPLE", "20"))
+    # compile 예산(job 단위 기본값; 0이면 무제한): LM 실제 호출 수 / 토큰 수 / 경과 시간(s). 넘으면 최선 후보 저장 후 종료
+    compile_max_lm_calls: int = int(_env("COMPILE_MAX_LM_CALLS", "0"))
+    compile_max_tokens: int = int(_env("COMPILE_MAX_TOKENS", "0"))
+    compile_max_seconds: float = float(_env("COMPILE_MAX_SECONDS", "0"))
+    # LM 응답 디스크 캐시(compile/평가): off | on | replay(miss면 실패, 오프라인 재현) | record(항상 호출 후 덮어씀)
+    lm_cache_mode: str = _env("LM_CACHE_MODE", "on").strip().lower()
+    # 빈 값이면 <AGENT_DATA_DIR>/lm_cache/lm_cache.sqlite. 최대 크기(bytes, 0이면 무제한)
+    lm_cache_path: str = _env("LM_CACHE_PATH", "")
+    lm_cache_max_bytes: int = int(_env("LM_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # 평가(evaluate) 기본 캐시 모드. 캐시 hit 호출은 지연/토큰이 0에 가까워 지표가 왜곡되므로 기본 off
+    # (평가 LM은 DSPy 자체 캐시도 끔)
+    eval_lm_cache_mode: str = _env("EVAL_LM_CACHE_MODE", "off").strip().lower()
+    # 서빙 LM도 같은 캐시 사용(on 모드). 같은 입력에 같은 응답을 돌려주므로 기본 비활성
+    lm_cache_serving: bool = _env("LM_CACHE_SERVING", "false").strip().lower() == "true"
 
     # API
     memory_max_turns: int = int(_env("MEMORY_MAX_TURNS", "6"))
     stream_chunk_chars: int = int(_env("STREAM_CHUNK_CHARS", "24"))
-    stream_delay_ms: int = int(_env("STREAM_DELAY_MS", "15"))
+    # token 프레임 coalescing: 미전송 텍스트를 최대 STREAM_FLUSH_MS 동안 모으거나 STREAM_FLUSH_BYTES 이상이면 전송
+    stream_flush_ms: int = int(_env("STREAM_FLUSH_MS", "50"))
+    stream_flush_bytes: int = int(_env("STREAM_FLUSH_BYTES", "256"))
+    # 요청당 지연 예산(ms). 0(기본)이면 예산 없음(degradation 비활성). 환경별로 켬(예: 30000)
+    latency_budget_ms: int = int(_env("LATENCY_BUDGET_MS", "0"))
+    # FusionDecisionMaker 출력을 스트리밍 파싱해 추천 style_code를 완성되는 즉시 내보냄
+    fusion_streaming: bool = _env("FUSION_STREAMING", "true").strip().lower() == "true"
+    # SSE 클라이언트 연결 종료 감지 주기(ms). 모든 연결이 끊기고 SSE_RESUME_GRACE_MS가 지나면 턴을 취소
+    disconnect_poll_ms: int = int(_env("DISCONNECT_POLL_MS", "500"))
+    # 재연결(Last-Event-ID) 지원: 턴별 이벤트 ring buffer 크기 / 완료 턴 보관 시간(s) / 최대 보관 턴 수
+    sse_replay_max_events: int = int(_env("SSE_REPLAY_MAX_EVENTS", "2048"))
+    sse_replay_ttl_s: int = int(_env("SSE_REPLAY_TTL_S", "300"))
+    sse_replay_max_turns: int = int(_env("SSE_REPLAY_MAX_TURNS", "1000"))
+    # 모든 연결이 끊긴 뒤 재연결을 기다리는 시간(ms). 지나면 턴(그래프/Bedrock)을 취소
+    sse_resume_grace_ms: int = int(_env("SSE_RESUME_GRACE_MS", "15000"))
+    # 채팅 동시 실행 제어: 전역 동시 턴 수 / 대기열 크기 / 대기 타임아웃(ms, 0이면 무제한)
+    chat_max_concurrent: int = int(_env("CHAT_MAX_CONCURRENT", "16"))
+    chat_max_queue: int = int(_env("CHAT_MAX_QUEUE", "64"))
+    chat_queue_timeout_ms: int = int(_env("CHAT_QUEUE_TIMEOUT_MS", "30000"))
+    # 같은 세션에 진행 중인 턴이 있을 때: queue(대기) | reject(429)
+    chat_session_policy: str = _env("CHAT_SESSION_POLICY", "queue").strip().lower()
+    # /v1/chat/batch 제한(요청당 항목 수 / 최대 동시 실행 수)
+    chat_batch_max_items: int = int(_env("CHAT_BATCH_MAX_ITEMS", "500"))
+    chat_batch_max_concurrency: int = int(_env("CHAT_BATCH_MAX_CONCURRENCY", "8"))
+    # 항목 수가 이보다 많으면(또는 async_run=true) 요청 안에서 실행하지 않고 worker process job(chat_batch)으로 실행
+    chat_batch_sync_max_items: int = int(_env("CHAT_BATCH_SYNC_MAX_ITEMS", "50"))
     frontend_origins: List[str] = field(
         default_factory=lambda: _env_list(
             "FRONTEND_ORIGINS", ["http://localhost:3000", "http://127.0.0.1:3000"]
         )
     )
 
+    # Bedrock (composer 스트리밍)
+    bedrock_max_pool_connections: int = int(_env("BEDROCK_MAX_POOL_CONNECTIONS", "50"))
+    bedrock_stream_threads: int = int(_env("BEDROCK_STREAM_THREADS", "64"))
+
+    # chat/feedback JSONL 로그 writer (백그라운드 group commit)
+    log_queue_size: int = int(_env("LOG_QUEUE_SIZE", "10000"))
+    log_flush_records: int = int(_env("LOG_FLUSH_RECORDS", "256"))
+    log_flush_ms: int = int(_env("LOG_FLUSH_MS", "200"))
+    # off | batch | interval
+    log_fsync: str = _env("LOG_FSYNC", "off").strip().lower()
+    log_fsync_interval_ms: int = int(_env("LOG_FSYNC_INTERVAL_MS", "1000"))
+    # queue가 가득 찼을 때: block(대기) | drop(버리고 카운트)
+    log_queue_full_policy: str = _env("LOG_QUEUE_FULL_POLICY", "block").strip().lower()
+    # 로그 회전: 현재 파일 크기/경과 시간 기준(0이면 해당 조건 비활성), gzip 블록 크기/압축 레벨
+    log_rotate_bytes: int = int(_env("LOG_ROTATE_BYTES", str(256 * 1024 * 1024)))
+    log_rotate_interval_s: float = float(_env("LOG_ROTATE_INTERVAL_S", "86400"))
+    log_segment_block_bytes: int = int(_env("LOG_SEGMENT_BLOCK_BYTES", str(1024 * 1024)))
+    log_compress_level: int = int(_env("LOG_COMPRESS_LEVEL", "6"))
+    # 압축 세그먼트 보존: 기간(일) / 전체 용량(bytes). 0이면 무제한
+    log_retention_days: float = float(_env("LOG_RETENTION_DAYS", "90"))
+    log_retention_bytes: int = int(_env("LOG_RETENTION_BYTES", "0"))
+
+    # /admin/analytics: top-K sketch 크기 / 일별 집계 보관 일수
+    analytics_topk: int = int(_env("ANALYTICS_TOPK", "100"))
+    analytics_days_kept: int = int(_env("ANALYTICS_DAYS_KEPT", "90"))
+
     # DSPy artifacts
     dspy_artifacts_dir: str = _env("DSPY_ARTIFACTS_DIR", "agent/artifacts")
     artifact_relaxed_constraints: str = _env(
@@ -95,6 +168,20 @@ class Settings:
     artifact_product_ranker: str = _env("DSPY_ARTIFACT_PRODUCT_RANKER", "product_ranker.json")
     artifact_fusion_decision: str = _env("DSPY_ARTIFACT_FUSION_DECISION", "fusion_decision.json")
 
+    # 시작 시 warm-up(그래프/LM/artifact/Bedrock/MCP). false면 필요할 때 로드(lazy, admin/health 전용 프로세스용)
+    warmup_on_startup: bool = _env("WARMUP_ON_STARTUP", "true").strip().lower() == "true"
+    warmup_mcp_timeout_s: float = float(_env("WARMUP_MCP_TIMEOUT_S", "10"))
+
+    # Admin jobs (dataset build / compile): worker process 수, 보관 개수/기간, 취소 시 SIGKILL까지 유예
+    job_max_workers: int = int(_env("JOB_MAX_WORKERS", "1"))
+    job_keep: int = int(_env("JOB_KEEP", "200"))
+    job_ttl_s: float = float(_env("JOB_TTL_S", "604800"))
+    job_cancel_grace_s: float = float(_env("JOB_CANCEL_GRACE_S", "5"))
+    # /admin/jobs/{id}/stream: 로그 poll 주기 / 공유 프레임 buffer 크기 / idle ping 주기(s)
+    job_stream_poll_ms: int = int(_env("JOB_STREAM_POLL_MS", "250"))
+    job_stream_buffer_lines: int = int(_env("JOB_STREAM_BUFFER_LINES", "2000"))
+    job_stream_ping_s: float = float(_env("JOB_STREAM_PING_S", "15"))
+
     # Admin
     admin_api_key: str = _env("ADMIN_API_KEY", "")
 
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import hashlib
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Set
 
 from .storage import ensure_dir, get_data_dir, utc_now_iso
 
@@ -51,6 +52,19 @@ def load_curation_state() -> CurationState:
     return CurationState(excluded_message_ids=excluded, quality_labels=quality, updated_at=updated_at)
 
 
+def curation_excluded(state: CurationState) -> Set[str]:
+    """학습 데이터에서 뺄 message_id(명시적 제외 + quality "bad")."""
+    excluded = set(state.excluded_message_ids)
+    excluded |= {mid for mid, v in state.quality_labels.items() if v == "bad"}
+    return excluded
+
+
+def curation_version(state: CurationState) -> str:
+    """데이터셋 결과에 영향을 주는 curation 내용(제외 집합)의 해시. 바뀌면 데이터셋을 다시 빌드해야 함."""
+    payload = json.dumps(sorted(curation_excluded(state)), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
 def save_curation_state(state: CurationState) -> Path:
     path = curation_state_path()
     ensure_dir(path.parent)
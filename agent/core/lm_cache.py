@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import SETTINGS
+from .storage import get_data_dir
+
+# 캐시 모드
+#  - off: 사용 안 함
+#  - on: 조회 후 miss면 호출하고 저장
+#  - replay: 조회만. miss면 LMCacheMiss(네트워크 없이 결정적으로 재현)
+#  - record: 항상 호출하고 결과로 덮어씀(캐시 갱신)
+CACHE_MODES = ("off", "on", "replay", "record")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+"""
+
+# 키에서 제외하는 LM 인자(응답 내용과 무관)
+_IGNORED_KWARGS = {"cache", "num_retries", "api_key", "api_base", "timeout"}
+
+
+class LMCacheMiss(RuntimeError):
+    """replay 모드에서 캐시에 없는 LM 호출."""
+
+
+def lm_cache_key(model: str, prompt: Any, messages: Any, kwargs: Dict[str, Any]) -> str:
+    """모델 + 프롬프트/메시지 + 샘플링 인자(temperature, max_tokens, rollout_id 등)의 해시."""
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "messages": messages,
+        "kwargs": {k: v for k, v in kwargs.items() if k not in _IGNORED_KWARGS},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LMCache:
+    """
+    LM 응답 디스크 캐시(SQLite, 기본 `<AGENT_DATA_DIR>/lm_cache/lm_cache.sqlite`).
+
+    - 값은 응답 dict를 zlib 압축한 JSON. compile/평가/서빙 프로세스가 같은 파일을 공유(WAL)
+    - 전체 크기가 `max_bytes`를 넘으면 마지막 사용 시각이 오래된 항목부터 90%까지 삭제(0이면 무제한)
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 0):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conn = self._db()
+            row = conn.execute("SELECT response FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with conn:
+                conn.execute(
+                    "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+                )
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        blob = zlib.compress(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                old = conn.execute("SELECT bytes FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, model, response, bytes, created_at, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (key, model, blob, len(blob), now, now),
+                )
+            self.writes += 1
+            if self.max_bytes > 0:
+                if self._bytes is None:
+                    self._bytes = self._total_bytes(conn)
+                else:
+                    self._bytes += len(blob) - (old[0] if old else 0)
+                if self._bytes > self.max_bytes:
+                    self._evict(conn)
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        return int(conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0])
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # 다른 프로세스도 쓰므로 실제 합계로 다시 계산한 뒤, 오래 안 쓴 항목부터 목표치까지 삭제
+        total = self._total_bytes(conn)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        with conn:
+            for key, size in conn.execute("SELECT key, bytes FROM entries ORDER BY last_used").fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= int(size)
+                removed += 1
+        self._bytes = total
+        self.evictions += removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._db()
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+            return {
+                "path": str(self.path),
+                "entries": int(entries),
+                "bytes": int(total),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+
+def lm_cache_path() -> Path:
+    if SETTINGS.lm_cache_path:
+        return Path(SETTINGS.lm_cache_path)
+    return get_data_dir() / "lm_cache" / "lm_cache.sqlite"
+
+
+_CACHE: Optional[LMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def lm_cache() -> LMCache:
+    """프로세스 공용 LM 캐시."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LMCache(lm_cache_path(), max_bytes=SETTINGS.lm_cache_max_bytes)
+        return _CACHE
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .log_segments import segmented_log
+from .storage import chat_log_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS rows (
+    offset INTEGER PRIMARY KEY,
+    length INTEGER NOT NULL,
+    message_id TEXT,
+    session_id TEXT,
+    ts TEXT,
+    error_type TEXT,
+    fallback_used INTEGER,
+    cancelled INTEGER,
+    elapsed_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS rows_message_id ON rows(message_id);
+CREATE INDEX IF NOT EXISTS rows_session_id ON rows(session_id, offset);
+CREATE INDEX IF NOT EXISTS rows_ts ON rows(ts);
+CREATE INDEX IF NOT EXISTS rows_error_type ON rows(error_type, offset);
+CREATE INDEX IF NOT EXISTS rows_fallback ON rows(fallback_used, offset);
+"""
+
+# 증분 색인 시 한 트랜잭션에 넣는 최대 줄 수(최초 대용량 색인 때 메모리 사용량 상한)
+_REFRESH_BATCH_LINES = 20000
+
+
+def _row_fields(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    structured = record.get("structured") if isinstance(record.get("structured"), dict) else {}
+    elapsed = record.get("elapsed_ms")
+    return (
+        record.get("message_id"),
+        record.get("session_id"),
+        record.get("ts"),
+        record.get("error_type"),
+        1 if structured.get("fallback_used") else 0,
+        1 if record.get("cancelled") else 0,
+        int(elapsed) if isinstance(elapsed, (int, float)) else None,
+    )
+
+
+class JsonlLogIndex:
+    """
+    chat.jsonl용 SQLite sidecar 색인(`<log>.idx.sqlite`).
+
+    - 오프셋은 압축 세그먼트 + 현재 파일을 이어 붙인 논리 오프셋(`log_segments`). 회전해도 기존 행은 그대로 유효
+    - 마지막으로 처리한 오프셋을 meta에 저장하고, 조회 시 그 이후에 추가된 줄만 증분 색인
+    - 행에는 필터용 컬럼과 원본 줄의 (offset, length)만 저장하고, 결과는 해당 줄만 읽어 반환(압축 세그먼트는 그 블록만 해제)
+    - 보존 정책으로 삭제된 구간의 행은 정리하고, 로그가 처리 오프셋보다 작아지거나
+      회전 없이 현재 파일이 교체되면(inode 변경) 처음부터 다시 색인
+    """
+
+    def __init__(self, log_path: Path):
+        self.log_path = log_path
+        self.db_path = log_path.with_name(log_path.name + ".idx.sqlite")
+        self._lock = threading.Lock()
+        self._log = segmented_log(log_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @staticmethod
+    def _get_offset(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'offset'").fetchone()
+        return int(row[0]) if row else 0
+
+    def refresh(self) -> int:
+        """새로 추가된 완성 줄을 색인하고, 처리한 논리 오프셋을 반환합니다."""
+        with self._lock, closing(self._connect()) as conn:
+            offset = self._get_offset(conn)
+            manifest = self._log.manifest()
+            floor = int(manifest["floor"])
+            live_base = str(manifest["live_base"])
+            size = self._log.size(manifest)
+            inode = str(self.log_path.stat().st_ino) if self.log_path.exists() else ""
+            meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('inode', 'live_base')").fetchall())
+            replaced = meta.get("live_base") == live_base and meta.get("inode") not in (None, "", inode) and inode
+            if size < offset or replaced:
+                with conn:
+                    conn.execute("DELETE FROM rows")
+                offset = 0
+            if offset < floor:
+                with conn:
+                    conn.execute("DELETE FROM rows WHERE offset < ?", (floor,))
+                offset = floor
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('inode', ?)", (inode,))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('live_base', ?)", (live_base,))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('offset', ?)", (str(offset),))
+            if offset >= size:
+                return offset
+            batch: List[Tuple[Any, ...]] = []
+            for pos, raw in self._log.iter_lines(offset):
+                line = raw.strip()
+                if line:
+                    try:
+                        record = json.loads(line)
+                    except Exception:
+                        record = None
+                    if isinstance(record, dict):
+                        batch.append((pos, len(raw) + 1, *_row_fields(record)))
+                offset = pos + len(raw) + 1
+                if len(batch) >= _REFRESH_BATCH_LINES:
+                    self._commit(conn, batch, offset)
+                    batch = []
+            self._commit(conn, batch, offset)
+            return offset
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, batch: List[Tuple[Any, ...]], offset: int) -> None:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO rows "
+                "(offset, length, message_id, session_id, ts, error_type, fallback_used, cancelled, elapsed_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('offset', ?)", (str(offset),))
+
+    def query(
+        self,
+        *,
+        message_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        error_type: Optional[str] = None,
+        errors_only: bool = False,
+        fallback_used: Optional[bool] = None,
+        cancelled: Optional[bool] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        min_elapsed_ms: Optional[int] = None,
+        limit: int = 100,
+        before: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        필터에 맞는 줄을 최신순으로 최대 `limit`개 찾아 (오래된 순 rows, next_before)를 반환.
+        다음 페이지는 `before=next_before`. 더 없으면 next_before는 None.
+        """
+        indexed = self.refresh()
+        where: List[str] = []
+        params: List[Any] = []
+        if message_id:
+            where.append("message_id = ?")
+            params.append(message_id)
+        if session_id:
+            where.append("session_id = ?")
+            params.append(session_id)
+        if error_type:
+            where.append("error_type = ?")
+            params.append(error_type)
+        elif errors_only:
+            where.append("error_type IS NOT NULL")
+        if fallback_used is not None:
+            where.append("fallback_used = ?")
+            params.append(1 if fallback_used else 0)
+        if cancelled is not None:
+            where.append("cancelled = ?")
+            params.append(1 if cancelled else 0)
+        if since:
+            where.append("ts >= ?")
+            params.append(since)
+        if until:
+            where.append("ts < ?")
+            params.append(until)
+        if min_elapsed_ms is not None:
+            where.append("elapsed_ms >= ?")
+            params.append(int(min_elapsed_ms))
+        if before is not None:
+            where.append("offset < ?")
+            params.append(int(before))
+        sql = "SELECT offset, length FROM rows"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY offset DESC LIMIT ?"
+        params.append(max(int(limit), 1))
+
+        with closing(self._connect()) as conn:
+            hits = conn.execute(sql, params).fetchall()
+        rows: List[Dict[str, Any]] = []
+        for offset, length in reversed(hits):
+            if offset + length > indexed:
+                continue
+            raw = self._log.read_at(offset, length)
+            if not raw:
+                continue
+            try:
+                obj = json.loads(raw)
+            except Exception:
+                continue
+            if isinstance(obj, dict):
+                rows.append(obj)
+        floor = int(self._log.manifest()["floor"])
+        next_before = hits[-1][0] if len(hits) >= max(int(limit), 1) and hits[-1][0] > floor else None
+        return rows, next_before
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+            offset = self._get_offset(conn)
+        size = self._log.size()
+        return {
+            "path": str(self.db_path),
+            "rows": int(count),
+            "indexed_offset": offset,
+            "log_size": size,
+            "lag_bytes": max(size - offset, 0),
+            "db_bytes": os.path.getsize(self.db_path) if self.db_path.exists() else 0,
+        }
+
+
+_INDEXES: Dict[Path, JsonlLogIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def log_index(path: Path) -> JsonlLogIndex:
+    """경로별 프로세스 공용 색인."""
+    with _INDEXES_LOCK:
+        idx = _INDEXES.get(path)
+        if idx is None:
+            idx = JsonlLogIndex(path)
+            _INDEXES[path] = idx
+        return idx
+
+
+def chat_log_index() -> JsonlLogIndex:
+    """현재 chat 로그 경로(AGENT_DATA_DIR 기준)에 대한 프로세스 공용 색인."""
+    return log_index(chat_log_path())
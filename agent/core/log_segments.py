@@ -0,0 +1,549 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .config import SETTINGS
+from .metrics import METRICS
+from .storage import ensure_dir, iter_file_lines_reverse, utc_now_iso
+
+logger = logging.getLogger("uvicorn.error")
+
+# 순방향으로 평문 파일을 읽을 때의 청크 크기
+_READ_CHUNK_BYTES = 1024 * 1024
+
+# manifest는 writer 스레드(rotate)와 압축/보존 스레드가 함께 갱신
+_MANIFEST_LOCK = threading.Lock()
+
+
+def archive_dir(path: Path) -> Path:
+    return path.parent / "archive"
+
+
+def manifest_path(path: Path) -> Path:
+    return archive_dir(path) / f"{path.name}.manifest.json"
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    """
+    로그 하나(`chat.jsonl` 등)의 세그먼트 목록.
+
+    오프셋은 모든 세그먼트와 현재 파일을 이어 붙인 논리 오프셋입니다.
+    segment `[start, end)` 다음에 현재 파일이 `live_base`부터 이어지고, `floor` 이전은 보존 정책으로 삭제된 구간입니다.
+    """
+    try:
+        data = json.loads(manifest_path(path).read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            data.setdefault("segments", [])
+            data.setdefault("live_base", 0)
+            data.setdefault("floor", data["segments"][0]["start"] if data["segments"] else data["live_base"])
+            data.setdefault("next_seq", len(data["segments"]) + 1)
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning("invalid log manifest: %s", manifest_path(path))
+    return {"live_base": 0, "floor": 0, "live_started_at": None, "next_seq": 1, "segments": []}
+
+
+def _save_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    target = manifest_path(path)
+    ensure_dir(target.parent)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(target)
+
+
+def _record_ts(raw: bytes) -> Optional[str]:
+    try:
+        obj = json.loads(raw)
+    except Exception:
+        return None
+    return obj.get("ts") if isinstance(obj, dict) else None
+
+
+def _iter_plain(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """평문 파일의 [start, end) 구간에서 완성된 줄을 (줄 시작 오프셋, 줄 bytes)로 순서대로."""
+    if not path.exists():
+        return
+    with path.open("rb") as f:
+        yield from _iter_file(f, start, end)
+
+
+def _iter_file(f: BinaryIO, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """`_iter_plain`과 같되 이미 연 파일에서 읽음."""
+    f.seek(start)
+    pos = start
+    rest = b""
+    while end is None or pos + len(rest) < end:
+        want = _READ_CHUNK_BYTES if end is None else min(_READ_CHUNK_BYTES, end - pos - len(rest))
+        chunk = f.read(want)
+        if not chunk:
+            break
+        buf = rest + chunk
+        cut = buf.rfind(b"\n")
+        if cut == -1:
+            rest = buf
+            continue
+        for raw in buf[:cut].split(b"\n"):
+            yield pos, raw
+            pos += len(raw) + 1
+        rest = buf[cut + 1 :]
+
+
+class LogRotator:
+    """
+    JSONL 로그 회전/압축/보존.
+
+    - 현재 파일이 `max_bytes` 이상이거나 회전 후 `max_age_s`가 지나면 `archive/`로 rename(writer 스레드, 즉시 끝남)
+    - rename한 세그먼트는 별도 스레드에서 `block_bytes` 단위 gzip member로 압축. member별 (원본 오프셋, 압축 오프셋)을
+      manifest에 남겨 임의 위치를 해당 블록만 풀어 읽을 수 있음(여러 member를 이어 붙인 파일이라 `gzip -dc`로도 읽힘)
+    - 압축 후 보존 정책(`retention_days`, `retention_bytes`)에 따라 오래된 세그먼트부터 삭제
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_age_s: float,
+        block_bytes: int,
+        level: int,
+        retention_days: float,
+        retention_bytes: int,
+    ):
+        self.max_bytes = max(max_bytes, 0)
+        self.max_age_s = max(max_age_s, 0.0)
+        self.block_bytes = max(block_bytes, 4096)
+        self.level = min(max(level, 1), 9)
+        self.retention_days = max(retention_days, 0.0)
+        self.retention_bytes = max(retention_bytes, 0)
+        self._live_started: Dict[Path, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.max_age_s > 0
+
+    def maybe_rotate(self, path: Path) -> Optional[str]:
+        """기록 직전에(writer 스레드) 회전 조건을 확인하고, 회전했으면 새 세그먼트 이름을 반환."""
+        if not self.enabled:
+            return None
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if size == 0:
+            return None
+        started = self._live_started.get(path)
+        if started is None:
+            with _MANIFEST_LOCK:
+                manifest = load_manifest(path)
+                started = manifest.get("live_started_at")
+                if started is None:
+                    started = time.time()
+                    manifest["live_started_at"] = started
+                    _save_manifest(path, manifest)
+            self._live_started[path] = float(started)
+            started = float(started)
+        due = (self.max_bytes and size >= self.max_bytes) or (self.max_age_s and time.time() - started >= self.max_age_s)
+        if not due:
+            return None
+        return self.rotate(path)
+
+    def rotate(self, path: Path) -> Optional[str]:
+        with _MANIFEST_LOCK:
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                return None
+            if size == 0:
+                return None
+            manifest = load_manifest(path)
+            seq = int(manifest["next_seq"])
+            name = f"{path.stem}-{seq:06d}{path.suffix}"
+            ensure_dir(archive_dir(path))
+            os.replace(path, archive_dir(path) / name)
+            base = int(manifest["live_base"])
+            manifest["segments"].append(
+                {
+                    "name": name,
+                    "start": base,
+                    "end": base + size,
+                    "raw_bytes": size,
+                    "compressed": False,
+                    "created_at": utc_now_iso(),
+                    "created_at_s": time.time(),
+                }
+            )
+            manifest["live_base"] = base + size
+            manifest["next_seq"] = seq + 1
+            manifest["live_started_at"] = time.time()
+            _save_manifest(path, manifest)
+            self._live_started[path] = manifest["live_started_at"]
+        METRICS.inc("log_rotations_total")
+        logger.info("rotated %s -> %s (%d bytes)", path, name, size)
+        return name
+
+    def finish(self, path: Path, name: str) -> None:
+        """회전한 세그먼트를 압축하고 보존 정책을 적용합니다(워커 스레드)."""
+        try:
+            self.compress(path, name)
+        except Exception:
+            METRICS.inc("log_compress_failed")
+            logger.exception("failed to compress log segment %s", name)
+        self.apply_retention(path)
+
+    def compress(self, path: Path, name: str) -> None:
+        src = archive_dir(path) / name
+        if not src.exists():
+            return
+        t0 = time.perf_counter()
+        raw_size = src.stat().st_size
+        dst = src.with_name(name + ".gz")
+        tmp = dst.with_name(dst.name + ".tmp")
+        blocks: List[List[int]] = []
+        records = 0
+        first_ts: Optional[str] = None
+        last_raw = b""
+        block: List[bytes] = []
+        block_start = 0
+        block_size = 0
+        comp_off = 0
+        with tmp.open("wb") as out:
+
+            def flush() -> None:
+                nonlocal comp_off, block, block_size
+                if not block:
+                    return
+                data = gzip.compress(b"".join(block), compresslevel=self.level, mtime=0)
+                out.write(data)
+                blocks.append([block_start, comp_off])
+                comp_off += len(data)
+                block = []
+                block_size = 0
+
+            for offset, raw in _iter_plain(src):
+                if not block:
+                    block_start = offset
+                block.append(raw + b"\n")
+                block_size += len(raw) + 1
+                if raw.strip():
+                    records += 1
+                    if first_ts is None:
+                        first_ts = _record_ts(raw)
+                    last_raw = raw
+                if block_size >= self.block_bytes:
+                    flush()
+            flush()
+            out.flush()
+            os.fsync(out.fileno())
+        tmp.replace(dst)
+        with _MANIFEST_LOCK:
+            manifest = load_manifest(path)
+            for seg in manifest["segments"]:
+                if seg["name"] == name:
+                    seg.update(
+                        {
+                            "name": dst.name,
+                            "compressed": True,
+                            "bytes": comp_off,
+                            "records": records,
+                            "first_ts": first_ts,
+                            "last_ts": _record_ts(last_raw) if last_raw else None,
+                            "blocks": blocks,
+                        }
+                    )
+                    break
+            _save_manifest(path, manifest)
+        src.unlink(missing_ok=True)
+        METRICS.observe("log_compress_ms", (time.perf_counter() - t0) * 1000)
+        logger.info("compressed %s (%d records, %d -> %d bytes)", name, records, raw_size, comp_off)
+
+    def apply_retention(self, path: Path) -> List[str]:
+        """보존 기간/용량을 넘는 오래된 세그먼트를 삭제하고 삭제한 이름을 반환."""
+        if not self.retention_days and not self.retention_bytes:
+            return []
+        removed: List[str] = []
+        with _MANIFEST_LOCK:
+            manifest = load_manifest(path)
+            segments = manifest["segments"]
+            now = time.time()
+            total = sum(int(s.get("bytes") or s.get("raw_bytes") or 0) for s in segments)
+            while segments:
+                seg = segments[0]
+                expired = self.retention_days and now - float(seg.get("created_at_s") or now) > self.retention_days * 86400
+                over = self.retention_bytes and total > self.retention_bytes
+                if not (expired or over) or not seg.get("compressed"):
+                    break
+                segments.pop(0)
+                total -= int(seg.get("bytes") or 0)
+                (archive_dir(path) / seg["name"]).unlink(missing_ok=True)
+                removed.append(seg["name"])
+            if removed:
+                manifest["floor"] = segments[0]["start"] if segments else manifest["live_base"]
+                _save_manifest(path, manifest)
+        if removed:
+            METRICS.inc("log_segments_deleted", len(removed))
+            logger.info("log retention removed %s", ", ".join(removed))
+        return removed
+
+    def recover(self, log_dir: Path) -> List[Tuple[Path, str]]:
+        """이전 프로세스가 압축하지 못한 세그먼트 목록(시작 시 다시 압축)."""
+        pending: List[Tuple[Path, str]] = []
+        archive = log_dir / "archive"
+        if not archive.exists():
+            return pending
+        for mpath in archive.glob("*.manifest.json"):
+            path = log_dir / mpath.name[: -len(".manifest.json")]
+            for seg in load_manifest(path)["segments"]:
+                if not seg.get("compressed"):
+                    pending.append((path, seg["name"]))
+        return pending
+
+
+class SegmentedLog:
+    """
+    현재 파일 + 압축 세그먼트를 하나의 논리 로그로 읽는 reader.
+
+    - `iter_lines(start)`: 논리 오프셋 `start`부터 순서대로(세그먼트 → 현재 파일)
+    - `iter_lines_reverse(before)`: 최신 줄부터 거꾸로(압축 세그먼트는 블록 단위로 뒤에서부터 풀어 읽음)
+    - `read_at(offset, length)`: 색인이 가리키는 줄 하나(압축 세그먼트는 해당 블록만 풀고, 최근 블록은 캐시)
+    """
+
+    _CACHE_BLOCKS = 8
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def manifest(self) -> Dict[str, Any]:
+        return load_manifest(self.path)
+
+    def size(self, manifest: Optional[Dict[str, Any]] = None) -> int:
+        m = manifest or self.manifest()
+        try:
+            live = self.path.stat().st_size
+        except FileNotFoundError:
+            live = 0
+        return int(m["live_base"]) + live
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[Tuple[Dict[str, Any], Dict[str, BinaryIO]]]:
+        """
+        manifest와 평문 파일(현재 파일 + 아직 압축 전 세그먼트)을 `_MANIFEST_LOCK` 안에서 함께 엽니다.
+
+        열린 파일은 이후 회전(rename)/압축(unlink)이 일어나도 manifest 시점의 내용을 가리키므로,
+        긴 세그먼트 스캔 중에 회전해도 줄을 건너뛰거나 새 현재 파일을 옛 `live_base`로 읽지 않습니다.
+        반환: (manifest, {"": 현재 파일, 세그먼트 이름: 파일}). 없는 파일은 빠짐.
+        """
+        with ExitStack() as stack:
+            files: Dict[str, BinaryIO] = {}
+            with _MANIFEST_LOCK:
+                m = load_manifest(self.path)
+                targets = [("", self.path)]
+                targets += [
+                    (s["name"], archive_dir(self.path) / s["name"]) for s in m["segments"] if not s.get("compressed")
+                ]
+                for key, path in targets:
+                    try:
+                        files[key] = stack.enter_context(path.open("rb"))
+                    except FileNotFoundError:
+                        pass
+            yield m, files
+
+    def _block(self, seg: Dict[str, Any], idx: int) -> bytes:
+        key = (seg["name"], idx)
+        with self._cache_lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+        blocks = seg["blocks"]
+        comp_start = blocks[idx][1]
+        comp_end = blocks[idx + 1][1] if idx + 1 < len(blocks) else int(seg["bytes"])
+        with (archive_dir(self.path) / seg["name"]).open("rb") as f:
+            f.seek(comp_start)
+            data = gzip.decompress(f.read(comp_end - comp_start))
+        with self._cache_lock:
+            self._cache[key] = data
+            while len(self._cache) > self._CACHE_BLOCKS:
+                self._cache.popitem(last=False)
+        return data
+
+    def _segment_lines(
+        self, seg: Dict[str, Any], start: int, files: Dict[str, BinaryIO]
+    ) -> Iterator[Tuple[int, bytes]]:
+        base = int(seg["start"])
+        rel = max(start - base, 0)
+        if not seg.get("compressed"):
+            f = files.get(seg["name"])
+            for off, raw in _iter_file(f, rel) if f is not None else ():
+                yield base + off, raw
+            return
+        blocks = seg["blocks"]
+        first = max(bisect_right([b[0] for b in blocks], rel) - 1, 0)
+        for idx in range(first, len(blocks)):
+            pos = base + blocks[idx][0]
+            for raw in self._block(seg, idx)[:-1].split(b"\n"):
+                if pos >= start:
+                    yield pos, raw
+                pos += len(raw) + 1
+
+    def iter_lines(self, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+        """논리 오프셋 `start` 이후의 완성된 줄을 (논리 시작 오프셋, 줄 bytes)로 오래된 순서대로."""
+        with self._snapshot() as (m, files):
+            start = max(int(start), int(m["floor"]))
+            for seg in m["segments"]:
+                if int(seg["end"]) <= start:
+                    continue
+                yield from self._segment_lines(seg, start, files)
+            base = int(m["live_base"])
+            if "" in files:
+                for off, raw in _iter_file(files[""], max(start - base, 0)):
+                    yield base + off, raw
+
+    def iter_records(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """세그먼트와 현재 파일의 JSON 객체를 오래된 순서대로(깨진 줄은 건너뜀)."""
+        for _, raw in self.iter_lines(start):
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            if isinstance(obj, dict):
+                yield obj
+
+    def iter_lines_reverse(self, before: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        with self._snapshot() as (m, files):
+            base = int(m["live_base"])
+            if (before is None or before > base) and "" in files:
+                local = None if before is None else before - base
+                for off, raw in iter_file_lines_reverse(files[""], local):
+                    yield base + off, raw
+            end = base if before is None else min(int(before), base)
+            for seg in reversed(m["segments"]):
+                seg_start = int(seg["start"])
+                if seg_start >= end:
+                    continue
+                if not seg.get("compressed"):
+                    f = files.get(seg["name"])
+                    for off, raw in iter_file_lines_reverse(f, end - seg_start) if f is not None else ():
+                        yield seg_start + off, raw
+                    continue
+                blocks = seg["blocks"]
+                for idx in range(len(blocks) - 1, -1, -1):
+                    block_start = seg_start + blocks[idx][0]
+                    if block_start >= end:
+                        continue
+                    lines: List[Tuple[int, bytes]] = []
+                    pos = block_start
+                    for raw in self._block(seg, idx)[:-1].split(b"\n"):
+                        if pos >= end:
+                            break
+                        lines.append((pos, raw))
+                        pos += len(raw) + 1
+                    yield from reversed(lines)
+
+    def tail(self, limit: int, before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """`read_jsonl_tail`과 같은 계약(오래된 순 rows, next_before)이되 세그먼트까지 이어서 읽음."""
+        if limit <= 0:
+            return [], None
+        floor = int(self.manifest()["floor"])
+        rows: List[Dict[str, Any]] = []
+        cursor: Optional[int] = None
+        for start, raw in self.iter_lines_reverse(before):
+            cursor = start
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            if isinstance(obj, dict):
+                rows.append(obj)
+                if len(rows) >= limit:
+                    break
+        rows.reverse()
+        next_before = cursor if cursor is not None and cursor > floor else None
+        return rows, next_before
+
+    def read_at(self, offset: int, length: int) -> Optional[bytes]:
+        """논리 오프셋의 줄 하나(`length`는 개행 포함). 보존 정책으로 삭제된 구간이면 None."""
+        m = self.manifest()
+        if offset < int(m["floor"]):
+            return None
+        base = int(m["live_base"])
+        if offset >= base:
+            try:
+                with self.path.open("rb") as f:
+                    f.seek(offset - base)
+                    return f.read(length)
+            except FileNotFoundError:
+                return None
+        segments = m["segments"]
+        idx = bisect_right([int(s["start"]) for s in segments], offset) - 1
+        if idx < 0:
+            return None
+        seg = segments[idx]
+        rel = offset - int(seg["start"])
+        if not seg.get("compressed"):
+            try:
+                with (archive_dir(self.path) / seg["name"]).open("rb") as f:
+                    f.seek(rel)
+                    return f.read(length)
+            except FileNotFoundError:
+                # 압축이 막 끝난 경우: manifest를 다시 읽어 재시도
+                return self.read_at(offset, length) if self.manifest() != m else None
+        blocks = seg["blocks"]
+        b = bisect_right([blk[0] for blk in blocks], rel) - 1
+        data = self._block(seg, b)
+        start = rel - blocks[b][0]
+        return data[start : start + length]
+
+    def stats(self) -> Dict[str, Any]:
+        m = self.manifest()
+        segments = m["segments"]
+        return {
+            "segments": len(segments),
+            "pending_compression": sum(1 for s in segments if not s.get("compressed")),
+            "archived_raw_bytes": sum(int(s.get("raw_bytes") or 0) for s in segments),
+            "archived_bytes": sum(int(s.get("bytes") or s.get("raw_bytes") or 0) for s in segments),
+            "floor": int(m["floor"]),
+            "live_base": int(m["live_base"]),
+            "size": self.size(m),
+        }
+
+
+_LOGS: Dict[Path, SegmentedLog] = {}
+_LOGS_LOCK = threading.Lock()
+
+
+def segmented_log(path: Path) -> SegmentedLog:
+    """경로별 프로세스 공용 reader(블록 캐시 공유)."""
+    with _LOGS_LOCK:
+        log = _LOGS.get(path)
+        if log is None:
+            log = SegmentedLog(path)
+            _LOGS[path] = log
+        return log
+
+
+LOG_ROTATOR = LogRotator(
+    max_bytes=SETTINGS.log_rotate_bytes,
+    max_age_s=SETTINGS.log_rotate_interval_s,
+    block_bytes=SETTINGS.log_segment_block_bytes,
+    level=SETTINGS.log_compress_level,
+    retention_days=SETTINGS.log_retention_days,
+    retention_bytes=SETTINGS.log_retention_bytes,
+)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import SETTINGS
+from .log_segments import LOG_ROTATOR
+from .metrics import METRICS
+from .storage import append_jsonl, ensure_dir, get_data_dir
+
+logger = logging.getLogger("uvicorn.error")
+
+FSYNC_OFF = "off"
+FSYNC_BATCH = "batch"
+FSYNC_INTERVAL = "interval"
+
+POLICY_BLOCK = "block"
+POLICY_DROP = "drop"
+
+_Item = Tuple[Path, Dict[str, Any]]
+
+
+def _write_batch(batch: List[_Item], fsync: bool) -> List[Tuple[Path, str]]:
+    """
+    경로별로 묶어 파일당 open/write 한 번(group commit). 워커 스레드에서 실행됩니다.
+    쓰기 전에 회전 조건을 확인하고, 회전한 (경로, 세그먼트 이름)을 반환합니다.
+    """
+    rotated: List[Tuple[Path, str]] = []
+    by_path: Dict[Path, List[str]] = {}
+    for path, record in batch:
+        try:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+        except Exception:
+            METRICS.inc("log_records_failed")
+            continue
+        by_path.setdefault(path, []).append(line)
+    for path, lines in by_path.items():
+        ensure_dir(path.parent)
+        name = LOG_ROTATOR.maybe_rotate(path)
+        if name:
+            rotated.append((path, name))
+        with path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    return rotated
+
+
+class JsonlLogWriter:
+    """
+    chat/feedback JSONL 로그용 백그라운드 writer.
+
+    - 요청 핸들러는 bounded queue에 레코드만 넣고 반환(파일 I/O는 writer task가 스레드에서 수행)
+    - writer task 하나가 `flush_records`개 또는 `flush_ms`마다 모아서 한 번에 기록(group commit, 줄 순서 보장)
+    - fsync 정책: off(OS에 맡김) / batch(배치마다) / interval(`fsync_interval_ms`마다)
+    - queue가 가득 차면 policy에 따라 block(자리 날 때까지 대기) 또는 drop(버리고 카운트)
+    - 시작 전/종료 후(CLI, 노트북 등)에는 동기 `append_jsonl`로 기록
+    - 회전(`LOG_ROTATOR`)은 쓰기와 같은 스레드에서 rename만 하고, 압축/보존 정리는 별도 스레드에서 진행
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        flush_records: int,
+        flush_ms: int,
+        fsync: str = FSYNC_OFF,
+        fsync_interval_ms: int = 1000,
+        full_policy: str = POLICY_BLOCK,
+    ):
+        self.queue_size = max(queue_size, 1)
+        self.flush_records = max(flush_records, 1)
+        self.flush_interval = max(flush_ms, 0) / 1000.0
+        self.fsync = fsync if fsync in {FSYNC_OFF, FSYNC_BATCH, FSYNC_INTERVAL} else FSYNC_OFF
+        self.fsync_interval = max(fsync_interval_ms, 0) / 1000.0
+        self.full_policy = full_policy if full_policy in {POLICY_BLOCK, POLICY_DROP} else POLICY_BLOCK
+        self._queue: Optional[asyncio.Queue[Optional[_Item]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_fsync = 0.0
+        self._background: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="jsonl-log-writer")
+        # 이전 프로세스가 압축하지 못하고 끝난 세그먼트
+        for path, name in LOG_ROTATOR.recover(get_data_dir() / "logs"):
+            self._finish_segment(path, name)
+
+    def _finish_segment(self, path: Path, name: str) -> None:
+        task = asyncio.create_task(asyncio.to_thread(LOG_ROTATOR.finish, path, name))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """queue에 남은 레코드를 모두 기록한 뒤 writer task를 종료합니다."""
+        if not self.running or self._queue is None or self._task is None:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("log writer drain timed out (pending=%d)", self._queue.qsize())
+            self._task.cancel()
+        finally:
+            self._task = None
+            self._queue = None
+
+    async def write(self, path: Path, record: Dict[str, Any]) -> bool:
+        """레코드를 queue에 넣습니다. drop 정책에서 queue가 가득 차면 False."""
+        queue = self._queue
+        if not self.running or queue is None:
+            await asyncio.to_thread(append_jsonl, path, record)
+            return True
+        item = (path, record)
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            METRICS.inc("log_queue_full_total")
+            if self.full_policy == POLICY_DROP:
+                METRICS.inc("log_records_dropped")
+                return False
+            await queue.put(item)
+        METRICS.inc("log_records_enqueued")
+        return True
+
+    async def _run(self) -> None:
+        queue = self._queue
+        assert queue is not None
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await queue.get()
+            if first is None:
+                break
+            batch: List[_Item] = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.flush_records:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+        # stop() 이후 sentinel 뒤에 들어온 레코드까지 비웁니다.
+        rest: List[_Item] = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                rest.append(item)
+        if rest:
+            await self._commit(rest)
+
+    async def _commit(self, batch: List[_Item]) -> None:
+        fsync = self.fsync == FSYNC_BATCH
+        if self.fsync == FSYNC_INTERVAL:
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                fsync = True
+                self._last_fsync = now
+        t0 = time.perf_counter()
+        try:
+            rotated = await asyncio.to_thread(_write_batch, batch, fsync)
+        except Exception:
+            METRICS.inc("log_records_failed", len(batch))
+            logger.exception("log writer batch failed (records=%d)", len(batch))
+            return
+        METRICS.inc("log_records_written", len(batch))
+        METRICS.inc("log_batches_total")
+        METRICS.observe("log_batch_records", len(batch))
+        METRICS.observe("log_batch_write_ms", (time.perf_counter() - t0) * 1000)
+        for path, name in rotated:
+            self._finish_segment(path, name)
+
+
+LOG_WRITER = JsonlLogWriter(
+    queue_size=SETTINGS.log_queue_size,
+    flush_records=SETTINGS.log_flush_records,
+    flush_ms=SETTINGS.log_flush_ms,
+    fsync=SETTINGS.log_fsync,
+    fsync_interval_ms=SETTINGS.log_fsync_interval_ms,
+    full_policy=SETTINGS.log_queue_full_policy,
+)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """프로세스 내 단순 카운터/요약(count/sum/max) 레지스트리. `/admin/metrics`로 노출."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            s = self._summaries.get(name)
+            if s is None:
+                self._summaries[name] = {"count": 1, "sum": value, "max": value}
+                return
+            s["count"] += 1
+            s["sum"] += value
+            if value > s["max"]:
+                s["max"] = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            summaries = {}
+            for name, s in self._summaries.items():
+                summaries[name] = {**s, "avg": (s["sum"] / s["count"]) if s["count"] else 0.0}
+            return {"counters": dict(self._counters), "summaries": summaries}
+
+
+METRICS = Metrics()
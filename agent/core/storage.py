@@ -4,7 +4,7 @@ import json
 import os
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
 
 
 def utc_now_iso() -> str:
@@ -21,6 +21,86 @@ def append_jsonl(path: Path, record: Dict[str, Any]) -> None:
         f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
 
+def iter_lines_reverse(
+    path: Path, before: Optional[int] = None, block_size: int = 64 * 1024
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    파일 끝(또는 `before` 바이트 오프셋)에서 블록 단위로 거꾸로 읽어 (줄 시작 오프셋, 줄 bytes)를 최신 줄부터 내보냅니다.
+
+    - 읽는 양은 소비한 줄 수에 비례(파일 크기와 무관)
+    - EOF에서 읽을 때 개행으로 끝나지 않은 마지막 줄(기록 중인 줄)은 건너뜀
+    """
+    if not path.exists():
+        return
+    with path.open("rb") as f:
+        yield from iter_file_lines_reverse(f, before, block_size)
+
+
+def iter_file_lines_reverse(
+    f: BinaryIO, before: Optional[int] = None, block_size: int = 64 * 1024
+) -> Iterator[Tuple[int, bytes]]:
+    """`iter_lines_reverse`와 같되 이미 연 파일에서 읽음(경로가 다른 파일로 바뀌어도 연 파일 기준)."""
+    size = f.seek(0, os.SEEK_END)
+    end = size if before is None else max(0, min(int(before), size))
+    pos = end
+    buf = b""
+    # `before`는 항상 줄 시작 오프셋이므로 그 앞 구간은 개행으로 끝남. EOF는 미완성 줄을 먼저 잘라냄.
+    trim_partial = before is None
+    while pos > 0:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        if trim_partial:
+            nl = buf.rfind(b"\n")
+            if nl == -1:
+                continue
+            buf = buf[: nl + 1]
+            trim_partial = False
+        if not buf:
+            continue
+        parts = buf[:-1].split(b"\n")
+        line_end = pos + len(buf)
+        complete = parts[1:] if pos > 0 else parts
+        for raw in reversed(complete):
+            start = line_end - len(raw) - 1
+            line_end = start
+            yield start, raw
+        # 블록 경계에 걸친 앞부분(미완성 줄)은 다음 블록과 이어 붙여 처리
+        buf = parts[0] + b"\n" if pos > 0 else b""
+
+
+def read_jsonl_tail(
+    path: Path, limit: int, before: Optional[int] = None, block_size: int = 64 * 1024
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    파일 끝(또는 `before` 바이트 오프셋)에서 거꾸로 읽어 마지막 `limit`개의 JSON 객체를 반환합니다.
+
+    - 반환: (오래된 순 rows, next_before). next_before는 가장 앞서 읽은 줄의 시작 오프셋으로,
+      다음 페이지는 `before=next_before`로 요청. 파일 처음까지 읽었으면 None.
+    """
+    if limit <= 0 or not path.exists():
+        return [], None
+    rows: List[Dict[str, Any]] = []
+    cursor: Optional[int] = None
+    for start, raw in iter_lines_reverse(path, before, block_size):
+        cursor = start
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except Exception:
+            continue
+        if isinstance(obj, dict):
+            rows.append(obj)
+            if len(rows) >= limit:
+                break
+    rows.reverse()
+    next_before = cursor if cursor else None
+    return rows, next_before
+
+
 def get_data_dir() -> Path:
     env = os.getenv("AGENT_DATA_DIR")
     if env:
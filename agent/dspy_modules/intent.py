@@ -39,11 +39,18 @@ class IntentAnalysisAgent(dspy.Module):
 _CONFIGURED = False
 
 
-def ensure_dspy_configured(model: Optional[str] = None) -> None:
+def ensure_dspy_configured(model: Optional[str] = None, lm: Optional[dspy.LM] = None) -> None:
+    """기본 LM을 한 번만 설정. `lm`을 주면(예: compile용 rate-limited LM) 이미 설정돼 있어도 교체."""
     global _CONFIGURED
-    if _CONFIGURED:
+    if _CONFIGURED and lm is None:
         return
-    lm = dspy.LM(model=(model or SETTINGS.dspy_model))
+    if lm is None and SETTINGS.lm_cache_serving:
+        from ..core.lm_cache import lm_cache
+        from .lm import CachedLM
+
+        lm = CachedLM(model=(model or SETTINGS.dspy_model), cache=lm_cache(), cache_mode="on")
+    if lm is None:
+        lm = dspy.LM(model=(model or SETTINGS.dspy_model))
     dspy.configure(lm=lm)
     _CONFIGURED = True
 
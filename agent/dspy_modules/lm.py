@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import dspy
+
+from ..core.lm_cache import LMCache, LMCacheMiss, lm_cache_key
+
+
+def _to_dict(response: Any) -> Optional[Dict[str, Any]]:
+    dump = getattr(response, "model_dump", None)
+    if callable(dump):
+        return dump()
+    return response if isinstance(response, dict) else None
+
+
+def _from_dict(data: Dict[str, Any]) -> Any:
+    import litellm
+
+    response = litellm.ModelResponse(**data)
+    try:
+        # DSPy 사용량 집계가 캐시 응답을 실제 호출로 세지 않도록 표시
+        response.cache_hit = True
+    except Exception:
+        pass
+    return response
+
+
+class CachedLM(dspy.LM):
+    """
+    `LMCache`(디스크)를 거치는 `dspy.LM`.
+
+    - 키: 모델 + prompt/messages + 샘플링 인자. 응답은 litellm 응답 dict로 저장/복원
+    - 캐시를 쓰는 동안에는 DSPy 자체 캐시를 끔(모든 호출이 이 캐시에 기록되어야 replay가 완전함).
+      `dspy_cache=False`면 캐시 없이(off)도 DSPy 캐시를 끔
+    - 실제 호출은 `_call`/`_acall`만 하므로 하위 클래스는 그 부분만 감싸면 됨(예: rate limit)
+    - chat 이외 model_type은 캐시하지 않음(replay 모드에서는 miss로 처리)
+    """
+
+    def __init__(
+        self,
+        model: str,
+        cache: Optional[LMCache] = None,
+        cache_mode: str = "on",
+        dspy_cache: bool = True,
+        **kwargs: Any,
+    ):
+        self.lm_cache = cache if cache_mode != "off" else None
+        self.cache_mode = cache_mode
+        # `cache`는 LMCache 자리라 DSPy 캐시 여부는 `dspy_cache`로 받음
+        super().__init__(model=model, cache=dspy_cache and self.lm_cache is None, **kwargs)
+
+    def _key(self, prompt: Any, messages: Any, kwargs: Dict[str, Any]) -> Optional[str]:
+        if self.lm_cache is None or getattr(self, "model_type", "chat") != "chat":
+            return None
+        return lm_cache_key(self.model, prompt, messages, {**self.kwargs, **kwargs})
+
+    def _lookup(self, key: Optional[str]) -> Any:
+        if key is None:
+            if self.cache_mode == "replay":
+                raise LMCacheMiss(f"LM cache replay: uncacheable call (model={self.model})")
+            return None
+        if self.cache_mode != "record":
+            cached = self.lm_cache.get(key)  # type: ignore[union-attr]
+            if cached is not None:
+                return _from_dict(cached)
+        if self.cache_mode == "replay":
+            raise LMCacheMiss(f"LM cache replay: miss for model={self.model} key={key[:16]}")
+        return None
+
+    def _store(self, key: Optional[str], response: Any) -> None:
+        data = _to_dict(response) if key is not None else None
+        if data is not None:
+            self.lm_cache.put(key, self.model, data)  # type: ignore[union-attr, arg-type]
+
+    def _call(self, prompt: Any, messages: Any, kwargs: Dict[str, Any]) -> Any:
+        return super().forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def _acall(self, prompt: Any, messages: Any, kwargs: Dict[str, Any]) -> Any:
+        return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+
+    def forward(self, prompt: Any = None, messages: Any = None, **kwargs: Any):
+        key = self._key(prompt, messages, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = self._call(prompt, messages, kwargs)
+        self._store(key, response)
+        return response
+
+    async def aforward(self, prompt: Any = None, messages: Any = None, **kwargs: Any):
+        key = self._key(prompt, messages, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = await self._acall(prompt, messages, kwargs)
+        self._store(key, response)
+        return response
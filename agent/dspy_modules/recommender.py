@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import json
-from typing import Any, List
+import threading
+import weakref
+from typing import Any, Callable, List
 
 import dspy
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 
 def _safe_json_loads(text: str) -> Any:
@@ -45,6 +47,80 @@ class DecisionResult(BaseModel):
     caveats: List[str] = Field(default_factory=list)
 
 
+class StyleCodeStreamParser:
+    """
+    FusionDecisionMaker의 decision JSON 출력을 조각 단위로 받아,
+    `recommended_style_codes` 배열의 문자열이 하나 완성될 때마다 반환하는 증분 파서.
+
+    이미 스캔한 위치를 기억하므로 전체 버퍼를 다시 파싱하지 않습니다.
+    """
+
+    _KEY = '"recommended_style_codes"'
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self._state = "key"  # key -> colon -> array -> done
+        self._current: List[str] | None = None
+        self._escape = False
+        self.codes: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, chunk: str) -> List[str]:
+        if not chunk or self._state == "done":
+            return []
+        self._buf += chunk
+        completed: List[str] = []
+        buf = self._buf
+        n = len(buf)
+        while self._pos < n and self._state != "done":
+            if self._state == "key":
+                idx = buf.find(self._KEY, self._pos)
+                if idx < 0:
+                    # 키가 조각 경계에 걸칠 수 있으므로 꼬리만 남겨 둠
+                    self._pos = max(self._pos, n - len(self._KEY) + 1)
+                    break
+                self._pos = idx + len(self._KEY)
+                self._state = "colon"
+                continue
+            ch = buf[self._pos]
+            self._pos += 1
+            if self._state == "colon":
+                if ch == "[":
+                    self._state = "array"
+                elif ch not in " \t\r\n:":
+                    # 배열이 아닌 값: 다음 키 등장까지 다시 탐색
+                    self._state = "key"
+                continue
+            # array
+            if self._current is not None:
+                if self._escape:
+                    self._current.append(ch)
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    code = " ".join("".join(self._current).split())
+                    self._current = None
+                    if code and code not in self.codes:
+                        self.codes.append(code)
+                        completed.append(code)
+                else:
+                    self._current.append(ch)
+            elif ch == '"':
+                self._current = []
+            elif ch == "]":
+                self._state = "done"
+        # 소비한 앞부분은 버려 버퍼가 누적되지 않게 함
+        if self._pos > 0:
+            self._buf = self._buf[self._pos :]
+            self._pos = 0
+        return completed
+
+
 class FusionDecisionSignature(dspy.Signature):
     user_query = dspy.InputField(desc="사용자 질문")
     conversation_history = dspy.InputField(desc="멀티턴 히스토리(없으면 빈 문자열)")
@@ -76,6 +152,133 @@ class FusionDecisionMaker(dspy.Module):
         )
 
 
+class FusionDecisionJsonSignature(dspy.Signature):
+    # 스트리밍 전용: dspy 스트리밍은 str 출력 필드만 지원하므로 DecisionResult를 JSON 문자열로 받음
+    user_query = dspy.InputField(desc="사용자 질문")
+    conversation_history = dspy.InputField(desc="멀티턴 히스토리(없으면 빈 문자열)")
+    products_json = dspy.InputField(desc="상품 후보 목록(JSON list)")
+    reviews_summary = dspy.InputField(desc="리뷰 요약 텍스트(없으면 빈 문자열)")
+    review_style_codes_json = dspy.InputField(desc="리뷰 style_code 후보(JSON list)")
+    decision_json: str = dspy.OutputField(
+        desc='추천 style_code + 근거/주의사항 JSON 객체: '
+        '{"recommended_style_codes": [...], "reason_bullets": [...], "caveats": [...]}'
+    )
+
+
+class FusionDecisionJsonMaker(FusionDecisionMaker):
+    def __init__(self):
+        dspy.Module.__init__(self)
+        self.prog = dspy.ChainOfThought(FusionDecisionJsonSignature)
+
+
+def _json_demo(demo: Any) -> dict:
+    data = demo.toDict() if hasattr(demo, "toDict") else dict(demo)
+    decision = data.pop("decision", None)
+    if isinstance(decision, BaseModel):
+        decision = decision.model_dump()
+    if decision is not None:
+        data["decision_json"] = json.dumps(decision, ensure_ascii=False)
+    return data
+
+
+# maker -> JSON 출력 버전. maker 속성으로 두면 sub-module이 되어 named_predictors()/save()/optimizer가 함께 순회하므로
+# 밖에 둠(maker가 reload로 버려지면 같이 사라짐)
+_JSON_MAKERS: "weakref.WeakKeyDictionary[FusionDecisionMaker, FusionDecisionJsonMaker]" = weakref.WeakKeyDictionary()
+_JSON_MAKERS_LOCK = threading.Lock()
+
+
+def streaming_fusion_maker(maker: FusionDecisionMaker) -> FusionDecisionJsonMaker:
+    """
+    `maker`(compile된 artifact 포함)의 demo/instruction을 옮긴 JSON 출력 버전. maker마다 한 번만 만듭니다.
+    demo의 `decision`은 `decision_json` 문자열로 변환합니다.
+    """
+    with _JSON_MAKERS_LOCK:
+        cached = _JSON_MAKERS.get(maker)
+        if cached is not None:
+            return cached
+        json_maker = FusionDecisionJsonMaker()
+        for (_, src), (_, dst) in zip(maker.named_predictors(), json_maker.named_predictors()):
+            dst.demos = [_json_demo(d) for d in src.demos]
+            if src.signature.instructions != FusionDecisionSignature.instructions:
+                dst.signature = dst.signature.with_instructions(src.signature.instructions)
+        _JSON_MAKERS[maker] = json_maker
+        return json_maker
+
+
+def parse_decision_json(text: Any) -> DecisionResult | None:
+    """decision JSON 문자열(코드 펜스/앞뒤 텍스트 허용)을 DecisionResult로. 실패하면 None."""
+    if not isinstance(text, str):
+        return None
+    start, end = text.find("{"), text.rfind("}")
+    data = _safe_json_loads(text[start : end + 1]) if 0 <= start < end else None
+    if not isinstance(data, dict):
+        return None
+    codes = data.get("recommended_style_codes")
+    if isinstance(codes, list):
+        data["recommended_style_codes"] = codes[:30]
+    try:
+        return DecisionResult.model_validate(data)
+    except ValidationError:
+        return None
+
+
+async def stream_fusion_decision(
+    maker: FusionDecisionMaker,
+    on_style_code: Callable[[str], None],
+    user_query: str,
+    conversation_history: str,
+    products: List[dict],
+    reviews_summary: str,
+    review_style_codes: List[str],
+) -> Any:
+    """
+    FusionDecisionMaker를 스트리밍 모드로 실행합니다.
+
+    `decision_json`(str) 출력을 StyleCodeStreamParser로 증분 파싱해 style_code가 완성될 때마다
+    `on_style_code`를 호출하고, 최종 출력을 DecisionResult로 검증한 Prediction(`decision`)을 반환합니다.
+
+    스트림이 도중에 실패해도 이미 받은 style_code가 있으면 LM을 다시 호출하지 않고
+    그 코드로 만든 Prediction(`partial=True`)을 반환합니다. 받은 코드가 없으면 예외를 그대로 올립니다.
+    """
+    parser = StyleCodeStreamParser()
+    parts: List[str] = []
+    streamer = dspy.streamify(
+        streaming_fusion_maker(maker),
+        stream_listeners=[dspy.streaming.StreamListener(signature_field_name="decision_json")],
+    )
+    pred = None
+    try:
+        async for item in streamer(
+            user_query=user_query,
+            conversation_history=conversation_history,
+            products=products,
+            reviews_summary=reviews_summary,
+            review_style_codes=review_style_codes,
+        ):
+            if isinstance(item, dspy.streaming.StreamResponse):
+                parts.append(item.chunk)
+                for code in parser.feed(item.chunk):
+                    on_style_code(code)
+            elif isinstance(item, dspy.Prediction):
+                pred = item
+    except Exception as e:
+        if not parser.codes:
+            raise
+        error: str | None = f"{type(e).__name__}: {e}"
+    else:
+        error = None if pred is not None else "stream ended without a prediction"
+
+    raw = getattr(pred, "decision_json", None) if pred is not None else None
+    decision = parse_decision_json(raw if raw is not None else "".join(parts))
+    if decision is not None and error is None:
+        return dspy.Prediction(reasoning=getattr(pred, "reasoning", ""), decision=decision, partial=False)
+    if not parser.codes:
+        raise ValueError(error or "invalid decision_json output")
+    # 스트림 도중 실패/출력 검증 실패: 이미 받은(클라이언트에 보낸) style_code로 결정
+    decision = decision or DecisionResult(recommended_style_codes=parser.codes[:30])
+    return dspy.Prediction(decision=decision, partial=True, error=error or "invalid decision_json output")
+
+
 class RankingResult(BaseModel):
     recommended_style_codes: List[str] = Field(default_factory=list, description="우선순위 순")
 
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+
+# 노드별 "비싼 경로"를 타기 위해 필요한 최소 잔여 예산(ms).
+# 잔여 예산이 이보다 작으면 해당 노드는 저렴한 경로로 전환(degradation)합니다.
+SKIP_RELAXED_LLM = "skip_relaxed_llm"
+SKIP_STRUCTURED_FALLBACKS = "skip_structured_fallbacks"
+SKIP_MISSING_CODE_FETCH = "skip_missing_code_fetch"
+LOCAL_FUSION_RANKER = "local_fusion_ranker"
+SHORT_COMPOSER_PROMPT = "short_composer_prompt"
+
+MIN_REMAINING_MS: Dict[str, int] = {
+    SKIP_RELAXED_LLM: 20000,
+    SKIP_STRUCTURED_FALLBACKS: 12000,
+    SKIP_MISSING_CODE_FETCH: 15000,
+    LOCAL_FUSION_RANKER: 10000,
+    SHORT_COMPOSER_PROMPT: 6000,
+}
+
+
+@dataclass
+class LatencyBudget:
+    """요청 단위 지연 예산. 그래프 노드가 잔여 시간을 보고 저렴한 경로를 선택합니다."""
+
+    total_ms: int
+    started_at: float = field(default_factory=time.monotonic)
+    degradations: List[str] = field(default_factory=list)
+
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started_at) * 1000)
+
+    def remaining_ms(self) -> int:
+        return max(self.total_ms - self.elapsed_ms(), 0)
+
+    def should_degrade(self, name: str) -> bool:
+        """잔여 예산이 `name` 경로의 임계값보다 작으면 degradation을 기록하고 True."""
+        if self.total_ms <= 0:
+            return False
+        if self.remaining_ms() >= MIN_REMAINING_MS.get(name, 0):
+            return False
+        if name not in self.degradations:
+            self.degradations.append(name)
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "budget_ms": self.total_ms,
+            "elapsed_ms": self.elapsed_ms(),
+            "remaining_ms": self.remaining_ms(),
+            "degradations": list(self.degradations),
+        }
+
+
+# total_ms=0 이면 "예산 없음"(degradation 미발생). 노트북/CLI에서 그래프를 직접 호출할 때의 기본값.
+_CURRENT_BUDGET: ContextVar[Optional[LatencyBudget]] = ContextVar("latency_budget", default=None)
+
+
+def current_budget() -> LatencyBudget:
+    budget = _CURRENT_BUDGET.get()
+    if budget is None:
+        return LatencyBudget(total_ms=0)
+    return budget
+
+
+@contextmanager
+def latency_budget_scope(budget: LatencyBudget) -> Iterator[LatencyBudget]:
+    """이 컨텍스트에서 실행되는 그래프 노드들이 `budget`을 보도록 바인딩."""
+    token = _CURRENT_BUDGET.set(budget)
+    try:
+        yield budget
+    finally:
+        try:
+            _CURRENT_BUDGET.reset(token)
+        except ValueError:
+            # async generator가 다른 컨텍스트에서 정리(aclose)되는 경우
+            _CURRENT_BUDGET.set(None)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def normalize_style_code(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    code = value.strip()
+    return code or None
+
+
+def product_style_code(product: Any) -> Optional[str]:
+    if not isinstance(product, dict):
+        return None
+    return normalize_style_code(product.get("style_code") or product.get("STYLE_CODE"))
+
+
+def product_category(product: dict) -> str:
+    return str(product.get("category") or product.get("subcategory") or "기타")
+
+
+@dataclass
+class ProductPool:
+    """
+    merge 단계에서 만든 상품 풀. 그래프 state에는 `rows`(plain dict 리스트)만 저장하고
+    fusion/composer는 `build(rows)`로 인덱스를 다시 만듭니다(체크포인트에 커스텀 타입을 남기지 않도록).
+
+    - `rows`/`row_codes`/`row_categories`는 같은 인덱스로 정렬된 병렬 리스트(삽입 순서 유지,
+      style_code 중복 제거). style_code가 없는 상품은 style_code 있는 상품이 하나도 없을 때만
+      `rows`에 담음(`row_codes`는 None, 인덱스에는 넣지 않음)
+    - `codes`: style_code가 있는 row의 코드(row 순서)
+    - `index`: style_code -> row 인덱스(O(1) 조회)
+    - `categories`: 카테고리 -> row 인덱스 목록(등장 순서 유지)
+
+    row dict는 원본 객체를 그대로 참조하고(복사 없음), 추천/카테고리 그룹은 row 인덱스(int)만 보관합니다.
+    """
+
+    rows: List[dict] = field(default_factory=list)
+    row_codes: List[Optional[str]] = field(default_factory=list)
+    row_categories: List[str] = field(default_factory=list)
+    codes: List[str] = field(default_factory=list)
+    index: Dict[str, int] = field(default_factory=dict)
+    categories: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, *sources: Iterable[Any]) -> "ProductPool":
+        """style_code 있는 상품만 모으고, 그런 상품이 없으면 style_code 없는 상품까지 담습니다."""
+        pool = cls()
+        for products in sources:
+            pool.extend(products)
+        if not pool.rows:
+            for products in sources:
+                pool.extend(products, keep_codeless=True)
+        return pool
+
+    def extend(self, products: Iterable[Any], keep_codeless: bool = False) -> None:
+        for p in products or []:
+            self.add(p, keep_codeless=keep_codeless)
+
+    def add(self, product: Any, keep_codeless: bool = False) -> bool:
+        if not isinstance(product, dict):
+            return False
+        code = product_style_code(product)
+        if code is None and not keep_codeless:
+            return False
+        if code is not None and code in self.index:
+            return False
+        idx = len(self.rows)
+        cat = product_category(product)
+        self.rows.append(product)
+        self.row_codes.append(code)
+        self.row_categories.append(cat)
+        if code is not None:
+            self.codes.append(code)
+            self.index[code] = idx
+        self.categories.setdefault(cat, []).append(idx)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, code: Any) -> bool:
+        c = normalize_style_code(code)
+        return c is not None and c in self.index
+
+    def get(self, code: Any) -> Optional[dict]:
+        c = normalize_style_code(code)
+        if c is None:
+            return None
+        idx = self.index.get(c)
+        return self.rows[idx] if idx is not None else None
+
+    def known_codes(self, codes: Iterable[Any]) -> List[str]:
+        """`codes` 중 풀에 있는 코드만(입력 순서, 중복 제거)."""
+        out: List[str] = []
+        seen: set[str] = set()
+        for code in codes or []:
+            c = normalize_style_code(code)
+            if c is None or c in seen or c not in self.index:
+                continue
+            seen.add(c)
+            out.append(c)
+        return out
+
+    def row_ids(self, codes: Iterable[Any]) -> List[int]:
+        """`codes` 중 풀에 있는 코드의 row 인덱스(입력 순서, 중복 제거)."""
+        return [self.index[c] for c in self.known_codes(codes)]
+
+    def pick(self, row_ids: Iterable[int]) -> List[dict]:
+        return [self.rows[i] for i in row_ids]
+
+    def style_codes(self, row_ids: Iterable[int]) -> List[str]:
+        """row 인덱스들의 style_code(코드 없는 row는 건너뜀)."""
+        return [c for c in (self.row_codes[i] for i in row_ids) if c is not None]
+
+    def top_up(self, codes: Iterable[Any], k: int) -> List[int]:
+        """`codes`(풀에 있는 것만)의 row를 앞에 두고, 부족하면 풀 순서대로(코드 없는 row 포함) 채운 최대 k개 row."""
+        picked = self.row_ids(codes)[:k]
+        if len(picked) >= k:
+            return picked
+        seen = set(picked)
+        for idx in range(len(self.rows)):
+            if idx in seen:
+                continue
+            picked.append(idx)
+            if len(picked) >= k:
+                break
+        return picked
+
+    def group_by_category(self, row_ids: Iterable[int]) -> Dict[str, List[dict]]:
+        """`row_ids` 순서를 유지하며 카테고리별로 묶습니다(카테고리 순서 = 첫 등장 순서)."""
+        grouped: Dict[str, List[dict]] = {}
+        for idx in row_ids:
+            grouped.setdefault(self.row_categories[idx], []).append(self.rows[idx])
+        return grouped
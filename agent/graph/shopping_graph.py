@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import json
+import logging
 import re
 from typing import Any, Dict, List, NotRequired, Set, TypedDict
 
 import anyio
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph
 
 from ..core.artifacts import (
@@ -14,9 +16,21 @@ from ..core.artifacts import (
     get_relaxed_constraints_generator,
 )
 from ..core.config import SETTINGS
+from ..core.metrics import METRICS
 from ..dspy_modules.intent import IntentAnalysisAgent, ensure_dspy_configured
-from ..dspy_modules.recommender import coerce_relaxed_candidates
+from ..dspy_modules.recommender import coerce_relaxed_candidates, stream_fusion_decision
 from ..integrations.mcp_tools import execute_cortex_analyst_sql, execute_cortex_search_rag
+from .budget import (
+    LOCAL_FUSION_RANKER,
+    SHORT_COMPOSER_PROMPT,
+    SKIP_MISSING_CODE_FETCH,
+    SKIP_RELAXED_LLM,
+    SKIP_STRUCTURED_FALLBACKS,
+    current_budget,
+)
+from .product_pool import ProductPool
+
+logger = logging.getLogger("uvicorn.error")
 
 
 class ChatMessage(TypedDict):
@@ -59,8 +73,12 @@ class ShoppingState(TypedDict):
     fusion_decision: NotRequired[dict]
     recommended_style_codes: NotRequired[List[str]]
     recommended_products: NotRequired[List[dict]]
+    # 추천 상품의 merged_products row 인덱스(style_code 없는 상품 포함)
+    recommended_product_rows: NotRequired[List[int]]
+
+    # merge 단계의 상품 풀 row(정형 + 비정형 보강, style_code 중복 제거).
+    # 체크포인트에는 plain dict 리스트만 두고 ProductPool 인덱스는 노드에서 다시 만듦
     merged_products: NotRequired[List[dict]]
-    merged_style_codes: NotRequired[List[str]]
 
     # Composer output ("표현"만)
     llm_text: NotRequired[str]
@@ -91,53 +109,6 @@ def _format_history(messages: List[ChatMessage], max_turns: int) -> str:
     return "\n".join(lines).strip()
 
 
-def _pick_products_by_style_codes(products: List[dict], style_codes: List[str]) -> List[dict]:
-    if not style_codes:
-        return []
-    by_code: Dict[str, dict] = {}
-    for p in products:
-        if not isinstance(p, dict):
-            continue
-        code = p.get("style_code") or p.get("STYLE_CODE")
-        if isinstance(code, str) and code and code not in by_code:
-            by_code[code] = p
-    picked: List[dict] = []
-    for code in style_codes:
-        p = by_code.get(code)
-        if p:
-            picked.append(p)
-    return picked
-
-
-def _merge_products_by_style_code(primary: List[dict], extra: List[dict]) -> List[dict]:
-    merged: List[dict] = []
-    seen: Set[str] = set()
-    for p in primary + extra:
-        if not isinstance(p, dict):
-            continue
-        code = p.get("style_code") or p.get("STYLE_CODE")
-        if not isinstance(code, str) or not code:
-            continue
-        if code in seen:
-            continue
-        seen.add(code)
-        merged.append(p)
-    return merged
-
-
-def _extract_style_codes_from_products(products: List[dict]) -> List[str]:
-    codes: List[str] = []
-    seen: Set[str] = set()
-    for p in products:
-        if not isinstance(p, dict):
-            continue
-        code = p.get("style_code") or p.get("STYLE_CODE")
-        if isinstance(code, str) and code and code not in seen:
-            seen.add(code)
-            codes.append(code)
-    return codes
-
-
 def _chunk_list(items: List[str], size: int) -> List[List[str]]:
     return [items[i : i + size] for i in range(0, len(items), size)]
 
@@ -188,8 +159,88 @@ async def _fetch_products_by_style_codes(style_codes: List[str]) -> List[dict]:
     return results
 
 
-def _fallback_recommend_products(products: List[dict], k: int = 30) -> List[dict]:
-    return [p for p in products if isinstance(p, dict)][:k]
+def _state_pool(state: ShoppingState) -> ProductPool:
+    # merged_products는 이미 중복 제거된 pool.rows라 다시 build해도 row 인덱스가 같음
+    rows = state.get("merged_products")
+    return ProductPool.build(rows if rows is not None else state.get("structured_data", []) or [])
+
+
+_SHORT_PROMPT_FIELDS = ("product_name", "price", "color", "url")
+_SHORT_PROMPT_PER_CATEGORY = 5
+
+
+def _compose_prompt(
+    query: str, history_text: str, decision: Any, grouped_recommended_products: Dict[str, List[dict]]
+) -> str:
+    return f"""
+[대화 히스토리]
+{history_text or "없음"}
+
+사용자 질문: {query}
+
+아래는 추천 결정 결과다(구조화):
+{decision}
+
+아래는 추천 상품(카테고리별 그룹)이다:
+{grouped_recommended_products}
+
+요청:
+- 한국어로, 사용자 질문에 맞는 '패션 의류 쇼핑 추천' 답변을 작성해라.
+- 반드시 카테고리별 섹션(예: '상의', '아우터', '바지' 등)으로 나눠서 작성해라.
+- 각 섹션에서 상위 추천부터 보여줘라.
+- 추천은 총 최대 30개까지 가능하나, 너무 길어지면 카테고리별로 '상세 3~5개 + 나머지 간단 나열' 방식으로 요약해라.
+- 각 상품의 상세 표기는 가능한 한 (상품명, 가격, 색상, 사이즈, 소재/특징 1줄, 링크(url))을 포함해라.
+- 사용자의 의도가 불명확하면, 마지막에 선택 질문 1~2개(예: 핏/예산/사용상황)를 짧게 추가해라.
+""".strip()
+
+
+def _compose_short_prompt(query: str, grouped_recommended_products: Dict[str, List[dict]]) -> str:
+    """예산 부족 시: 히스토리/결정 근거를 빼고 카테고리별 상위 상품의 핵심 필드만 담은 짧은 프롬프트."""
+    compact = {
+        cat: [
+            {k: p.get(k) for k in _SHORT_PROMPT_FIELDS if p.get(k) is not None}
+            for p in items[:_SHORT_PROMPT_PER_CATEGORY]
+        ]
+        for cat, items in grouped_recommended_products.items()
+    }
+    return f"""
+사용자 질문: {query}
+
+추천 상품(카테고리별 상위):
+{compact}
+
+요청:
+- 한국어로 카테고리별 섹션을 나눠 간결하게 추천해라(상품명, 가격, 링크).
+""".strip()
+
+
+async def _stream_fusion(maker: Any, pool: ProductPool, args: tuple) -> Any:
+    """
+    스트리밍 fusion: 추천 style_code가 완성될 때마다 graph `custom` 스트림으로 내보냅니다
+    (카드 렌더링이 fusion 근거 생성 완료 전에 시작될 수 있음).
+    스트리밍이 실패하고 받은 style_code도 없으면 None을 반환하고 호출 측이 일반 호출로 대체합니다.
+    도중에 실패했지만 이미 보낸 style_code가 있으면 LM을 다시 부르지 않고 그 결과(partial)를 씁니다.
+    """
+    writer = get_stream_writer()
+    emitted: List[str] = []
+
+    def on_style_code(code: str) -> None:
+        product = pool.get(code)
+        if product is None:
+            return
+        emitted.append(code)
+        writer({"fusion_code": {"style_code": code, "rank": len(emitted), "product": product}})
+
+    try:
+        pred = await stream_fusion_decision(maker, on_style_code, *args)
+    except Exception as e:
+        METRICS.inc("fusion_stream_failures")
+        logger.warning("fusion streaming failed, falling back to blocking call: %s: %s", type(e).__name__, e)
+        return None
+    if getattr(pred, "partial", False):
+        METRICS.inc("fusion_stream_partial")
+        logger.warning("fusion stream incomplete (%s), using %d streamed codes", pred.error, len(emitted))
+    return pred
 
 
 async def intent_analysis_node(state: ShoppingState) -> dict:
@@ -232,7 +283,12 @@ async def structured_query_node(state: ShoppingState) -> dict:
             return v if v and v not in {"의", "가", "는"} else None
         return None
 
+    budget = current_budget()
+
     async def _generate_relaxed_candidates(brand_hint: str | None) -> List[str]:
+        # 예산이 부족하면 LLM 완화 후보 생성을 건너뛰고 규칙 기반 fallback만 사용
+        if budget.should_degrade(SKIP_RELAXED_LLM):
+            return []
         ensure_dspy_configured()
         generator = get_relaxed_constraints_generator()
         pred = await anyio.to_thread.run_sync(generator, user_query, base, brand_hint or "")
@@ -258,8 +314,11 @@ async def structured_query_node(state: ShoppingState) -> dict:
                 success_constraints = cand
                 break
 
+    # 예산이 거의 소진되면 남은 규칙 기반 fallback(각각 Analyst 호출)을 생략
+    cascade_allowed = analyst_result.get("rows") or not budget.should_degrade(SKIP_STRUCTURED_FALLBACKS)
+
     # 최소 안전장치
-    if not analyst_result.get("rows"):
+    if cascade_allowed and not analyst_result.get("rows"):
         rule_candidates: List[str] = []
         if "기모" in base:
             rule_candidates.append(re.sub(r"\s+", " ", base.replace("기모", " ")).strip())
@@ -275,7 +334,7 @@ async def structured_query_node(state: ShoppingState) -> dict:
                 success_constraints = cand
                 break
 
-    if not analyst_result.get("rows"):
+    if cascade_allowed and not analyst_result.get("rows"):
         if brand_hint:
             cand = f"{brand_hint} 브랜드 제품"
             if cand not in attempts:
@@ -285,7 +344,7 @@ async def structured_query_node(state: ShoppingState) -> dict:
                     analyst_result = r
                     success_constraints = cand
 
-    if (not analyst_result.get("rows")) and user_query and (user_query not in attempts):
+    if cascade_allowed and (not analyst_result.get("rows")) and user_query and (user_query not in attempts):
         attempts.append(user_query)
         analyst_result = await execute_cortex_analyst_sql(user_query)
         if analyst_result.get("rows"):
@@ -325,83 +384,48 @@ async def unstructured_query_node(state: ShoppingState) -> dict:
 
 
 async def merge_results_node(state: ShoppingState) -> dict:
-    structured_products = state.get("structured_data", [])
-    structured_codes = state.get("structured_style_codes", []) or _extract_style_codes_from_products(
-        structured_products
-    )
-    unstructured_codes = state.get("unstructured_style_codes", [])
-
-    structured_code_set = {c for c in structured_codes if isinstance(c, str)}
+    structured_products = state.get("structured_data", []) or []
+    pool = ProductPool.build(structured_products)
+    unstructured_codes = state.get("unstructured_style_codes", []) or []
     missing_codes = [
-        c for c in unstructured_codes if isinstance(c, str) and c and c not in structured_code_set
+        c for c in dict.fromkeys(unstructured_codes) if isinstance(c, str) and c and c not in pool
     ]
-    extra_products: List[dict] = []
-    if missing_codes:
+    if missing_codes and not current_budget().should_degrade(SKIP_MISSING_CODE_FETCH):
         extra_products = await _fetch_products_by_style_codes(missing_codes)
-
-    merged_products = _merge_products_by_style_code(structured_products, extra_products)
-    merged_style_codes = _extract_style_codes_from_products(merged_products)
-    return {
-        "merged_products": merged_products,
-        "merged_style_codes": merged_style_codes,
-    }
+        if extra_products:
+            # 보강 상품에 style_code가 있으면 정형 결과의 코드 없는 상품은 빠져야 하므로 다시 build
+            pool = ProductPool.build(structured_products, extra_products)
+    return {"merged_products": pool.rows}
 
 
 async def result_fusion_node(state: ShoppingState) -> dict:
     ensure_dspy_configured()
-    products = state.get("merged_products") or state.get("structured_data", [])
+    pool = _state_pool(state)
     query = state["user_query"]
     reviews_summary = state.get("unstructured_reviews_summary", "")
     review_style_codes = state.get("unstructured_style_codes", [])
     history_text = _format_history(state.get("messages", []), SETTINGS.memory_max_turns)
 
-    maker = get_fusion_decision_maker()
-    pred = await anyio.to_thread.run_sync(
-        maker,
-        query,
-        history_text or "",
-        products,
-        reviews_summary or "",
-        review_style_codes or [],
-    )
-    decision_obj = getattr(pred, "decision", None)
+    decision_obj = None
+    # 예산이 부족하면 FusionDecisionMaker(LLM) 대신 아래 로컬 랭킹(리뷰 교집합 우선)을 사용
+    if not current_budget().should_degrade(LOCAL_FUSION_RANKER):
+        maker = get_fusion_decision_maker()
+        args = (query, history_text or "", pool.rows, reviews_summary or "", review_style_codes or [])
+        pred = None
+        if SETTINGS.fusion_streaming:
+            pred = await _stream_fusion(maker, pool, args)
+        if pred is None:
+            pred = await anyio.to_thread.run_sync(maker, *args)
+        decision_obj = getattr(pred, "decision", None)
     rec_codes = getattr(decision_obj, "recommended_style_codes", None)
 
     if not isinstance(rec_codes, list) or not rec_codes:
-        product_codes: List[str] = []
-        for p in products:
-            if not isinstance(p, dict):
-                continue
-            code = p.get("style_code") or p.get("STYLE_CODE")
-            if isinstance(code, str) and code:
-                product_codes.append(code)
-        inter = [c for c in review_style_codes if c in set(product_codes)]
-        rec_codes = inter[:30] if inter else product_codes[:30]
+        inter = pool.known_codes(review_style_codes)
+        rec_codes = inter[:30] if inter else pool.codes[:30]
 
     rec_codes = [c for c in rec_codes if isinstance(c, str) and c]
-    rec_products = _pick_products_by_style_codes(products, rec_codes)
-    if products and rec_products:
-        # 보유 상품 풀에서 부족한 추천 수를 보정(최대 30개)
-        target_k = 30
-        if len(rec_products) < target_k:
-            seen_codes: Set[str] = set()
-            for p in rec_products:
-                if not isinstance(p, dict):
-                    continue
-                code = p.get("style_code") or p.get("STYLE_CODE")
-                if isinstance(code, str) and code:
-                    seen_codes.add(code)
-            for p in products:
-                if not isinstance(p, dict):
-                    continue
-                code = p.get("style_code") or p.get("STYLE_CODE")
-                if isinstance(code, str) and code and code in seen_codes:
-                    continue
-                rec_products.append(p)
-                if isinstance(code, str) and code:
-                    seen_codes.add(code)
-                if len(rec_products) >= target_k:
-                    break
+    # 보유 상품 풀에서 부족한 추천 수를 보정(최대 30개)
+    product_rows = pool.top_up(rec_codes, 30) if pool.known_codes(rec_codes) else []
     return {
         "fusion_decision": {
             "recommended_style_codes": rec_codes,
@@ -409,71 +433,38 @@ async def result_fusion_node(state: ShoppingState) -> dict:
             "caveats": getattr(decision_obj, "caveats", []) or [],
         },
         "recommended_style_codes": rec_codes,
-        "recommended_products": rec_products,
+        "recommended_products": pool.pick(product_rows),
+        "recommended_product_rows": product_rows,
     }
 
 
 async def response_composer_node(state: ShoppingState) -> dict:
     ensure_dspy_configured()
     query = state["user_query"]
-    products = state.get("merged_products") or state.get("structured_data", [])
+    pool = _state_pool(state)
 
-    rec_products = state.get("recommended_products", [])
-    if not rec_products and products:
+    budget = current_budget()
+    rec_rows = [i for i in state.get("recommended_product_rows", []) or [] if 0 <= i < len(pool)]
+    if not rec_rows and len(pool) and not budget.should_degrade(LOCAL_FUSION_RANKER):
         history_text = _format_history(state.get("messages", []), SETTINGS.memory_max_turns)
         ranker = get_product_ranker()
-        pred = await anyio.to_thread.run_sync(ranker, query, history_text or "", products)
+        pred = await anyio.to_thread.run_sync(ranker, query, history_text or "", pool.rows)
         ranked = getattr(pred, "recommended_style_codes", None)
         codes = getattr(ranked, "recommended_style_codes", None) if ranked is not None else None
         if isinstance(codes, list) and codes:
-            codes = [c for c in codes if isinstance(c, str) and c][:30]
-            rec_products = _pick_products_by_style_codes(products, codes)
-        if not rec_products:
-            rec_products = _fallback_recommend_products(products, k=30)
+            rec_rows = pool.row_ids(codes)[:30]
+    if not rec_rows:
+        rec_rows = list(range(min(len(pool), 30)))
+    rec_products = pool.pick(rec_rows)
+    rec_codes = pool.style_codes(rec_rows)
     decision = state.get("fusion_decision", {})
+    grouped_recommended_products = pool.group_by_category(rec_rows)
 
-    grouped: dict[str, List[dict]] = {}
-    category_order: List[str] = []
-    for p in rec_products:
-        if not isinstance(p, dict):
-            continue
-        cat = p.get("category") or p.get("subcategory") or "기타"
-        cat = str(cat)
-        if cat not in grouped:
-            grouped[cat] = []
-            category_order.append(cat)
-        grouped[cat].append(p)
-    grouped_recommended_products = {cat: grouped[cat] for cat in category_order}
-
-    history_text = _format_history(state.get("messages", []), SETTINGS.memory_max_turns)
-    prompt = f"""
-[대화 히스토리]
-{history_text or "없음"}
-
-사용자 질문: {query}
-
-아래는 추천 결정 결과다(구조화):
-{decision}
-
-아래는 추천 상품(카테고리별 그룹)이다:
-{grouped_recommended_products}
-
-요청:
-- 한국어로, 사용자 질문에 맞는 '패션 의류 쇼핑 추천' 답변을 작성해라.
-- 반드시 카테고리별 섹션(예: '상의', '아우터', '바지' 등)으로 나눠서 작성해라.
-- 각 섹션에서 상위 추천부터 보여줘라.
-- 추천은 총 최대 30개까지 가능하나, 너무 길어지면 카테고리별로 '상세 3~5개 + 나머지 간단 나열' 방식으로 요약해라.
-- 각 상품의 상세 표기는 가능한 한 (상품명, 가격, 색상, 사이즈, 소재/특징 1줄, 링크(url))을 포함해라.
-- 사용자의 의도가 불명확하면, 마지막에 선택 질문 1~2개(예: 핏/예산/사용상황)를 짧게 추가해라.
-""".strip()
-
-    derived_rec_codes: List[str] = []
-    for p in rec_products:
-        if not isinstance(p, dict):
-            continue
-        code = p.get("style_code") or p.get("STYLE_CODE")
-        if isinstance(code, str) and code:
-            derived_rec_codes.append(code)
+    if budget.should_degrade(SHORT_COMPOSER_PROMPT):
+        prompt = _compose_short_prompt(query, grouped_recommended_products)
+    else:
+        history_text = _format_history(state.get("messages", []), SETTINGS.memory_max_turns)
+        prompt = _compose_prompt(query, history_text, decision, grouped_recommended_products)
 
     # NOTE:
     # LLM 최종 답변 생성/스트리밍은 API 레이어(routes_chat.py)에서 Bedrock 스트리밍으로 수행합니다.
@@ -481,7 +472,7 @@ async def response_composer_node(state: ShoppingState) -> dict:
     api_response = {
         "recommended_products": rec_products,
         "grouped_recommended_products": grouped_recommended_products,
-        "recommended_style_codes": derived_rec_codes,
+        "recommended_style_codes": rec_codes,
         "composer_prompt": prompt,
     }
 
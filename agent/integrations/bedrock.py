@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import anyio
+
+from ..core.config import SETTINGS
+
+
+def has_aws_creds() -> bool:
+    # If any of these are present, boto3 has a good chance to resolve credentials.
+    if os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
+        return True
+    if os.getenv("AWS_PROFILE"):
+        return True
+    if os.getenv("AWS_WEB_IDENTITY_TOKEN_FILE"):
+        return True
+    if os.getenv("AWS_CONTAINER_CREDENTIALS_RELATIVE_URI") or os.getenv("AWS_CONTAINER_CREDENTIALS_FULL_URI"):
+        return True
+    return False
+
+
+def bedrock_model_id() -> str:
+    m = SETTINGS.dspy_model
+    return m[len("bedrock/") :] if m.startswith("bedrock/") else m
+
+
+_CLIENT: Any = None
+_CLIENT_LOCK = threading.Lock()
+_READ_LIMITER: Optional[anyio.CapacityLimiter] = None
+
+
+def get_bedrock_client() -> Any:
+    """
+    프로세스 공용 bedrock-runtime 클라이언트.
+
+    boto3 client는 thread-safe하므로 한 번만 만들고(커넥션 풀/TLS 재사용) 모든 요청이 공유합니다.
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        return _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            # boto3는 import 비용이 커서 실제로 클라이언트가 필요할 때 불러옵니다(warm-up 또는 첫 요청).
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "ap-northeast-2"
+            _CLIENT = boto3.client(
+                "bedrock-runtime",
+                region_name=region,
+                config=BotoConfig(
+                    read_timeout=300,
+                    connect_timeout=10,
+                    retries={"max_attempts": 2},
+                    max_pool_connections=SETTINGS.bedrock_max_pool_connections,
+                    tcp_keepalive=True,
+                ),
+            )
+    return _CLIENT
+
+
+def _read_limiter() -> anyio.CapacityLimiter:
+    # 기본 to_thread 리미터(DSPy 노드 등과 공유)와 분리된 Bedrock 스트림 전용 리미터
+    global _READ_LIMITER
+    if _READ_LIMITER is None:
+        _READ_LIMITER = anyio.CapacityLimiter(max(SETTINGS.bedrock_stream_threads, 1))
+    return _READ_LIMITER
+
+
+def _request_body(prompt: str) -> str:
+    body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 10000,
+        "temperature": 0.2,
+        "messages": [
+            {"role": "user", "content": [{"type": "text", "text": prompt}]},
+        ],
+    }
+    return json.dumps(body)
+
+
+def _open_stream(prompt: str) -> Any:
+    resp = get_bedrock_client().invoke_model_with_response_stream(
+        modelId=bedrock_model_id(), body=_request_body(prompt)
+    )
+    return resp.get("body")
+
+
+def _event_text_delta(event: Any) -> Optional[str]:
+    chunk = event.get("chunk") if isinstance(event, dict) else None
+    if not chunk:
+        return None
+    raw = chunk.get("bytes")
+    if not raw:
+        return None
+    try:
+        payload = json.loads(raw.decode("utf-8"))
+    except Exception:
+        return None
+    # Anthropic stream event types: message_start/content_block_start/content_block_delta/message_delta/message_stop
+    if payload.get("type") == "content_block_delta":
+        delta = (payload.get("delta") or {}).get("text")
+        if isinstance(delta, str) and delta:
+            return delta
+    return None
+
+
+class _DeltaBuffer:
+    """
+    리더 스레드 → 이벤트 루프 delta 전달 버퍼.
+
+    리더는 delta를 쌓기만 하고, 버퍼가 비어 있다가 채워질 때만 루프를 깨움(`call_soon_threadsafe`).
+    소비자는 깨어날 때마다 쌓인 delta를 한 번에 가져가므로 토큰마다 스레드 hop을 하지 않습니다.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._wake = asyncio.Event()
+        self._items: List[str] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+
+    def _notify(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            # 루프가 이미 닫힘(서버 종료)
+            pass
+
+    def push(self, delta: str) -> None:
+        with self._lock:
+            was_empty = not self._items
+            self._items.append(delta)
+        if was_empty:
+            self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._done = True
+            self._error = error
+        self._notify()
+
+    async def drain(self) -> Optional[List[str]]:
+        """쌓인 delta를 모두 반환. 비어 있으면 기다리고, 스트림이 끝났으면 None(오류였으면 raise)."""
+        while True:
+            with self._lock:
+                if self._items:
+                    items, self._items = self._items, []
+                    return items
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return None
+                self._wake.clear()
+            await self._wake.wait()
+
+
+def _pump_deltas(events: Iterator[Any], stop: threading.Event, buffer: _DeltaBuffer) -> None:
+    """스트림 이벤트를 끝까지 읽어 텍스트 delta를 버퍼에 넣습니다(비텍스트 이벤트는 건너뜀)."""
+    error: Optional[BaseException] = None
+    try:
+        for event in events:
+            if stop.is_set():
+                break
+            delta = _event_text_delta(event)
+            if delta:
+                buffer.push(delta)
+    except Exception as e:
+        error = e
+    finally:
+        buffer.finish(error)
+
+
+async def stream_bedrock_text(prompt: str) -> AsyncIterator[str]:
+    """
+    Bedrock(Anthropic) 응답 스트림의 텍스트를 async로 내보냅니다.
+
+    boto3 이벤트 스트림은 blocking 소켓 읽기라, 스트림마다 전용 리미터의 워커 하나가 끝까지 읽고
+    delta를 `_DeltaBuffer`에 쌓습니다. 이벤트 루프는 깨어날 때마다 그동안 쌓인 delta를 이어 붙여
+    한 조각으로 내보내므로(토큰당 hop 없음) 소비자가 느릴수록 조각이 커집니다.
+    소비자가 취소되면(클라이언트 연결 종료) `stop` 신호와 스트림 close로 워커가 더 이상 읽지 않게 합니다.
+    """
+    limiter = _read_limiter()
+    stream = await anyio.to_thread.run_sync(_open_stream, prompt, limiter=limiter)
+    if stream is None:
+        return
+    buffer = _DeltaBuffer(asyncio.get_running_loop())
+    stop = threading.Event()
+    reader = asyncio.create_task(
+        anyio.to_thread.run_sync(_pump_deltas, iter(stream), stop, buffer, limiter=limiter, abandon_on_cancel=True)
+    )
+    try:
+        while True:
+            items = await buffer.drain()
+            if items is None:
+                return
+            yield "".join(items)
+    finally:
+        stop.set()
+        close = getattr(stream, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+        if not reader.done():
+            reader.cancel()
@@ -39,6 +39,33 @@ async def call_mcp_tool_sse(tool_name: str, arguments: dict) -> Any:
             return await session.call_tool(tool_name, arguments)
 
 
+async def probe_mcp_servers() -> dict:
+    """
+    설정된 MCP 서버에 연결해 initialize/list_tools까지 확인합니다(워밍업/준비 상태 점검용).
+
+    도구 호출은 요청마다 새 세션을 열기 때문에 세션 자체를 재사용하지는 않지만,
+    DNS/TLS/서버 측 콜드 스타트 비용을 트래픽 전에 치르고 설정 오류를 일찍 드러냅니다.
+    """
+    out: dict = {}
+    if SETTINGS.mcp_snowflake_url:
+        async with streamable_http_client(SETTINGS.mcp_snowflake_url) as client:
+            read, write = _unpack_client(client, "streamable_http_client")
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                out["snowflake"] = len(getattr(tools, "tools", []) or [])
+    if SETTINGS.mcp_cortex_analyst_url:
+        async with sse_client(SETTINGS.mcp_cortex_analyst_url) as client:
+            read, write = _unpack_client(client, "sse_client")
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                out["cortex_analyst"] = len(getattr(tools, "tools", []) or [])
+    if not out:
+        raise RuntimeError("MCP server URLs not configured")
+    return out
+
+
 def _normalize_tool_result(result: Any) -> Any:
     if isinstance(result, list):
         return result
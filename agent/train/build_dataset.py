@@ -3,9 +3,13 @@ from __future__ import annotations
 import argparse
 import json
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
-from ..core.curation import load_curation_state
+from ..core.curation import curation_excluded, curation_version, load_curation_state
+from ..core.log_index import log_index
+from ..core.log_segments import segmented_log
+from ..core.storage import utc_now_iso
+from .product_store import ProductStore, product_store_path
 
 
 def read_jsonl(path: Path) -> List[Dict[str, Any]]:
@@ -28,88 +32,321 @@ def write_jsonl(path: Path, rows: List[Dict[str, Any]]) -> None:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
 
-def build_datasets(
-    chat_log: Path,
-    feedback_log: Path,
-    out_ranker: Path,
-    out_relax: Path,
-    out_fusion: Path,
-) -> dict:
-    chats = read_jsonl(chat_log)
-    feedbacks = read_jsonl(feedback_log)
-    fb_by_mid = {f.get("message_id"): f for f in feedbacks if f.get("message_id")}
+# 상품 목록을 담는(상품 테이블을 참조하는) 데이터셋
+_LABELED = ("ranker", "fusion")
 
-    curation = load_curation_state()
-    excluded = set(curation.excluded_message_ids)
-    bad_labeled = {mid for mid, v in curation.quality_labels.items() if v == "bad"}
-    excluded |= bad_labeled
+# 피드백이 먼저 기록되어 아직 chat 레코드를 찾지 못한 message_id는 최대 이만큼 보관
+_MAX_ORPHANS = 10000
 
-    ranker_rows: List[Dict[str, Any]] = []
-    relax_rows: List[Dict[str, Any]] = []
-    fusion_rows: List[Dict[str, Any]] = []
 
-    for c in chats:
-        mid = c.get("message_id")
-        if not mid:
+def build_state_path(out_ranker: Path) -> Path:
+    return out_ranker.with_name(out_ranker.name + ".build_state.json")
+
+
+def _iter_records(path: Path, start: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """로그(회전 세그먼트 포함)의 `start` 이후 레코드를 (그 줄 끝의 논리 오프셋, 레코드)로 지연 순회."""
+    for pos, raw in segmented_log(path).iter_lines(start):
+        end = pos + len(raw) + 1
+        line = raw.strip()
+        if not line:
             continue
-        if mid in excluded:
+        try:
+            obj = json.loads(line)
+        except Exception:
             continue
+        if isinstance(obj, dict):
+            yield end, obj
 
-        fb = fb_by_mid.get(mid)
-        selected = (fb or {}).get("selected_style_codes") if isinstance(fb, dict) else None
-        if isinstance(selected, list) and selected:
-            products = c.get("structured_products", [])
-            if not isinstance(products, list):
-                products = []
 
-            ranker_rows.append(
-                {
-                    "user_query": c.get("user_query", ""),
-                    "conversation_history": "",
-                    "products_json": json.dumps(products, ensure_ascii=False),
-                    "label_style_codes": [x for x in selected if isinstance(x, str)],
-                    "meta": {"message_id": mid},
-                }
-            )
+def _selected(fb: Any) -> Optional[List[str]]:
+    selected = fb.get("selected_style_codes") if isinstance(fb, dict) else None
+    if isinstance(selected, list):
+        codes = [x for x in selected if isinstance(x, str)]
+        if codes:
+            return codes
+    return None
 
-            un = c.get("unstructured", {}) if isinstance(c.get("unstructured"), dict) else {}
-            fusion_rows.append(
-                {
-                    "user_query": c.get("user_query", ""),
-                    "conversation_history": "",
-                    "products_json": json.dumps(products, ensure_ascii=False),
-                    "reviews_summary": (un.get("review_summary") or ""),
-                    "review_style_codes_json": json.dumps(
-                        un.get("review_style_codes", []) or [], ensure_ascii=False
-                    ),
-                    "label_style_codes": [x for x in selected if isinstance(x, str)],
-                    "meta": {"message_id": mid},
-                }
-            )
 
+class _Writers:
+    """
+    세 데이터셋 파일에 한 줄씩 기록(전체 빌드는 임시 파일에 쓴 뒤 교체, 증분은 append).
+    ranker/fusion 행은 상품을 `product_keys`로만 참조하고 본문은 상품 테이블(`product_store`)에 한 번만 저장.
+    상품 테이블은 같은 디렉터리의 다른 데이터셋도 참조하므로 전체 빌드에서도 비우지 않고 append만 함.
+    """
+
+    def __init__(self, paths: Dict[str, Path], append: bool):
+        self.paths = paths
+        self.append = append
+        self.added = {name: 0 for name in paths}
+        self._files = {}
+        self._stores: Dict[Path, ProductStore] = {}
+        self._store_of: Dict[str, ProductStore] = {}
+        for name, path in paths.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            target = path if append else _tmp(path)
+            self._files[name] = target.open("a" if append else "w", encoding="utf-8")
+        for name in _LABELED:
+            store_path = product_store_path(paths[name])
+            if store_path not in self._stores:
+                self._stores[store_path] = ProductStore(store_path)
+            self._store_of[name] = self._stores[store_path]
+
+    def write(self, name: str, row: Dict[str, Any]) -> None:
+        self._files[name].write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.added[name] += 1
+
+    def emit_labeled(self, c: Dict[str, Any], selected: List[str]) -> None:
+        mid = c.get("message_id")
+        products = c.get("structured_products", [])
+        if not isinstance(products, list):
+            products = []
+        self.write(
+            "ranker",
+            {
+                "user_query": c.get("user_query", ""),
+                "conversation_history": "",
+                "product_keys": self._store_of["ranker"].put_many(products),
+                "label_style_codes": selected,
+                "meta": {"message_id": mid},
+            },
+        )
+        un = c.get("unstructured", {}) if isinstance(c.get("unstructured"), dict) else {}
+        self.write(
+            "fusion",
+            {
+                "user_query": c.get("user_query", ""),
+                "conversation_history": "",
+                "product_keys": self._store_of["fusion"].put_many(products),
+                "reviews_summary": (un.get("review_summary") or ""),
+                "review_style_codes_json": json.dumps(un.get("review_style_codes", []) or [], ensure_ascii=False),
+                "label_style_codes": selected,
+                "meta": {"message_id": mid},
+            },
+        )
+
+    def emit_relax(self, c: Dict[str, Any]) -> None:
         st = c.get("structured") if isinstance(c.get("structured"), dict) else {}
         attempts = st.get("constraints_attempts", []) if isinstance(st, dict) else []
         used = st.get("constraints_used") if isinstance(st, dict) else None
         if isinstance(attempts, list) and used and isinstance(used, str):
-            relax_rows.append(
+            self.write(
+                "relax",
                 {
                     "user_query": c.get("user_query", ""),
                     "strict_constraints": attempts[0] if attempts else "",
                     "brand_hint": "",
                     "label_candidates": [used],
-                    "meta": {"message_id": mid},
-                }
+                    "meta": {"message_id": c.get("message_id")},
+                },
             )
 
-    write_jsonl(out_ranker, ranker_rows)
-    write_jsonl(out_relax, relax_rows)
-    write_jsonl(out_fusion, fusion_rows)
+    def close(self, commit: bool = True) -> None:
+        # 데이터셋 행이 참조하는 상품이 먼저 보이도록 상품 테이블부터 닫음(append 전용이라 교체하지 않음)
+        for store in self._stores.values():
+            store.close()
+        for name, f in self._files.items():
+            f.close()
+            if not self.append:
+                if commit:
+                    _tmp(self.paths[name]).replace(self.paths[name])
+                else:
+                    _tmp(self.paths[name]).unlink(missing_ok=True)
+
+
+def _tmp(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _drop_excluded(paths: Dict[str, Path], excluded: Set[str]) -> Dict[str, int]:
+    """기존 데이터셋에서 `meta.message_id`가 제외 집합에 든 행만 빼고 다시 씀(로그를 다시 읽지 않음). 남은 행 수."""
+    counts: Dict[str, int] = {}
+    for name, path in paths.items():
+        kept = 0
+        with path.open("r", encoding="utf-8") as src, _tmp(path).open("w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                try:
+                    meta = json.loads(line).get("meta")
+                except Exception:
+                    meta = None
+                if isinstance(meta, dict) and meta.get("message_id") in excluded:
+                    continue
+                dst.write(line if line.endswith("\n") else line + "\n")
+                kept += 1
+        _tmp(path).replace(path)
+        counts[name] = kept
+    return counts
+
+
+def _log_floors(logs: Dict[str, Path]) -> Dict[str, int]:
+    """보존 정책으로 앞부분이 삭제된 로그의 floor(논리 오프셋). 삭제된 구간이 없으면 빠짐."""
+    floors = {key: int(segmented_log(path).manifest()["floor"]) for key, path in logs.items()}
+    return {key: floor for key, floor in floors.items() if floor > 0}
+
+
+def _rebuild_reason(state: Optional[Dict[str, Any]], outputs: Dict[str, str], version: str, paths: Dict[str, Path], logs: Dict[str, Path]) -> Optional[str]:
+    if state is None:
+        return "no_watermark"
+    if state.get("outputs") != outputs:
+        return "outputs_changed"
+    if state.get("curation_version") != version:
+        return "curation_changed"
+    if any(not p.exists() for p in [*paths.values(), *(product_store_path(paths[n]) for n in _LABELED)]):
+        return "output_missing"
+    for key, path in logs.items():
+        if segmented_log(path).size() < int(state.get(f"{key}_offset", 0)):
+            return f"{key}_log_truncated"
+    return None
+
+
+def build_datasets(
+    chat_log: Path,
+    feedback_log: Path,
+    out_ranker: Path,
+    out_relax: Path,
+    out_fusion: Path,
+    full: bool = False,
+) -> dict:
+    """
+    chat/feedback 로그(회전 세그먼트 포함)로 학습 데이터셋을 만듭니다.
+
+    - ranker/fusion 행은 compact 형식: 상품은 `product_keys`(내용 해시)로 참조하고 본문은 같은 디렉터리의
+      `products.jsonl`에 한 번만 저장(`product_store.iter_dataset`로 `products_json` 복원)
+    - 워터마크(`<out_ranker>.build_state.json`): 처리한 chat/feedback 논리 오프셋 + curation 버전
+    - 기본은 증분: 워터마크 이후 레코드만 지연 순회해 데이터셋에 append
+      - 새 chat: relax 예제, 이미 받은(또는 이번에 받은) 피드백이 있으면 ranker/fusion 예제
+      - 새 피드백의 chat이 이전 실행에서 처리됐으면 chat 로그 색인으로 그 레코드만 찾아 추가
+    - curation 제외 집합이 늘기만 했으면 로그를 다시 읽지 않고 기존 데이터셋에서 제외된 message_id 행만 뺀 뒤 증분 진행
+    - 전체 재빌드: `full=True`, 워터마크 없음, curation 제외 해제, 출력 경로 변경/파일 없음,
+      로그가 워터마크보다 짧아짐, 이미 예제로 만든 message_id의 선택이 바뀐 피드백.
+      로그 보존 정책(LOG_RETENTION_DAYS)으로 삭제된 구간의 예제는 복구할 수 없으므로 결과 `warnings`에 남김
+    """
+    paths = {"ranker": out_ranker, "relax": out_relax, "fusion": out_fusion}
+    outputs = {name: str(path) for name, path in paths.items()}
+    state_path = build_state_path(out_ranker)
+    try:
+        state: Optional[Dict[str, Any]] = json.loads(state_path.read_text(encoding="utf-8"))
+    except Exception:
+        state = None
+
+    curation = load_curation_state()
+    excluded = curation_excluded(curation)
+    version = curation_version(curation)
+
+    logs = {"chat": chat_log, "feedback": feedback_log}
+    reason = "requested" if full else _rebuild_reason(state, outputs, version, paths, logs)
+    curation_filtered = 0
+    if reason == "curation_changed" and isinstance(state.get("excluded"), list):  # type: ignore[union-attr]
+        previous = set(state["excluded"])  # type: ignore[index]
+        # 제외가 늘기만 했으면 기존 행에서 빼면 됨(해제된 message_id가 있으면 로그에서 다시 만들어야 하므로 전체 재빌드)
+        if previous <= excluded:
+            state = {**state, "curation_version": version}  # type: ignore[dict-item]
+            reason = _rebuild_reason(state, outputs, version, paths, logs)
+            if reason is None:
+                before = sum(int(v) for v in (state.get("counts") or {}).values())
+                state["counts"] = _drop_excluded(paths, excluded)
+                state["emitted"] = {m: sel for m, sel in (state.get("emitted") or {}).items() if m not in excluded}
+                state["orphans"] = {m: sel for m, sel in (state.get("orphans") or {}).items() if m not in excluded}
+                curation_filtered = before - sum(state["counts"].values())
+    warnings: List[str] = []
+    if reason:
+        for key, floor in _log_floors(logs).items():
+            warnings.append(
+                f"full rebuild: {key} log before offset {floor} was removed by retention; "
+                "examples from those records are dropped"
+            )
+    new_fb: Dict[str, Optional[List[str]]] = {}
+    fb_offset = 0 if reason else int(state["feedback_offset"])  # type: ignore[index]
+    for end, fb in _iter_records(feedback_log, fb_offset):
+        fb_offset = end
+        mid = fb.get("message_id")
+        if mid:
+            # 같은 message_id의 피드백은 마지막 것이 우선
+            new_fb[mid] = _selected(fb)
+
+    emitted: Dict[str, List[str]] = {} if reason else dict(state.get("emitted") or {})  # type: ignore[union-attr]
+    if not reason and any(mid in emitted and new_fb[mid] != emitted[mid] for mid in new_fb):
+        reason = "feedback_updated"
+        return build_datasets(chat_log, feedback_log, out_ranker, out_relax, out_fusion, full=True) | {
+            "reason": reason
+        }
+
+    # 이미 같은 선택으로 예제를 만든 message_id의 중복 피드백은 무시
+    new_fb = {mid: sel for mid, sel in new_fb.items() if mid not in emitted}
+    incremental = reason is None
+    counts = dict(state.get("counts") or {}) if incremental else {}  # type: ignore[union-attr]
+    pending: Dict[str, Optional[List[str]]] = dict(state.get("orphans") or {}) if incremental else {}  # type: ignore[union-attr]
+    pending.update(new_fb)
+    chat_start = int(state["chat_offset"]) if incremental else 0  # type: ignore[index]
+    chat_offset = chat_start
+    new_chats = 0
+
+    writers = _Writers(paths, append=incremental)
+    try:
+        for end, c in _iter_records(chat_log, chat_start):
+            chat_offset = end
+            new_chats += 1
+            mid = c.get("message_id")
+            if not mid or mid in excluded:
+                pending.pop(mid, None)
+                continue
+            selected = pending.pop(mid, None)
+            if selected:
+                writers.emit_labeled(c, selected)
+                emitted[mid] = selected
+            writers.emit_relax(c)
+
+        # 이전 실행에서 처리한 chat에 새로 달린 피드백: 색인으로 해당 chat만 조회
+        if incremental:
+            index = log_index(chat_log) if any(new_fb.get(m) for m in pending) else None
+            for mid in [m for m in pending if m in new_fb and new_fb[m]]:
+                if mid in excluded:
+                    pending.pop(mid)
+                    continue
+                rows, _ = index.query(message_id=mid, before=chat_start, limit=1)  # type: ignore[union-attr]
+                if rows:
+                    selected = pending.pop(mid)
+                    writers.emit_labeled(rows[-1], selected)  # type: ignore[arg-type]
+                    emitted[mid] = selected  # type: ignore[assignment]
+    except BaseException:
+        writers.close(commit=False)
+        raise
+    writers.close()
+
+    for name, n in writers.added.items():
+        counts[name] = int(counts.get(name, 0)) + n
+    orphans = {mid: sel for mid, sel in pending.items() if sel}
+    if len(orphans) > _MAX_ORPHANS:
+        orphans = dict(list(orphans.items())[-_MAX_ORPHANS:])
+    new_state = {
+        "chat_offset": chat_offset,
+        "feedback_offset": fb_offset,
+        "curation_version": version,
+        "excluded": sorted(excluded),
+        "outputs": outputs,
+        "counts": counts,
+        "emitted": emitted,
+        "orphans": orphans,
+        "updated_at": utc_now_iso(),
+    }
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    tmp.write_text(json.dumps(new_state, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(state_path)
 
     return {
-        "ranker_examples": len(ranker_rows),
-        "relax_examples": len(relax_rows),
-        "fusion_examples": len(fusion_rows),
+        "mode": "incremental" if incremental else "full",
+        "reason": reason,
+        "ranker_examples": counts.get("ranker", 0),
+        "relax_examples": counts.get("relax", 0),
+        "fusion_examples": counts.get("fusion", 0),
+        "added": dict(writers.added),
+        "new_chat_records": new_chats,
+        "new_feedback_records": len(new_fb),
+        "pending_feedback": len(orphans),
         "excluded_message_ids": len(excluded),
+        "curation_filtered": curation_filtered,
+        "warnings": warnings,
         "out_ranker": str(out_ranker),
         "out_relax": str(out_relax),
         "out_fusion": str(out_fusion),
@@ -135,6 +372,7 @@ def main() -> None:
         default="agent/data/datasets/fusion.jsonl",
         help="FusionDecisionMaker 학습용(피드백 기반)",
     )
+    p.add_argument("--full", action="store_true", help="워터마크를 무시하고 전체 재빌드")
     args = p.parse_args()
 
     result = build_datasets(
@@ -143,8 +381,12 @@ def main() -> None:
         out_ranker=Path(args.out_ranker),
         out_relax=Path(args.out_relax),
         out_fusion=Path(args.out_fusion),
+        full=args.full,
     )
 
+    print(f"mode={result['mode']} reason={result['reason']} added={result['added']}")
+    for warning in result["warnings"]:
+        print("warning:", warning)
     print("wrote", result["ranker_examples"], "ranker examples ->", result["out_ranker"])
     print("wrote", result["relax_examples"], "relax examples ->", result["out_relax"])
     print("wrote", result["fusion_examples"], "fusion examples ->", result["out_fusion"])
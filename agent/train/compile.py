@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import dspy
 import httpx
 
 from ..core.config import SETTINGS
+from ..core.storage import utc_now_iso
 from ..dspy_modules.intent import IntentAnalysisAgent, ensure_dspy_configured
 from ..dspy_modules.recommender import (
     FusionDecisionMaker,
@@ -17,6 +21,31 @@ from ..dspy_modules.recommender import (
     RelaxedConstraintsGenerator,
     coerce_relaxed_candidates,
 )
+from .lm import CompileBudget, compile_budget, compile_lm_stats, configure_compile_lm, install_budget
+from .metrics import hit_rate
+from .product_store import iter_dataset
+
+MODULES = ("relaxed_constraints", "product_ranker", "fusion_decision")
+
+_DEFAULT_DATASETS = {
+    "relaxed_constraints": "agent/data/datasets/relaxed_constraints.jsonl",
+    "product_ranker": "agent/data/datasets/ranker.jsonl",
+    "fusion_decision": "agent/data/datasets/fusion.jsonl",
+}
+
+
+def default_paths(module: str) -> Tuple[Path, Path]:
+    """모듈별 기본 (dataset, artifact) 경로. artifact는 서버가 로드하는 위치(DSPY_ARTIFACTS_DIR)."""
+    artifact = {
+        "relaxed_constraints": SETTINGS.artifact_relaxed_constraints,
+        "product_ranker": SETTINGS.artifact_product_ranker,
+        "fusion_decision": SETTINGS.artifact_fusion_decision,
+    }[module]
+    return Path(_DEFAULT_DATASETS[module]), Path(SETTINGS.dspy_artifacts_dir) / artifact
+
+
+def resolve_num_threads(num_threads: Optional[int]) -> int:
+    return max(int(num_threads or SETTINGS.compile_num_threads), 1)
 
 
 def read_jsonl(path: Path) -> List[Dict[str, Any]]:
@@ -32,23 +61,180 @@ def read_jsonl(path: Path) -> List[Dict[str, Any]]:
     return rows
 
 
-def compile_relaxed_constraints(dataset_path: Path, out_path: Path) -> None:
-    ensure_dspy_configured()
+def _relaxed_example(r: Dict[str, Any]) -> dspy.Example:
+    # label은 RelaxedConstraintsResult 형태로 매핑
+    return dspy.Example(
+        user_query=r.get("user_query", ""),
+        strict_constraints=r.get("strict_constraints", ""),
+        brand_hint=r.get("brand_hint", ""),
+        candidates={"candidates": r.get("label_candidates", []), "notes": ""},
+    ).with_inputs("user_query", "strict_constraints", "brand_hint")
+
+
+def _ranker_example(r: Dict[str, Any]) -> dspy.Example:
+    return dspy.Example(
+        user_query=r.get("user_query", ""),
+        conversation_history=r.get("conversation_history", ""),
+        products_json=r.get("products_json", "[]"),
+        recommended_style_codes={
+            "recommended_style_codes": r.get("label_style_codes", []),
+        },
+    ).with_inputs("user_query", "conversation_history", "products_json")
+
+
+def _fusion_example(r: Dict[str, Any]) -> dspy.Example:
+    return dspy.Example(
+        user_query=r.get("user_query", ""),
+        conversation_history=r.get("conversation_history", ""),
+        products_json=r.get("products_json", "[]"),
+        reviews_summary=r.get("reviews_summary", ""),
+        review_style_codes_json=r.get("review_style_codes_json", "[]"),
+        decision={
+            "recommended_style_codes": r.get("label_style_codes", []),
+            "reason_bullets": [],
+            "caveats": [],
+        },
+    ).with_inputs(
+        "user_query",
+        "conversation_history",
+        "products_json",
+        "reviews_summary",
+        "review_style_codes_json",
+    )
 
-    rows = read_jsonl(dataset_path)
-    examples: List[dspy.Example] = []
-    for r in rows:
-        label = r.get("label_candidates", [])
-        # label은 RelaxedConstraintsResult 형태로 매핑
-        examples.append(
-            dspy.Example(
-                user_query=r.get("user_query", ""),
-                strict_constraints=r.get("strict_constraints", ""),
-                brand_hint=r.get("brand_hint", ""),
-                candidates={"candidates": label, "notes": ""},
-            ).with_inputs("user_query", "strict_constraints", "brand_hint")
-        )
 
+_EXAMPLE_BUILDERS: Dict[str, Callable[[Dict[str, Any]], dspy.Example]] = {
+    "relaxed_constraints": _relaxed_example,
+    "product_ranker": _ranker_example,
+    "fusion_decision": _fusion_example,
+}
+
+_PROGRAMS: Dict[str, Callable[[], dspy.Module]] = {
+    "relaxed_constraints": RelaxedConstraintsGenerator,
+    "product_ranker": ProductRanker,
+    "fusion_decision": FusionDecisionMaker,
+}
+
+
+def example_key(example: Any) -> str:
+    """예제 입력+라벨 내용의 해시(라벨이 바뀌면 다른 키)."""
+    data = example.toDict() if hasattr(example, "toDict") else dict(example)
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def artifact_meta_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".meta.json")
+
+
+def read_artifact_meta(out_path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        meta = json.loads(artifact_meta_path(out_path).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+def write_artifact_meta(
+    out_path: Path,
+    module: str,
+    dataset_path: Path,
+    examples: List[Any],
+    mode: str,
+    example_keys: Optional[Iterable[str]] = None,
+    **extra: Any,
+) -> None:
+    """
+    artifact 옆 `<artifact>.meta.json`: 이 artifact가 학습한 예제 키 목록.
+    incremental compile은 이 목록에 없는 예제만 새 예제로 봅니다.
+    `example_keys`를 주면 `examples` 대신 그 키 목록을 기록합니다(실제로 반영한 예제만 기록할 때).
+    """
+    keys = sorted(set(example_keys) if example_keys is not None else {example_key(e) for e in examples})
+    meta = {
+        "module": module,
+        "dataset": str(dataset_path),
+        "mode": mode,
+        "examples": len(keys),
+        "example_keys": keys,
+        "compiled_at": utc_now_iso(),
+        **extra,
+    }
+    path = artifact_meta_path(out_path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def load_examples(module: str, dataset_path: Path) -> List[dspy.Example]:
+    """데이터셋을 모듈 입력/라벨 형태의 dspy.Example로 변환(compact 형식은 상품 테이블에서 products_json 복원)."""
+    build = _EXAMPLE_BUILDERS[module]
+    return [build(r) for r in iter_dataset(dataset_path)]
+
+
+def new_program(module: str) -> dspy.Module:
+    return _PROGRAMS[module]()
+
+
+def label_codes(module: str, example: Any) -> List[str]:
+    if module == "relaxed_constraints":
+        return getattr(example, "candidates", {}).get("candidates", [])
+    if module == "product_ranker":
+        return getattr(example, "recommended_style_codes", {}).get("recommended_style_codes", [])
+    return getattr(example, "decision", {}).get("recommended_style_codes", [])
+
+
+def predicted_codes(module: str, pred: Any) -> Any:
+    if module == "relaxed_constraints":
+        return coerce_relaxed_candidates(getattr(pred, "candidates", pred))
+    if module == "product_ranker":
+        # pred.recommended_style_codes.recommended_style_codes
+        return getattr(getattr(pred, "recommended_style_codes", None), "recommended_style_codes", None)
+    return getattr(getattr(pred, "decision", None), "recommended_style_codes", None)
+
+
+def module_metric(module: str, k: int = 10) -> Callable[..., float]:
+    def metric(example, pred, trace=None):
+        return hit_rate(predicted_codes(module, pred), label_codes(module, example), k=k)
+
+    return metric
+
+
+def _optimize(
+    module: str,
+    program: dspy.Module,
+    examples: List[dspy.Example],
+    make_optimizer: Callable[[], Any],
+    num_threads: Optional[int],
+    budget: Optional[CompileBudget],
+) -> Tuple[dspy.Module, Dict[str, Any]]:
+    """
+    예산이 없으면 `make_optimizer()`로 compile. 예산이 있으면 중간에 멈춰도 최선 후보를 남기는
+    `search.budgeted_random_search`를 씀(결과에 탐색 요약/예산 사용량 포함).
+    """
+    budget = install_budget(budget)
+    if budget is None:
+        return make_optimizer().compile(program, trainset=examples), {}
+    from .search import budgeted_random_search
+
+    compiled, search = budgeted_random_search(module, program, examples, num_threads=num_threads)
+    return compiled, {"search": search, "budget": budget.stats()}
+
+
+def _save_compiled(
+    module: str, compiled: dspy.Module, dataset_path: Path, out_path: Path, examples: List[dspy.Example]
+) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    compiled.save(str(out_path))
+    write_artifact_meta(out_path, module, dataset_path, examples, mode="full")
+    print("saved", out_path)
+
+
+def compile_relaxed_constraints(
+    dataset_path: Path, out_path: Path, num_threads: Optional[int] = None, budget: Optional[CompileBudget] = None
+) -> dict:
+    ensure_dspy_configured()
+
+    examples = load_examples("relaxed_constraints", dataset_path)
     program = RelaxedConstraintsGenerator()
     if len(examples) < 2:
         raise ValueError(
@@ -56,120 +242,73 @@ def compile_relaxed_constraints(dataset_path: Path, out_path: Path) -> None:
             "Collect more logs/feedback first."
         )
 
-    def metric(example, pred, trace=None):
-        pred_candidates = coerce_relaxed_candidates(getattr(pred, "candidates", pred))
-        label_candidates = getattr(example, "candidates", {}).get("candidates", [])
-        return _hit_rate(pred_candidates, label_candidates, k=10)
-
-    # MIPROv2가 있으면 우선 사용
-    tele = getattr(dspy.teleprompt, "MIPROv2", None)
-    if tele is None:
-        tele = dspy.teleprompt.BootstrapFewShotWithRandomSearch
-        optimizer = tele(metric=metric, max_bootstrapped_demos=6, num_candidate_programs=8)
-    else:
+    metric = module_metric("relaxed_constraints")
+
+    def make_optimizer() -> Any:
+        # MIPROv2가 있으면 우선 사용
+        tele = getattr(dspy.teleprompt, "MIPROv2", None)
+        if tele is None:
+            return dspy.teleprompt.BootstrapFewShotWithRandomSearch(
+                metric=metric,
+                max_bootstrapped_demos=6,
+                num_candidate_programs=8,
+                num_threads=resolve_num_threads(num_threads),
+            )
         # MIPROv2는 valset이 없으면 trainset >= 2 필요(이미 체크)
-        optimizer = tele(metric=metric, max_bootstrapped_demos=6, num_threads=1)
-
-    compiled = optimizer.compile(program, trainset=examples)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    compiled.save(str(out_path))
-    print("saved", out_path)
-
+        return tele(metric=metric, max_bootstrapped_demos=6, num_threads=resolve_num_threads(num_threads))
 
-def _hit_rate(pred_codes: Any, label_codes: List[str], k: int = 10) -> float:
-    if not isinstance(label_codes, list):
-        return 0.0
-    label = [c for c in label_codes if isinstance(c, str) and c]
-    if not label:
-        return 0.0
-    if not isinstance(pred_codes, list):
-        return 0.0
-    pred = [c for c in pred_codes if isinstance(c, str) and c][:k]
-    if not pred:
-        return 0.0
-    return 1.0 if any(c in set(pred) for c in label) else 0.0
+    compiled, extra = _optimize("relaxed_constraints", program, examples, make_optimizer, num_threads, budget)
+    _save_compiled("relaxed_constraints", compiled, dataset_path, out_path, examples)
+    return {"dataset": str(dataset_path), "out": str(out_path), "examples": len(examples), **extra}
 
 
-def compile_product_ranker(dataset_path: Path, out_path: Path) -> None:
+def compile_product_ranker(
+    dataset_path: Path, out_path: Path, num_threads: Optional[int] = None, budget: Optional[CompileBudget] = None
+) -> dict:
     ensure_dspy_configured()
-    rows = read_jsonl(dataset_path)
-    examples: List[dspy.Example] = []
-    for r in rows:
-        examples.append(
-            dspy.Example(
-                user_query=r.get("user_query", ""),
-                conversation_history=r.get("conversation_history", ""),
-                products_json=r.get("products_json", "[]"),
-                recommended_style_codes={
-                    "recommended_style_codes": r.get("label_style_codes", []),
-                },
-            ).with_inputs("user_query", "conversation_history", "products_json")
-        )
+    examples = load_examples("product_ranker", dataset_path)
     if len(examples) < 2:
         raise ValueError("Need at least 2 ranker examples to compile.")
 
     program = ProductRanker()
 
-    def metric(example, pred, trace=None):
-        # pred.recommended_style_codes.recommended_style_codes
-        out = getattr(getattr(pred, "recommended_style_codes", None), "recommended_style_codes", None)
-        label = getattr(example, "recommended_style_codes", {}).get("recommended_style_codes", [])
-        return _hit_rate(out, label, k=10)
+    def make_optimizer() -> Any:
+        return dspy.teleprompt.BootstrapFewShotWithRandomSearch(
+            metric=module_metric("product_ranker"),
+            max_bootstrapped_demos=6,
+            num_candidate_programs=8,
+            num_threads=resolve_num_threads(num_threads),
+        )
 
-    optimizer = dspy.teleprompt.BootstrapFewShotWithRandomSearch(
-        metric=metric, max_bootstrapped_demos=6, num_candidate_programs=8
-    )
-    compiled = optimizer.compile(program, trainset=examples)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    compiled.save(str(out_path))
-    print("saved", out_path)
+    compiled, extra = _optimize("product_ranker", program, examples, make_optimizer, num_threads, budget)
+    _save_compiled("product_ranker", compiled, dataset_path, out_path, examples)
+    return {"dataset": str(dataset_path), "out": str(out_path), "examples": len(examples), **extra}
 
 
-def compile_fusion_decision(dataset_path: Path, out_path: Path) -> None:
+def compile_fusion_decision(
+    dataset_path: Path, out_path: Path, num_threads: Optional[int] = None, budget: Optional[CompileBudget] = None
+) -> dict:
     ensure_dspy_configured()
-    rows = read_jsonl(dataset_path)
-    examples: List[dspy.Example] = []
-    for r in rows:
-        examples.append(
-            dspy.Example(
-                user_query=r.get("user_query", ""),
-                conversation_history=r.get("conversation_history", ""),
-                products_json=r.get("products_json", "[]"),
-                reviews_summary=r.get("reviews_summary", ""),
-                review_style_codes_json=r.get("review_style_codes_json", "[]"),
-                decision={
-                    "recommended_style_codes": r.get("label_style_codes", []),
-                    "reason_bullets": [],
-                    "caveats": [],
-                },
-            ).with_inputs(
-                "user_query",
-                "conversation_history",
-                "products_json",
-                "reviews_summary",
-                "review_style_codes_json",
-            )
-        )
+    examples = load_examples("fusion_decision", dataset_path)
     if len(examples) < 2:
         raise ValueError("Need at least 2 fusion examples to compile.")
 
     program = FusionDecisionMaker()
 
-    def metric(example, pred, trace=None):
-        out = getattr(getattr(pred, "decision", None), "recommended_style_codes", None)
-        label = getattr(example, "decision", {}).get("recommended_style_codes", [])
-        return _hit_rate(out, label, k=10)
+    def make_optimizer() -> Any:
+        return dspy.teleprompt.BootstrapFewShotWithRandomSearch(
+            metric=module_metric("fusion_decision"),
+            max_bootstrapped_demos=6,
+            num_candidate_programs=8,
+            num_threads=resolve_num_threads(num_threads),
+        )
 
-    optimizer = dspy.teleprompt.BootstrapFewShotWithRandomSearch(
-        metric=metric, max_bootstrapped_demos=6, num_candidate_programs=8
-    )
-    compiled = optimizer.compile(program, trainset=examples)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    compiled.save(str(out_path))
-    print("saved", out_path)
+    compiled, extra = _optimize("fusion_decision", program, examples, make_optimizer, num_threads, budget)
+    _save_compiled("fusion_decision", compiled, dataset_path, out_path, examples)
+    return {"dataset": str(dataset_path), "out": str(out_path), "examples": len(examples), **extra}
 
 
-def compile_intent(dataset_path: Path, out_path: Path) -> None:
+def compile_intent(dataset_path: Path, out_path: Path, num_threads: Optional[int] = None) -> dict:
     ensure_dspy_configured()
     rows = read_jsonl(dataset_path)
     examples: List[dspy.Example] = []
@@ -190,23 +329,125 @@ def compile_intent(dataset_path: Path, out_path: Path) -> None:
 
     program = IntentAnalysisAgent()
     optimizer = dspy.teleprompt.BootstrapFewShotWithRandomSearch(
-        max_bootstrapped_demos=6, num_candidate_programs=8
+        max_bootstrapped_demos=6, num_candidate_programs=8, num_threads=resolve_num_threads(num_threads)
     )
     compiled = optimizer.compile(program, trainset=examples)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     compiled.save(str(out_path))
     print("saved", out_path)
+    return {"dataset": str(dataset_path), "out": str(out_path), "examples": len(examples)}
+
+
+COMPILERS: Dict[str, Callable[..., dict]] = {
+    "relaxed_constraints": compile_relaxed_constraints,
+    "product_ranker": compile_product_ranker,
+    "fusion_decision": compile_fusion_decision,
+}
+
+
+def compile_module(
+    module: str,
+    dataset_path: Path,
+    out_path: Path,
+    num_threads: Optional[int] = None,
+    incremental: bool = False,
+    budget: Optional[CompileBudget] = None,
+) -> dict:
+    """
+    모듈 하나를 compile. incremental이면 현재 artifact에서 출발(`incremental.compile_incremental`).
+    `budget`(LM 호출 수/토큰/시간 한도)을 넘으면 그때까지의 최선 프로그램을 저장합니다.
+    """
+    if incremental:
+        from .incremental import compile_incremental
+
+        return compile_incremental(module, dataset_path, out_path, num_threads=num_threads, budget=budget)
+    return COMPILERS[module](dataset_path, out_path, num_threads=num_threads, budget=budget)
+
+
+def compile_all(
+    targets: Optional[Dict[str, Tuple[Path, Path]]] = None,
+    parallel: bool = True,
+    num_threads: Optional[int] = None,
+    incremental: bool = False,
+    budget: Optional[CompileBudget] = None,
+) -> dict:
+    """
+    여러 모듈을 한 번에 compile합니다(기본: relaxed_constraints/product_ranker/fusion_decision, 기본 경로).
+
+    - parallel=True면 모듈별 thread에서 동시에 실행(각 optimizer도 `num_threads`로 후보를 병렬 평가)
+    - LM 호출은 프로세스 공용 limiter(`COMPILE_LM_RPM`/`COMPILE_LM_MAX_CONCURRENCY`)를 함께 씀
+    - 한 모듈이 실패해도 나머지는 계속하고, 결과의 `failed`에 모듈 이름을 남김
+    - `wall_s`(전체 경과)와 `sum_module_s`(모듈별 경과 합)를 함께 보고합니다. 병렬 실행에서는 모듈끼리
+      LM 한도를 나눠 쓰므로 합이 순차 실행보다 클 수 있어, 정확한 비교는 parallel=False 실행의 `wall_s`와 합니다.
+    - `budget`은 job 전체 한도(모든 모듈이 함께 씀). 소진되면 각 모듈은 그때까지의 최선을 저장
+    """
+    targets = targets or {m: default_paths(m) for m in MODULES}
+    # dspy 설정은 설정한 thread에서만 바꿀 수 있어 모듈 thread를 띄우기 전에 끝내 둠
+    ensure_dspy_configured()
+    budget = install_budget(budget)
+    started = time.monotonic()
+
+    def run(module: str) -> Dict[str, Any]:
+        dataset, out = targets[module]
+        t0 = time.monotonic()
+        print(f"[compile_all] start module={module} dataset={dataset} out={out}", flush=True)
+        try:
+            res: Dict[str, Any] = {"ok": True, **compile_module(module, dataset, out, num_threads, incremental, budget)}
+        except Exception as e:
+            res = {"ok": False, "dataset": str(dataset), "out": str(out), "error": f"{type(e).__name__}: {e}"}
+        res["elapsed_s"] = round(time.monotonic() - t0, 3)
+        print(f"[compile_all] done module={module} ok={res['ok']} elapsed_s={res['elapsed_s']}", flush=True)
+        return res
+
+    if parallel and len(targets) > 1:
+        with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="compile") as ex:
+            futures = {m: ex.submit(run, m) for m in targets}
+            modules = {m: f.result() for m, f in futures.items()}
+    else:
+        modules = {m: run(m) for m in targets}
+
+    wall = time.monotonic() - started
+    total = sum(r["elapsed_s"] for r in modules.values())
+    return {
+        "parallel": parallel,
+        "incremental": incremental,
+        "num_threads": resolve_num_threads(num_threads),
+        "modules": modules,
+        "failed": [m for m, r in modules.items() if not r["ok"]],
+        "wall_s": round(wall, 3),
+        "sum_module_s": round(total, 3),
+        "speedup": round(total / wall, 2) if wall > 0 else None,
+        **({"budget": budget.stats()} if budget else {}),
+        "lm": compile_lm_stats(),
+    }
 
 
 def main() -> None:
     p = argparse.ArgumentParser()
     p.add_argument(
         "--module",
-        choices=["relaxed_constraints", "product_ranker", "fusion_decision", "intent"],
+        choices=[*MODULES, "intent", "all"],
         required=True,
+        help="all: relaxed_constraints/product_ranker/fusion_decision을 기본 경로로 병렬 compile",
+    )
+    p.add_argument("--dataset", default="", help="--module all이 아니면 필수")
+    p.add_argument("--out", default="", help="--module all이 아니면 필수")
+    p.add_argument("--num-threads", type=int, default=None, help="후보 평가 thread 수(기본 COMPILE_NUM_THREADS)")
+    p.add_argument("--sequential", action="store_true", help="--module all을 순차 실행(병렬 대비 기준 측정)")
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="현재 artifact(--out)에서 출발해 새/바뀐 예제만 반영(meta가 없으면 full compile)",
+    )
+    p.add_argument("--max-lm-calls", type=int, default=None, help="LM 실제 호출 수 한도(기본 COMPILE_MAX_LM_CALLS)")
+    p.add_argument("--max-tokens", type=int, default=None, help="LM 토큰 한도(기본 COMPILE_MAX_TOKENS)")
+    p.add_argument("--max-seconds", type=float, default=None, help="compile 경과 시간 한도(기본 COMPILE_MAX_SECONDS)")
+    p.add_argument(
+        "--lm-cache",
+        choices=["off", "on", "replay", "record"],
+        default=None,
+        help="LM 응답 디스크 캐시(기본 LM_CACHE_MODE). replay: 캐시만 사용(네트워크 없이 재현, miss면 실패)",
     )
-    p.add_argument("--dataset", required=True)
-    p.add_argument("--out", required=True)
     p.add_argument(
         "--reload-url",
         default=os.getenv("AGENT_RELOAD_URL", ""),
@@ -218,21 +459,33 @@ def main() -> None:
         help="서버 ADMIN_API_KEY 설정 시 필요. 헤더 x-admin-key 로 전달.",
     )
     args = p.parse_args()
+    if args.module != "all" and not (args.dataset and args.out):
+        p.error("--dataset and --out are required unless --module all")
 
-    # ensure LM is set (Bedrock) via env/.env
-    ensure_dspy_configured(model=SETTINGS.dspy_model)
+    # ensure LM is set (Bedrock) via env/.env, LM 호출 rate limit 포함
+    configure_compile_lm(model=SETTINGS.dspy_model, cache_mode=args.lm_cache)
 
     ds = Path(args.dataset)
     out = Path(args.out)
-
-    if args.module == "relaxed_constraints":
-        compile_relaxed_constraints(ds, out)
-    elif args.module == "product_ranker":
-        compile_product_ranker(ds, out)
-    elif args.module == "fusion_decision":
-        compile_fusion_decision(ds, out)
+    budget = compile_budget(args.max_lm_calls, args.max_tokens, args.max_seconds)
+
+    if args.module == "all":
+        result = compile_all(
+            parallel=not args.sequential,
+            num_threads=args.num_threads,
+            incremental=args.incremental,
+            budget=budget,
+        )
+        print(json.dumps(result, ensure_ascii=False, indent=2))
     elif args.module == "intent":
-        compile_intent(ds, out)
+        compile_intent(ds, out, num_threads=args.num_threads)
+    else:
+        result = compile_module(
+            args.module, ds, out, num_threads=args.num_threads, incremental=args.incremental, budget=budget
+        )
+        if args.incremental or budget.limited:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+    print("lm", json.dumps(compile_lm_stats(), ensure_ascii=False))
 
     # optional: notify running server to reload artifacts
     if args.reload_url:
@@ -0,0 +1,351 @@
+"""
+DSPy artifact 오프라인 평가. reload 전에 새 artifact가 현재 artifact보다 나빠지지 않았는지 확인하는 용도입니다.
+
+CLI:
+  python -m agent.train.evaluate --module product_ranker --dataset agent/data/datasets/ranker_holdout.jsonl \\
+      --artifact new/product_ranker.json [--baseline agent/artifacts/product_ranker.json] [--fail-on-regression]
+
+- 예제는 thread pool(`--num-threads`, 기본 COMPILE_NUM_THREADS)로 동시에 실행하고 LM 호출은 compile과 같은
+  rate limit / 디스크 캐시(`--lm-cache`, 기본 EVAL_LM_CACHE_MODE=off)를 거칩니다.
+- 지표: hit@k, MRR@k, 실패율, 예제별 지연(p50/p90/p95/p99), prompt/completion 토큰(캐시 hit 호출은 제외).
+  캐시 hit이 있으면 지연/토큰이 실제보다 작게 나오므로 `lm_cache.hit_ratio`를 함께 확인합니다.
+- artifact를 ""로 주면 compile 전(artifact 미적용) 프로그램을 평가합니다.
+- 평가할 artifact가 compile에 쓴 예제(`<artifact>.meta.json`의 예제 키)는 기본으로 평가에서 제외합니다
+  (`--include-trained`면 포함). 기본 데이터셋은 compile 데이터셋이므로 held-out 평가는 별도 `--dataset`을 줍니다.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import dspy
+
+from ..core.config import SETTINGS
+from ..core.lm_cache import lm_cache
+from .compile import (
+    MODULES,
+    default_paths,
+    example_key,
+    label_codes,
+    load_examples,
+    new_program,
+    predicted_codes,
+    read_artifact_meta,
+    resolve_num_threads,
+)
+from .lm import compile_lm_stats, configure_compile_lm
+from .metrics import hit_rate, percentile, reciprocal_rank
+
+# 실패 예제 오류 메시지는 앞에서부터 이만큼만 결과에 남김
+_MAX_ERRORS = 10
+
+
+def trained_keys(artifacts: List[Optional[str]]) -> Set[str]:
+    """artifact들이 compile에 쓴 예제 키(meta가 없는 artifact는 알 수 없으므로 건너뜀)."""
+    keys: Set[str] = set()
+    for artifact in artifacts:
+        meta = read_artifact_meta(Path(artifact)) if artifact else None
+        keys.update((meta or {}).get("example_keys") or [])
+    return keys
+
+
+def select_examples(
+    module: str, dataset: Path, exclude: Optional[Set[str]] = None, limit: Optional[int] = None
+) -> Tuple[List[dspy.Example], int]:
+    """
+    데이터셋에서 평가 예제 선택: 키가 `exclude`(artifact가 학습한 예제)에 없는 것 중 앞에서 `limit`개.
+    (선택한 예제, 학습 예제라서 제외한 수)를 반환합니다.
+    """
+    examples = load_examples(module, dataset)
+    kept = [e for e in examples if example_key(e) not in exclude] if exclude else examples
+    excluded = len(examples) - len(kept)
+    if examples and not kept:
+        raise ValueError("All examples were used to compile the artifact; pass a held-out dataset or include_trained.")
+    if limit:
+        kept = kept[: max(int(limit), 0)]
+    return kept, excluded
+
+
+def _load_program(module: str, artifact: Optional[str]) -> dspy.Module:
+    program = new_program(module)
+    if artifact:
+        path = Path(artifact)
+        if not path.exists():
+            raise FileNotFoundError(f"artifact not found: {path}")
+        program.load(str(path))
+    return program
+
+
+def _usage_tokens(pred: Any) -> Dict[str, int]:
+    get_usage = getattr(pred, "get_lm_usage", None)
+    usage = get_usage() if callable(get_usage) else None
+    tokens = {"prompt": 0, "completion": 0}
+    for per_model in (usage or {}).values():
+        if isinstance(per_model, dict):
+            tokens["prompt"] += int(per_model.get("prompt_tokens") or 0)
+            tokens["completion"] += int(per_model.get("completion_tokens") or 0)
+    return tokens
+
+
+def _score_one(module: str, program: dspy.Module, example: dspy.Example, k: int) -> Dict[str, Any]:
+    t0 = time.monotonic()
+    try:
+        with dspy.context(track_usage=True):
+            pred = program(**example.inputs())
+        codes = predicted_codes(module, pred)
+        label = label_codes(module, example)
+        row: Dict[str, Any] = {
+            "ok": True,
+            "hit": hit_rate(codes, label, k=k),
+            "rr": reciprocal_rank(codes, label, k=k),
+            "tokens": _usage_tokens(pred),
+        }
+    except Exception as e:
+        row = {"ok": False, "hit": 0.0, "rr": 0.0, "error": f"{type(e).__name__}: {e}"}
+    row["latency_ms"] = int((time.monotonic() - t0) * 1000)
+    return row
+
+
+def _summarize(rows: List[Dict[str, Any]], k: int) -> Dict[str, Any]:
+    n = len(rows)
+    latencies = sorted(r["latency_ms"] for r in rows)
+    failed = [r for r in rows if not r["ok"]]
+    prompt = sum(r.get("tokens", {}).get("prompt", 0) for r in rows)
+    completion = sum(r.get("tokens", {}).get("completion", 0) for r in rows)
+    return {
+        "examples": n,
+        "k": k,
+        "hit_at_k": round(sum(r["hit"] for r in rows) / n, 4) if n else 0.0,
+        "mrr": round(sum(r["rr"] for r in rows) / n, 4) if n else 0.0,
+        "failures": len(failed),
+        "failure_rate": round(len(failed) / n, 4) if n else 0.0,
+        "latency_ms": {
+            "mean": int(sum(latencies) / n) if n else 0,
+            "p50": int(percentile(latencies, 0.5)),
+            "p90": int(percentile(latencies, 0.9)),
+            "p95": int(percentile(latencies, 0.95)),
+            "p99": int(percentile(latencies, 0.99)),
+        },
+        "tokens": {
+            "prompt": prompt,
+            "completion": completion,
+            "total": prompt + completion,
+            "per_example": round((prompt + completion) / n, 1) if n else 0.0,
+        },
+        "errors": [r["error"] for r in failed[:_MAX_ERRORS]],
+    }
+
+
+def score_program(
+    module: str, program: dspy.Module, examples: List[dspy.Example], k: int = 10, num_threads: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """예제별 점수(hit/rr/지연/토큰)를 병렬로 계산(입력 순서)."""
+    with ThreadPoolExecutor(max_workers=resolve_num_threads(num_threads), thread_name_prefix="evaluate") as ex:
+        return list(ex.map(lambda e: _score_one(module, program, e, k), examples))
+
+
+def mean_hit_rate(
+    module: str, program: dspy.Module, examples: List[dspy.Example], k: int = 10, num_threads: Optional[int] = None
+) -> float:
+    """예제 평균 hit@k(compile 후보 비교용 점수)."""
+    rows = score_program(module, program, examples, k=k, num_threads=num_threads)
+    return round(sum(r["hit"] for r in rows) / len(rows), 4) if rows else 0.0
+
+
+def _cache_delta(before: Tuple[int, int]) -> Dict[str, Any]:
+    hits, misses = lm_cache().hits - before[0], lm_cache().misses - before[1]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else 0.0}
+
+
+def _run(
+    module: str, artifact: Optional[str], examples: List[dspy.Example], k: int, num_threads: Optional[int]
+) -> Dict[str, Any]:
+    program = _load_program(module, artifact)
+    cache_before = (lm_cache().hits, lm_cache().misses)
+    started = time.monotonic()
+    print(f"[evaluate] module={module} artifact={artifact or '(none)'} examples={len(examples)}", flush=True)
+    rows = score_program(module, program, examples, k, num_threads)
+    report = {
+        "artifact": artifact or None,
+        **_summarize(rows, k),
+        "wall_s": round(time.monotonic() - started, 3),
+        "lm_cache": _cache_delta(cache_before),
+    }
+    print(
+        f"[evaluate] artifact={artifact or '(none)'} hit@{k}={report['hit_at_k']} mrr={report['mrr']} "
+        f"failure_rate={report['failure_rate']} p95_ms={report['latency_ms']['p95']} "
+        f"cache_hit_ratio={report['lm_cache']['hit_ratio']}",
+        flush=True,
+    )
+    return {"report": report, "rows": rows}
+
+
+def evaluate(
+    module: str,
+    dataset: Path,
+    artifact: Optional[str],
+    k: int = 10,
+    num_threads: Optional[int] = None,
+    limit: Optional[int] = None,
+    include_trained: bool = False,
+) -> dict:
+    """
+    `artifact`를 적용한 모듈을 데이터셋 예제에 대해 병렬 실행하고 지표를 반환합니다.
+    `include_trained`가 아니면 artifact가 compile에 쓴 예제는 제외합니다.
+    """
+    exclude = None if include_trained else trained_keys([artifact])
+    examples, excluded = select_examples(module, dataset, exclude=exclude, limit=limit)
+    if not examples:
+        raise ValueError("No examples to evaluate.")
+    result = _run(module, artifact, examples, k, num_threads)["report"]
+    return {
+        "module": module,
+        "dataset": str(dataset),
+        "excluded_trained": excluded,
+        **result,
+        "lm": compile_lm_stats(),
+    }
+
+
+def compare(
+    module: str,
+    dataset: Path,
+    baseline: Optional[str],
+    candidate: Optional[str],
+    k: int = 10,
+    num_threads: Optional[int] = None,
+    limit: Optional[int] = None,
+    tolerance: float = 0.01,
+    include_trained: bool = False,
+) -> dict:
+    """
+    같은 예제로 baseline(현재)과 candidate(새 artifact)를 차례로 평가해 나란히 비교합니다.
+
+    candidate의 hit@k/MRR이 baseline보다 `tolerance` 넘게 낮거나 실패율이 `tolerance` 넘게 높으면 regression.
+    어느 한쪽이라도 LM 캐시 hit이 있으면 지연/토큰 delta는 비교할 수 없으므로 None으로 둡니다.
+    `include_trained`가 아니면 두 artifact 중 어느 쪽이든 compile에 쓴 예제는 제외합니다.
+    """
+    exclude = None if include_trained else trained_keys([baseline, candidate])
+    examples, excluded = select_examples(module, dataset, exclude=exclude, limit=limit)
+    if not examples:
+        raise ValueError("No examples to evaluate.")
+    base = _run(module, baseline, examples, k, num_threads)
+    cand = _run(module, candidate, examples, k, num_threads)
+    b, c = base["report"], cand["report"]
+
+    wins = losses = 0
+    for rb, rc in zip(base["rows"], cand["rows"]):
+        if rc["rr"] > rb["rr"]:
+            wins += 1
+        elif rc["rr"] < rb["rr"]:
+            losses += 1
+
+    reasons: List[str] = []
+    if c["hit_at_k"] < b["hit_at_k"] - tolerance:
+        reasons.append(f"hit@{k} {b['hit_at_k']} -> {c['hit_at_k']}")
+    if c["mrr"] < b["mrr"] - tolerance:
+        reasons.append(f"mrr {b['mrr']} -> {c['mrr']}")
+    if c["failure_rate"] > b["failure_rate"] + tolerance:
+        reasons.append(f"failure_rate {b['failure_rate']} -> {c['failure_rate']}")
+
+    # 캐시 hit 비율이 양쪽에서 다르면(예: baseline만 캐시 hit) 지연/토큰 차이는 캐시 효과일 뿐
+    cost_comparable = not (b["lm_cache"]["hits"] or c["lm_cache"]["hits"])
+    return {
+        "module": module,
+        "dataset": str(dataset),
+        "excluded_trained": excluded,
+        "baseline": b,
+        "candidate": c,
+        "delta": {
+            "hit_at_k": round(c["hit_at_k"] - b["hit_at_k"], 4),
+            "mrr": round(c["mrr"] - b["mrr"], 4),
+            "failure_rate": round(c["failure_rate"] - b["failure_rate"], 4),
+            "latency_p95_ms": c["latency_ms"]["p95"] - b["latency_ms"]["p95"] if cost_comparable else None,
+            "tokens_per_example": (
+                round(c["tokens"]["per_example"] - b["tokens"]["per_example"], 1) if cost_comparable else None
+            ),
+        },
+        "cost_comparable": cost_comparable,
+        "per_example": {"wins": wins, "losses": losses, "ties": len(examples) - wins - losses},
+        "tolerance": tolerance,
+        "regression": bool(reasons),
+        "regression_reasons": reasons,
+        "lm": compile_lm_stats(),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--module", choices=list(MODULES), required=True)
+    p.add_argument("--dataset", default="", help="평가용(held-out) 데이터셋. 기본은 모듈의 기본(compile) 데이터셋")
+    p.add_argument("--artifact", default=None, help='평가할 artifact(기본: 서버 artifact 경로, ""면 artifact 미적용)')
+    p.add_argument("--baseline", default=None, help="지정하면 baseline과 --artifact를 나란히 비교")
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument(
+        "--include-trained", action="store_true", help="artifact가 compile에 쓴 예제도 평가(기본은 제외)"
+    )
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--num-threads", type=int, default=None)
+    p.add_argument("--tolerance", type=float, default=0.01)
+    p.add_argument(
+        "--lm-cache",
+        choices=["off", "on", "replay", "record"],
+        default=None,
+        help="LM 디스크 캐시 모드(기본 EVAL_LM_CACHE_MODE=off; 캐시 hit은 지연/토큰 지표를 왜곡)",
+    )
+    p.add_argument("--out", default="", help="결과 json 경로(미지정 시 stdout)")
+    p.add_argument("--fail-on-regression", action="store_true", help="비교 결과 regression이면 exit code 1")
+    args = p.parse_args()
+
+    # 평가 LM은 DSPy 자체 캐시도 끔(off 모드에서 DSPy 캐시 hit이 지연/토큰을 0에 가깝게 만들지 않도록)
+    configure_compile_lm(
+        model=SETTINGS.dspy_model, cache_mode=args.lm_cache or SETTINGS.eval_lm_cache_mode, dspy_cache=False
+    )
+    default_dataset, default_artifact = default_paths(args.module)
+    dataset = Path(args.dataset) if args.dataset else default_dataset
+    artifact = str(default_artifact) if args.artifact is None else args.artifact
+
+    if args.baseline is not None:
+        result = compare(
+            args.module,
+            dataset,
+            baseline=args.baseline,
+            candidate=artifact,
+            k=args.k,
+            num_threads=args.num_threads,
+            limit=args.limit,
+            tolerance=args.tolerance,
+            include_trained=args.include_trained,
+        )
+    else:
+        result = evaluate(
+            args.module,
+            dataset,
+            artifact,
+            k=args.k,
+            num_threads=args.num_threads,
+            limit=args.limit,
+            include_trained=args.include_trained,
+        )
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.fail_on_regression and result.get("regression"):
+        print("regression:", "; ".join(result["regression_reasons"]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+warm-start incremental compile: 현재 artifact를 출발점으로 새/바뀐 예제만 반영합니다.
+
+1. `<artifact>.meta.json`(compile 때 기록한 예제 키)과 비교해 새/바뀐 예제를 찾음. meta가 없으면 full compile
+2. 평가 세트 = 새 예제 + 이미 학습한 예제에서 뽑은 regression sample(고정 seed)
+3. round마다 현재 최선 프로그램을 teacher로 새 예제에서 demo를 bootstrap하고, 기존 demo와 합쳐(새 demo 우선) 후보를 만듦.
+   instruction(signature)은 artifact 것을 그대로 유지
+4. 후보가 최선 점수보다 `min_delta` 넘게 좋아지지 않는 round가 `patience`번 이어지면 조기 종료
+5. 최선 프로그램(개선이 없으면 기존 artifact 그대로)을 저장하고 meta를 갱신.
+   개선이 없으면 새 예제는 학습한 예제 키에 넣지 않음
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import dspy
+
+from ..core.config import SETTINGS
+from ..dspy_modules.intent import ensure_dspy_configured
+from .compile import (
+    COMPILERS,
+    example_key,
+    load_examples,
+    module_metric,
+    new_program,
+    read_artifact_meta,
+    write_artifact_meta,
+)
+from .evaluate import mean_hit_rate
+from .lm import BudgetExceeded, CompileBudget, install_budget
+
+# 후보 프로그램의 predictor당 최대 demo 수 / round마다 새로 bootstrap하는 demo 수
+_MAX_DEMOS = 8
+_ROUND_DEMOS = 4
+
+
+def _bootstrap_round(module: str, teacher: dspy.Module, new_examples: List[dspy.Example], seed: int) -> dspy.Module:
+    trainset = list(new_examples)
+    random.Random(seed).shuffle(trainset)
+    # labeled demo는 쓰지 않음(teacher의 기존 demo를 LabeledFewShot으로 초기화하지 않도록)
+    optimizer = dspy.teleprompt.BootstrapFewShot(
+        metric=module_metric(module), max_bootstrapped_demos=_ROUND_DEMOS, max_labeled_demos=0
+    )
+    # 이전 round에서 채택한 후보는 `_compiled=True`라 그대로 student로 주면 BootstrapFewShot이 거부함
+    student = teacher.deepcopy()
+    student._compiled = False
+    candidate = optimizer.compile(student, teacher=teacher.deepcopy(), trainset=trainset)
+
+    old_demos = {name: list(p.demos) for name, p in teacher.named_predictors()}
+    for name, predictor in candidate.named_predictors():
+        merged: List[Any] = []
+        seen = set()
+        for demo in [*predictor.demos, *old_demos.get(name, [])]:
+            key = example_key(demo)
+            if key not in seen:
+                seen.add(key)
+                merged.append(demo)
+        predictor.demos = merged[:_MAX_DEMOS]
+    return candidate
+
+
+def compile_incremental(
+    module: str,
+    dataset_path: Path,
+    out_path: Path,
+    num_threads: Optional[int] = None,
+    base_artifact: Optional[Path] = None,
+    max_rounds: Optional[int] = None,
+    patience: Optional[int] = None,
+    regression_sample: Optional[int] = None,
+    min_delta: float = 0.005,
+    k: int = 10,
+    budget: Optional[CompileBudget] = None,
+) -> dict:
+    """
+    `base_artifact`(기본: `out_path`)에서 출발해 새/바뀐 예제만으로 다시 최적화합니다.
+    `budget`을 넘으면 그때까지의 최선 프로그램을 저장합니다.
+    """
+    ensure_dspy_configured()
+    base = base_artifact or out_path
+    max_rounds = SETTINGS.compile_incremental_max_rounds if max_rounds is None else max_rounds
+    patience = SETTINGS.compile_incremental_patience if patience is None else patience
+    regression_sample = (
+        SETTINGS.compile_incremental_regression_sample if regression_sample is None else regression_sample
+    )
+
+    meta = read_artifact_meta(base)
+    reason = None
+    if not base.exists():
+        reason = "no_artifact"
+    elif meta is None:
+        reason = "no_meta"
+    elif meta.get("module") != module:
+        reason = "module_mismatch"
+    if reason:
+        print(f"[compile] incremental -> full compile ({reason})", flush=True)
+        result = COMPILERS[module](dataset_path, out_path, num_threads=num_threads, budget=budget)
+        return {**result, "mode": "full", "reason": reason}
+
+    budget = install_budget(budget)
+    started = time.monotonic()
+    examples = load_examples(module, dataset_path)
+    known = set(meta.get("example_keys") or [])  # type: ignore[union-attr]
+    new = [e for e in examples if example_key(e) not in known]
+    old = [e for e in examples if example_key(e) in known]
+    summary: Dict[str, Any] = {
+        "dataset": str(dataset_path),
+        "out": str(out_path),
+        "base": str(base),
+        "mode": "incremental",
+        "examples": len(examples),
+        "new_examples": len(new),
+    }
+    if not new:
+        print("[compile] incremental: no new examples, artifact is up to date", flush=True)
+        return {**summary, "status": "up_to_date"}
+
+    sample = random.Random(0).sample(old, min(len(old), max(int(regression_sample), 0)))
+    evalset = new + sample
+    current = new_program(module)
+    current.load(str(base))
+    try:
+        baseline = mean_hit_rate(module, current, evalset, k, num_threads)
+    except BudgetExceeded as e:
+        raise RuntimeError(f"compile budget exhausted ({e}) before the baseline was evaluated") from None
+    print(f"Trial 0/{max_rounds}: baseline score={baseline} eval_examples={len(evalset)}", flush=True)
+
+    best, best_score = current, baseline
+    rounds: List[Dict[str, Any]] = [{"round": 0, "score": baseline}]
+    stale = 0
+    early_stopped = False
+    budget_stop = None
+    try:
+        for r in range(1, max(int(max_rounds), 0) + 1):
+            candidate = _bootstrap_round(module, best, new, seed=r)
+            score = mean_hit_rate(module, candidate, evalset, k, num_threads)
+            rounds.append({"round": r, "score": score})
+            print(f"Trial {r}/{max_rounds}: score={score} best={best_score}", flush=True)
+            if score > best_score + min_delta:
+                best, best_score, stale = candidate, score, 0
+            else:
+                stale += 1
+                if stale >= patience:
+                    early_stopped = True
+                    print(f"[compile] incremental: plateau after {r} rounds, stopping", flush=True)
+                    break
+    except BudgetExceeded as e:
+        budget_stop = str(e)
+        print(f"[compile] budget exhausted ({budget_stop}), keeping best of {len(rounds)} rounds", flush=True)
+
+    # 개선이 없으면 artifact가 그대로이므로 새 예제는 학습한 것으로 기록하지 않음(다음 incremental에서 다시 시도)
+    improved = best is not current
+    learned = known | {example_key(e) for e in new} if improved else known
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    best.save(str(out_path))
+    write_artifact_meta(
+        out_path,
+        module,
+        dataset_path,
+        examples,
+        mode="incremental" if improved else str(meta.get("mode") or "incremental"),  # type: ignore[union-attr]
+        example_keys=learned,
+        score=best_score,
+        baseline_score=baseline,
+    )
+    print("saved", out_path)
+    return {
+        **summary,
+        "status": "improved" if improved else "kept_existing",
+        "regression_sample": len(sample),
+        "eval_examples": len(evalset),
+        "baseline_score": baseline,
+        "score": best_score,
+        "rounds": rounds,
+        "early_stopped": early_stopped,
+        "budget_stop": budget_stop,
+        **({"budget": budget.stats()} if budget else {}),
+        "elapsed_s": round(time.monotonic() - started, 3),
+    }
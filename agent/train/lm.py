@@ -0,0 +1,284 @@
+"""
+compile/평가 전용 LM: optimizer가 여러 thread에서 후보 프로그램을 동시에 평가할 때 LM 호출 속도/동시 실행 수를 제한합니다.
+
+- `RateLimiter`: 분당 호출 수(token bucket) + 동시 호출 수(semaphore). thread-safe
+- `RateLimitedLM`: 디스크 캐시(`CachedLM`)에 없는 실제 호출만 limiter를 거침(캐시 hit/replay는 제한 없음)
+- `configure_compile_lm()`: 프로세스 공용 limiter + LM 캐시(`LM_CACHE_MODE`)로 감싼 LM을 dspy 기본 LM으로 설정
+- `CompileBudget`: LM 호출 수/토큰/경과 시간 한도. `RateLimitedLM`이 실제 호출을 세고, 한도를 넘으면
+  이후 호출에서 `BudgetExceeded`를 던져 optimizer를 멈춤
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from ..core.config import SETTINGS
+from ..core.lm_cache import CACHE_MODES, lm_cache
+from ..dspy_modules.intent import ensure_dspy_configured
+from ..dspy_modules.lm import CachedLM
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = 0, max_concurrency: int = 0):
+        # rpm/max_concurrency가 0 이하면 해당 제한 없음
+        self.rpm = float(rpm)
+        self.max_concurrency = int(max_concurrency)
+        self._sem = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency > 0 else None
+        self._lock = threading.Lock()
+        self._tokens = max(self.rpm / 60.0, 1.0)
+        self._last = time.monotonic()
+        self.calls = 0
+        self.waited_s = 0.0
+
+    def _take(self) -> float:
+        """토큰 하나를 예약하고 기다려야 할 시간(s)을 반환."""
+        if self.rpm <= 0:
+            return 0.0
+        rate = self.rpm / 60.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._last) * rate, max(rate, 1.0))
+            self._last = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / rate
+
+    def acquire(self) -> None:
+        t0 = time.monotonic()
+        if self._sem is not None:
+            self._sem.acquire()
+        delay = self._take()
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls += 1
+            self.waited_s += time.monotonic() - t0
+
+    def release(self) -> None:
+        if self._sem is not None:
+            self._sem.release()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "max_concurrency": self.max_concurrency,
+                "calls": self.calls,
+                "waited_s": round(self.waited_s, 3),
+            }
+
+
+class BudgetExceeded(BaseException):
+    """
+    compile 예산 소진. optimizer/평가 코드의 `except Exception`(예제별 오류 처리)에 삼켜지지 않도록
+    BaseException을 상속합니다. compile 함수가 잡아서 그때까지의 최선 프로그램을 저장합니다.
+    """
+
+
+class CompileBudget:
+    """
+    compile 한 번(또는 compile_all job 전체)의 LM 비용/시간 한도. 0이면 해당 한도 없음.
+
+    - 호출 수/토큰은 실제 LM 호출만 셈(디스크 캐시 hit는 비용이 없으므로 제외)
+    - 경과 시간은 `start()`(첫 설치 시점)부터
+    - 진행 상황은 `[budget] {...}` 줄로 주기적으로 출력(job progress의 `budget`)
+    """
+
+    def __init__(
+        self, max_calls: int = 0, max_tokens: int = 0, max_seconds: float = 0, report_every_s: float = 5.0
+    ):
+        self.max_calls = int(max_calls or 0)
+        self.max_tokens = int(max_tokens or 0)
+        self.max_seconds = float(max_seconds or 0)
+        self.report_every_s = report_every_s
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._reported = 0.0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.exceeded: Optional[str] = None
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.max_calls or self.max_tokens or self.max_seconds)
+
+    def start(self) -> "CompileBudget":
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+        return self
+
+    def elapsed_s(self) -> float:
+        return time.monotonic() - self._started if self._started is not None else 0.0
+
+    def _over(self) -> Optional[str]:
+        if self.max_calls and self.calls >= self.max_calls:
+            return "max_calls"
+        if self.max_tokens and self.prompt_tokens + self.completion_tokens >= self.max_tokens:
+            return "max_tokens"
+        if self.max_seconds and self.elapsed_s() >= self.max_seconds:
+            return "max_seconds"
+        return None
+
+    def check(self) -> None:
+        """LM 호출 직전: 한도를 이미 넘었으면 BudgetExceeded."""
+        with self._lock:
+            if self.exceeded is None:
+                self.exceeded = self._over()
+                if self.exceeded:
+                    self._report()
+            if self.exceeded:
+                raise BudgetExceeded(self.exceeded)
+
+    def charge(self, response: Any) -> None:
+        usage = getattr(response, "usage", None)
+        if isinstance(usage, dict):
+            prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt, completion = getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += int(prompt or 0)
+            self.completion_tokens += int(completion or 0)
+            if time.monotonic() - self._reported >= self.report_every_s:
+                self._report()
+
+    def _report(self) -> None:
+        self._reported = time.monotonic()
+        print("[budget]", json.dumps(self._stats(), ensure_ascii=False), flush=True)
+
+    def _stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "max_calls": self.max_calls,
+            "tokens": self.prompt_tokens + self.completion_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "max_tokens": self.max_tokens,
+            "elapsed_s": round(self.elapsed_s(), 1),
+            "max_seconds": self.max_seconds,
+            "exceeded": self.exceeded,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats()
+
+
+class RateLimitedLM(CachedLM):
+    def __init__(self, model: str, limiter: RateLimiter, **kwargs: Any):
+        super().__init__(model=model, **kwargs)
+        self.limiter = limiter
+        self.budget: Optional[CompileBudget] = None
+
+    def forward(self, prompt: Any = None, messages: Any = None, **kwargs: Any):
+        if self.budget is not None:
+            self.budget.check()
+        return super().forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def aforward(self, prompt: Any = None, messages: Any = None, **kwargs: Any):
+        if self.budget is not None:
+            self.budget.check()
+        return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+
+    def _call(self, prompt: Any, messages: Any, kwargs: Dict[str, Any]) -> Any:
+        with self.limiter.slot():
+            response = super()._call(prompt, messages, kwargs)
+        if self.budget is not None:
+            self.budget.charge(response)
+        return response
+
+    async def _acall(self, prompt: Any, messages: Any, kwargs: Dict[str, Any]) -> Any:
+        # 대기(sleep/semaphore)가 이벤트 루프를 막지 않도록 thread에서 획득
+        await asyncio.to_thread(self.limiter.acquire)
+        try:
+            response = await super()._acall(prompt, messages, kwargs)
+        finally:
+            self.limiter.release()
+        if self.budget is not None:
+            self.budget.charge(response)
+        return response
+
+
+def compile_budget(
+    max_calls: Optional[int] = None, max_tokens: Optional[int] = None, max_seconds: Optional[float] = None
+) -> CompileBudget:
+    """요청/CLI 값으로 예산 생성. None이면 설정값(`COMPILE_MAX_LM_CALLS`/`_TOKENS`/`_SECONDS`)."""
+    return CompileBudget(
+        max_calls=SETTINGS.compile_max_lm_calls if max_calls is None else max_calls,
+        max_tokens=SETTINGS.compile_max_tokens if max_tokens is None else max_tokens,
+        max_seconds=SETTINGS.compile_max_seconds if max_seconds is None else max_seconds,
+    )
+
+
+def install_budget(budget: Optional[CompileBudget]) -> Optional[CompileBudget]:
+    """
+    현재 dspy LM(`configure_compile_lm()`으로 설정한 RateLimitedLM)에 예산을 걸고 시작합니다.
+    한도가 없는 예산이면 아무것도 하지 않고 None을 반환합니다.
+    """
+    if budget is None or not budget.limited:
+        return None
+    import dspy
+
+    lm = dspy.settings.lm
+    if not isinstance(lm, RateLimitedLM):
+        raise ValueError("compile budget requires the compile LM (configure_compile_lm)")
+    lm.budget = budget.start()
+    return budget
+
+
+_LIMITER: Optional[RateLimiter] = None
+# configure_compile_lm()으로 설정한 LM 캐시 모드
+_CACHE_MODE = "off"
+
+
+def compile_limiter() -> RateLimiter:
+    """compile LM들이 공유하는 limiter(모듈을 병렬 compile해도 한도는 프로세스 전체 기준)."""
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = RateLimiter(rpm=SETTINGS.compile_lm_rpm, max_concurrency=SETTINGS.compile_lm_max_concurrency)
+    return _LIMITER
+
+
+def configure_compile_lm(
+    model: Optional[str] = None, cache_mode: Optional[str] = None, dspy_cache: bool = True
+) -> RateLimitedLM:
+    """
+    `cache_mode`: off | on | replay | record (기본 `LM_CACHE_MODE`).
+    `dspy_cache=False`면 off 모드에서도 DSPy 자체 캐시(메모리+디스크)를 끔(평가처럼 모든 호출이 실제 호출이어야 할 때).
+    """
+    global _CACHE_MODE
+    mode = (cache_mode or SETTINGS.lm_cache_mode).strip().lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"invalid LM cache mode: {mode}")
+    lm = RateLimitedLM(
+        model=(model or SETTINGS.dspy_model),
+        limiter=compile_limiter(),
+        cache=lm_cache() if mode != "off" else None,
+        cache_mode=mode,
+        dspy_cache=dspy_cache,
+    )
+    ensure_dspy_configured(lm=lm)
+    _CACHE_MODE = mode
+    return lm
+
+
+def compile_lm_stats() -> Dict[str, Any]:
+    """compile 결과에 붙이는 LM 호출 통계(limiter + 캐시)."""
+    stats: Dict[str, Any] = {**compile_limiter().stats(), "cache_mode": _CACHE_MODE}
+    if _CACHE_MODE != "off":
+        stats["cache"] = lm_cache().stats()
+    return stats
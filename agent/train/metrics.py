@@ -0,0 +1,36 @@
+"""compile metric / 오프라인 평가 공용 지표(추천 style_code 목록 vs 라벨)."""
+
+from __future__ import annotations
+
+from typing import Any, List, Sequence
+
+
+def _codes(values: Any) -> List[str]:
+    if not isinstance(values, list):
+        return []
+    return [c for c in values if isinstance(c, str) and c]
+
+
+def hit_rate(pred_codes: Any, label_codes: Any, k: int = 10) -> float:
+    """상위 k개 예측에 라벨이 하나라도 있으면 1.0(hit@k)."""
+    label = _codes(label_codes)
+    pred = _codes(pred_codes)[:k]
+    if not label or not pred:
+        return 0.0
+    return 1.0 if any(c in set(pred) for c in label) else 0.0
+
+
+def reciprocal_rank(pred_codes: Any, label_codes: Any, k: int = 10) -> float:
+    """상위 k개 예측 중 첫 라벨 순위의 역수(MRR@k의 한 예제 값). 없으면 0."""
+    label = set(_codes(label_codes))
+    for rank, code in enumerate(_codes(pred_codes)[:k], start=1):
+        if code in label:
+            return 1.0 / rank
+    return 0.0
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """정렬된 값의 q 분위(최근접 순위). 비어 있으면 0."""
+    if not sorted_values:
+        return 0.0
+    return float(sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)])
@@ -0,0 +1,154 @@
+"""
+학습 데이터셋용 content-addressed 상품 테이블.
+
+ranker/fusion 예제는 상품 후보 목록을 `products_json` 문자열로 통째로 들고 있어 같은 상품이 수백 줄에 반복됩니다.
+compact 형식은 상품을 내용 해시(`product_keys`)로만 참조하고, 상품 본문은 데이터셋과 같은 디렉터리의
+`products.jsonl`에 한 번만 저장합니다.
+
+- 기록: `ProductStore.put(product) -> key` (이미 있는 key는 다시 쓰지 않음). 같은 디렉터리의 데이터셋이 공유하므로
+  append 전용(전체 재빌드에서도 비우지 않음)
+- 읽기: `iter_dataset(path)`는 compact/기존 형식을 모두 받아 `products_json`을 채운 행을 지연 순회.
+  테이블에 없는 key를 참조하면 ValueError
+- compile은 예제를 만들 때 `products_json`을 복원함(dspy.Example 입력은 문자열이어야 해서 호출 시점까지 미룰 수 없음).
+  대신 같은 key 목록의 문자열은 하나만 만들어 예제끼리 공유
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PRODUCT_STORE_NAME = "products.jsonl"
+
+
+def product_store_path(dataset_path: Path) -> Path:
+    """데이터셋이 참조하는 상품 테이블 경로(같은 디렉터리의 데이터셋끼리 공유)."""
+    return dataset_path.with_name(PRODUCT_STORE_NAME)
+
+
+def product_key(product: Dict[str, Any]) -> str:
+    """상품 dict의 내용 해시(키 순서와 무관)."""
+    payload = json.dumps(product, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+
+
+class ProductStore:
+    """
+    `products.jsonl`(한 줄: {"key": ..., "product": {...}}) 기반 상품 테이블.
+
+    - 처음 접근할 때 key -> (offset, length)만 색인하고, 상품 본문은 요청된 key만 읽어 파싱/캐시
+    - 같은 key 목록의 `products_json` 문자열은 한 번만 만들어 예제끼리 공유
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._index: Optional[Dict[str, Tuple[int, int]]] = None
+        self._products: Dict[str, Dict[str, Any]] = {}
+        self._json_cache: Dict[Tuple[str, ...], str] = {}
+        self._writer = None
+
+    def _load_index(self) -> Dict[str, Tuple[int, int]]:
+        if self._index is None:
+            index: Dict[str, Tuple[int, int]] = {}
+            if self.path.exists():
+                with self.path.open("rb") as f:
+                    offset = 0
+                    for raw in f:
+                        if raw.endswith(b"\n"):
+                            try:
+                                key = json.loads(raw).get("key")
+                            except Exception:
+                                key = None
+                            if isinstance(key, str) and key:
+                                index.setdefault(key, (offset, len(raw)))
+                        offset += len(raw)
+            self._index = index
+        return self._index
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._load_index())
+
+    def put(self, product: Dict[str, Any]) -> str:
+        key = product_key(product)
+        index = self._load_index()
+        if key in index:
+            return key
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = self.path.open("ab")
+        line = (json.dumps({"key": key, "product": product}, ensure_ascii=False) + "\n").encode("utf-8")
+        index[key] = (self._writer.tell(), len(line))
+        self._writer.write(line)
+        self._products[key] = product
+        return key
+
+    def put_many(self, products: List[Any]) -> List[str]:
+        return [self.put(p) for p in products if isinstance(p, dict)]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        product = self._products.get(key)
+        if product is not None:
+            return product
+        loc = self._load_index().get(key)
+        if loc is None:
+            return None
+        self.flush()
+        with self.path.open("rb") as f:
+            f.seek(loc[0])
+            raw = f.read(loc[1])
+        try:
+            product = json.loads(raw).get("product")
+        except Exception:
+            return None
+        if isinstance(product, dict):
+            self._products[key] = product
+            return product
+        return None
+
+    def products_json(self, keys: List[str]) -> str:
+        """key 목록을 원래 `products_json` 문자열로 복원. 테이블에 없는 key가 있으면 ValueError."""
+        cache_key = tuple(keys)
+        cached = self._json_cache.get(cache_key)
+        if cached is None:
+            products = [self.get(k) for k in keys]
+            missing = [k for k, p in zip(keys, products) if p is None]
+            if missing:
+                raise ValueError(f"{len(missing)} product keys not found in {self.path} (e.g. {missing[0]})")
+            cached = json.dumps(products, ensure_ascii=False)
+            self._json_cache[cache_key] = cached
+        return cached
+
+    def flush(self) -> None:
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def iter_dataset(path: Path, store: Optional[ProductStore] = None) -> Iterator[Dict[str, Any]]:
+    """
+    데이터셋 jsonl을 한 줄씩 읽어, compact 행(`product_keys`)은 `products_json`을 복원해 반환합니다.
+    기존 형식(`products_json` 포함) 행은 그대로 반환합니다.
+    """
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            keys = row.get("product_keys")
+            if "products_json" not in row and isinstance(keys, list):
+                if store is None:
+                    store = ProductStore(product_store_path(path))
+                row["products_json"] = store.products_json([k for k in keys if isinstance(k, str)])
+            yield row
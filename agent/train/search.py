@@ -0,0 +1,67 @@
+"""
+예산(`CompileBudget`)이 걸린 full compile용 random search.
+
+DSPy optimizer는 후보를 모두 평가한 뒤에야 최선 프로그램을 돌려주므로 도중에 멈추면 결과가 없습니다.
+여기서는 BootstrapFewShotWithRandomSearch와 같은 순서(zero-shot → labeled few-shot → bootstrap →
+shuffle+demo 수 무작위 bootstrap)로 후보를 하나씩 만들고 평가해, 예산이 떨어지면 그때까지의 최선을 반환합니다.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import dspy
+
+from .compile import module_metric
+from .evaluate import mean_hit_rate
+from .lm import BudgetExceeded
+
+
+def _candidate(
+    module: str, student: dspy.Module, trainset: List[dspy.Example], seed: int, max_demos: int
+) -> dspy.Module:
+    if seed == -3:
+        return student.reset_copy()
+    if seed == -2:
+        return dspy.teleprompt.LabeledFewShot(k=max_demos).compile(student.reset_copy(), trainset=trainset)
+    train, size = list(trainset), max_demos
+    if seed >= 0:
+        rng = random.Random(seed)
+        rng.shuffle(train)
+        size = rng.randint(1, max_demos)
+    optimizer = dspy.teleprompt.BootstrapFewShot(
+        metric=module_metric(module), max_bootstrapped_demos=size, max_labeled_demos=max_demos
+    )
+    return optimizer.compile(student.reset_copy(), trainset=train)
+
+
+def budgeted_random_search(
+    module: str,
+    student: dspy.Module,
+    trainset: List[dspy.Example],
+    num_candidates: int = 8,
+    max_demos: int = 6,
+    num_threads: Optional[int] = None,
+) -> Tuple[dspy.Module, Dict[str, Any]]:
+    """후보를 차례로 평가(trainset hit@k)하고 (최선 프로그램, 탐색 요약)을 반환합니다."""
+    total = num_candidates + 3
+    best: Optional[dspy.Module] = None
+    best_score = -1.0
+    trials: List[Dict[str, Any]] = []
+    stopped_by = None
+    try:
+        for i, seed in enumerate(range(-3, num_candidates), start=1):
+            candidate = _candidate(module, student, trainset, seed, max_demos)
+            score = mean_hit_rate(module, candidate, trainset, num_threads=num_threads)
+            trials.append({"seed": seed, "score": score})
+            if score > best_score:
+                best, best_score = candidate, score
+            print(f"Trial {i}/{total}: score={score} best={best_score}", flush=True)
+    except BudgetExceeded as e:
+        stopped_by = str(e)
+        print(f"[compile] budget exhausted ({stopped_by}), keeping best of {len(trials)} candidates", flush=True)
+
+    if best is None:
+        raise RuntimeError(f"compile budget exhausted ({stopped_by}) before any candidate was evaluated")
+    return best, {"candidates": total, "evaluated": len(trials), "best_score": best_score, "stopped_by": stopped_by}
@@ -0,0 +1,106 @@
+"""
+SSE 인코더 마이크로 벤치마크.
+
+실행:
+  python -m agent.utils.bench_sse [--n 20000]
+
+기존 `SseEvent.encode`(dict 생성 + stdlib json.dumps) 대비 `SseEncoder`의
+token/final 프레임 인코딩 처리량(frames/s, MB/s)을 출력합니다.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List
+
+from .sse import SseEncoder, SseEvent, orjson
+
+
+SESSION_ID = "sess-3f2a9c1e-bench"
+MESSAGE_ID = "6b1f4d2e-8a7c-4e0b-9d3f-2c5a1e7b9f00"
+DELTAS = [
+    "겨울 아우터로는 ",
+    "보온성이 좋은 구스다운 패딩을 추천드려요. ",
+    'Lightweight "puffer" jacket\n',
+    "가격대는 15~25만원 선입니다.",
+]
+
+
+def _final_payload() -> dict:
+    products = [
+        {
+            "style_code": f"SC{i:05d}",
+            "brand": "브랜드A",
+            "category": "아우터",
+            "subcategory": "패딩",
+            "product_name": f"경량 구스다운 패딩 {i}",
+            "material": "나일론 100%, 충전재 구스다운 80/20",
+            "price": 189000 + i * 1000,
+            "url": f"https://example.com/products/SC{i:05d}",
+        }
+        for i in range(30)
+    ]
+    return {
+        "elapsed_ms": 8123,
+        "recommended_products": products,
+        "grouped_recommended_products": {"아우터": products},
+        "recommended_style_codes": [p["style_code"] for p in products],
+        "degradations": [],
+    }
+
+
+def _measure(name: str, fn: Callable[[int], bytes], n: int) -> dict:
+    total = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        total += len(fn(i))
+    dt = time.perf_counter() - t0
+    return {"name": name, "fps": n / dt if dt else 0.0, "mbps": total / dt / 1e6 if dt else 0.0}
+
+
+def run(n: int) -> List[dict]:
+    enc = SseEncoder(SESSION_ID, MESSAGE_ID)
+    final = _final_payload()
+    nd = len(DELTAS)
+
+    def legacy_token(i: int) -> bytes:
+        return SseEvent(
+            event="token",
+            data={"session_id": SESSION_ID, "message_id": MESSAGE_ID, "delta": DELTAS[i % nd]},
+            id=MESSAGE_ID,
+        ).encode()
+
+    def legacy_final(i: int) -> bytes:
+        return SseEvent(
+            event="final",
+            data={"session_id": SESSION_ID, "message_id": MESSAGE_ID, **final},
+            id=MESSAGE_ID,
+        ).encode()
+
+    final_n = max(n // 20, 1)
+    return [
+        _measure("token  SseEvent.encode", legacy_token, n),
+        _measure("token  SseEncoder.token", lambda i: enc.token(DELTAS[i % nd]), n),
+        _measure("final  SseEvent.encode", legacy_final, final_n),
+        _measure("final  SseEncoder.event", lambda i: enc.event("final", final), final_n),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE encoder micro-benchmark")
+    parser.add_argument("--n", type=int, default=20000, help="token 프레임 반복 수(final은 n/20)")
+    args = parser.parse_args()
+
+    print(f"json backend: {'orjson' if orjson is not None else 'stdlib json'}")
+    rows = run(args.n)
+    for r in rows:
+        print(f"{r['name']:<26} {r['fps']:>12,.0f} frames/s {r['mbps']:>8.1f} MB/s")
+    for i in range(0, len(rows), 2):
+        base, new = rows[i], rows[i + 1]
+        if base["fps"]:
+            print(f"{new['name'].split()[0]} speedup: x{new['fps'] / base['fps']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import time
+from contextlib import suppress
 from dataclasses import dataclass
-from typing import Any, AsyncIterator, Dict, Optional
+from json.encoder import encode_basestring
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 미설치 환경은 stdlib json으로 동작
+    orjson = None  # type: ignore[assignment]
 
 
 @dataclass(frozen=True)
@@ -22,6 +31,46 @@ class SseEvent:
         return ("\n".join(lines) + "\n\n").encode("utf-8")
 
 
+def dumps_json(data: Any) -> bytes:
+    """UTF-8 JSON bytes. orjson이 있으면 사용하고, 직렬화할 수 없는 값이면 stdlib json(default=str)으로 폴백."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+class SseEncoder:
+    """
+    요청(session_id/message_id)에 바인딩된 SSE 프레임 인코더.
+
+    - `id:` 줄과 `{"session_id":..,"message_id":..` 접두사는 생성 시 한 번만 렌더링
+    - token 프레임은 delta 문자열만 escape해서 붙임(dict 생성/json.dumps 없음)
+    - 그 외 이벤트(final의 상품 payload 등)는 `dumps_json`(orjson)으로 직렬화
+    - `with_id=False`면 `id:` 줄을 생략(이벤트별 id를 붙이는 쪽, 예: replay 버퍼가 따로 붙임)
+    """
+
+    def __init__(self, session_id: str, message_id: str, with_id: bool = True):
+        base = dumps_json({"session_id": session_id, "message_id": message_id})
+        self._base = base[:-1]  # 닫는 "}" 제외
+        self._id_line = f"id: {message_id}\n".encode("utf-8") if message_id and with_id else b""
+        self._token_prefix = self._id_line + b"event: token\ndata: " + self._base + b',"delta":'
+
+    def token(self, delta: str) -> bytes:
+        return self._token_prefix + encode_basestring(delta).encode("utf-8") + b"}\n\n"
+
+    def event(self, event: str, data: Optional[Dict[str, Any]] = None) -> bytes:
+        """`data`에 session_id/message_id를 자동으로 포함한 이벤트 프레임."""
+        body = self._base
+        if data:
+            payload = dumps_json(data)
+            body += b"," + payload[1:] if payload != b"{}" else b"}"
+        else:
+            body += b"}"
+        return self._id_line + b"event: " + event.encode("utf-8") + b"\ndata: " + body + b"\n\n"
+
+
 def merge_updates(state: Dict[str, Any], update: Dict[str, Any]) -> None:
     for k, v in update.items():
         state[k] = v
@@ -34,3 +83,173 @@ async def chunk_text(text: str, chunk_chars: int) -> AsyncIterator[str]:
     for i in range(0, len(text), step):
         yield text[i : i + step]
 
+
+class TokenCoalescer:
+    """
+    LLM delta를 모아 SSE token 프레임 단위로 내보내는 coalescer.
+
+    - 첫 delta는 즉시 flush(첫 토큰 지연 최소화)
+    - 이후에는 누적 바이트가 목표치에 도달하거나, 첫 미전송 delta 이후 `max_latency_ms`가 지나면 flush
+    - 목표 바이트는 클라이언트 소비 속도에 적응: 구독 연결의 프레임 전송 시간(`observe_send`)이 길면 키우고, 빠르면 줄임.
+      턴은 연결과 분리된 task라 coalescer 쪽 yield는 바로 돌아오므로, 전송 시간은 replay 버퍼 구독자가 알려 줌
+    """
+
+    def __init__(self, max_latency_ms: int, flush_bytes: int, max_bytes: Optional[int] = None):
+        self.max_latency = max(max_latency_ms, 0) / 1000.0
+        self.min_bytes = max(flush_bytes, 1)
+        self.max_bytes = max(max_bytes or self.min_bytes * 16, self.min_bytes)
+        self.target_bytes = self.min_bytes
+        self._parts: List[str] = []
+        self._size = 0
+        self._first_at: Optional[float] = None
+        self.frames = 0
+        self.bytes = 0
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._parts)
+
+    def push(self, text: str, now: float) -> Optional[str]:
+        if not text:
+            return None
+        self._parts.append(text)
+        self._size += len(text.encode("utf-8"))
+        if self._first_at is None:
+            self._first_at = now
+        if self.frames == 0 or self._size >= self.target_bytes or self.timeout(now) == 0:
+            return self.flush()
+        return None
+
+    def timeout(self, now: float) -> Optional[float]:
+        """다음 시간 기반 flush까지 남은 초. 보낼 것이 없으면 None."""
+        if self._first_at is None:
+            return None
+        return max(self.max_latency - (now - self._first_at), 0.0)
+
+    def flush(self) -> str:
+        text = "".join(self._parts)
+        if text:
+            self.frames += 1
+            self.bytes += self._size
+        self._parts = []
+        self._size = 0
+        self._first_at = None
+        return text
+
+    def observe_send(self, seconds: float) -> None:
+        # 다운스트림이 느리면(backpressure) 프레임을 키워 프레임 수를 줄이고, 빠르면 다시 작게
+        if seconds > self.max_latency / 2:
+            self.target_bytes = min(self.target_bytes * 2, self.max_bytes)
+        elif seconds < 0.001:
+            self.target_bytes = max(self.target_bytes // 2, self.min_bytes)
+
+
+async def coalesce_deltas(deltas: AsyncIterator[str], coalescer: TokenCoalescer) -> AsyncIterator[str]:
+    """
+    `deltas`를 coalescer 규칙으로 묶어 내보냅니다. sleep 없이, 다음 delta 대기에만 타임아웃을 겁니다.
+
+    다음 delta를 기다리는 future는 타임아웃으로 취소하지 않고 유지하므로(asyncio.wait),
+    하위 스트림(예: Bedrock 읽기)이 중간에 끊기지 않습니다.
+    """
+    it = deltas.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=coalescer.timeout(time.monotonic()))
+            if not done:
+                out = coalescer.flush()
+            else:
+                fut, pending = pending, None
+                try:
+                    delta = fut.result()
+                except StopAsyncIteration:
+                    break
+                out = coalescer.push(delta, time.monotonic())
+            if out:
+                yield out
+        if coalescer.pending:
+            yield coalescer.flush()
+    finally:
+        if pending is not None:
+            pending.cancel()
+            with suppress(BaseException):
+                await pending
+        aclose = getattr(it, "aclose", None)
+        if aclose is not None:
+            with suppress(Exception):
+                await aclose()
+
+
+# 클라이언트가 끊긴 뒤 취소된 producer task가 정리(finally: 로그 기록 등)를 마칠 때까지 참조를 유지
+_ORPHANED_TASKS: Set[asyncio.Task] = set()
+
+
+async def _pump(frames: AsyncIterator[bytes], queue: "asyncio.Queue[Optional[bytes]]") -> None:
+    try:
+        async for frame in frames:
+            await queue.put(frame)
+    finally:
+        aclose = getattr(frames, "aclose", None)
+        if aclose is not None:
+            with suppress(Exception):
+                await aclose()
+        # 정상 종료면 consumer가 비워 주므로 자리가 나고, 취소된 경우엔 대기 중 프레임을 버리고 종료 신호를 넣음
+        while True:
+            try:
+                queue.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                queue.get_nowait()
+
+
+async def cancel_on_disconnect(
+    frames: AsyncIterator[bytes],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_ms: int,
+    on_disconnect: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    `frames`를 별도 task(producer)에서 실행하고, 클라이언트 연결이 끊기면 그 task를 취소합니다.
+
+    - `is_disconnected`(예: `Request.is_disconnected`)를 `poll_ms`마다 확인
+    - 응답 전송 쪽이 먼저 닫혀도(서버가 generator를 close/cancel) producer를 취소
+    - queue 크기를 1로 두어 전송 backpressure가 `frames`(채팅에서는 replay 버퍼 구독자)까지 그대로 전달됨.
+      턴 자체는 버퍼에 적재만 하므로 막히지 않고, 구독자가 측정한 전송 시간으로 coalescer가 적응함
+    """
+    queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=1)
+    producer = asyncio.create_task(_pump(frames, queue))
+
+    async def _watch() -> None:
+        interval = max(poll_ms, 10) / 1000.0
+        while not producer.done():
+            await asyncio.sleep(interval)
+            if producer.done():
+                return
+            try:
+                gone = await is_disconnected()
+            except Exception:
+                gone = False
+            if gone:
+                if on_disconnect is not None:
+                    on_disconnect()
+                producer.cancel()
+                return
+
+    watcher = asyncio.create_task(_watch())
+    try:
+        while True:
+            frame = await queue.get()
+            if frame is None:
+                break
+            yield frame
+    finally:
+        watcher.cancel()
+        if not producer.done():
+            if on_disconnect is not None:
+                on_disconnect()
+            producer.cancel()
+            # 여기서 await하면 서버의 cancel scope에 다시 걸릴 수 있으므로 정리는 백그라운드로 둠
+            _ORPHANED_TASKS.add(producer)
+            producer.add_done_callback(_ORPHANED_TASKS.discard)
@@ -171,7 +171,7 @@ export default function AdminPage() {
         const r = await jget(`/api/admin/jobs/${job.job_id}`);
         if (!alive) return;
         setJob(r);
-        if (r.status === "done" || r.status === "error") {
+        if (r.status === "done" || r.status === "error" || r.status === "cancelled") {
           refreshLogs().catch(() => {});
           return;
         }
@@ -0,0 +1,31 @@
+import pytest
+
+dspy = pytest.importorskip("dspy")
+from dspy.utils.dummies import DummyLM  # noqa: E402
+
+from agent.train import incremental  # noqa: E402
+
+
+class _QA(dspy.Module):
+    def __init__(self):
+        super().__init__()
+        self.predict = dspy.Predict("question -> answer")
+
+    def forward(self, question):
+        return self.predict(question=question)
+
+
+def test_bootstrap_round_accepts_previous_round_candidate(monkeypatch):
+    # 앞 round에서 개선된 후보(_compiled=True)가 다음 round의 teacher가 되어도 실패하지 않아야 함
+    monkeypatch.setattr(incremental, "module_metric", lambda module: lambda example, pred, trace=None: 1.0)
+    trainset = [dspy.Example(question=f"q{i}", answer="a").with_inputs("question") for i in range(6)]
+
+    with dspy.context(lm=DummyLM([{"answer": "a"}] * 100)):
+        best = _QA()
+        for seed in (1, 2, 3):
+            best = incremental._bootstrap_round("qa", best, trainset, seed=seed)
+            assert best._compiled
+
+    demos = best.predict.demos
+    assert 0 < len(demos) <= incremental._MAX_DEMOS
+    assert len({incremental.example_key(d) for d in demos}) == len(demos)
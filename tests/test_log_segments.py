@@ -0,0 +1,53 @@
+import json
+
+from agent.core.log_segments import LogRotator, SegmentedLog
+
+
+def _write(path, start, end):
+    with path.open("a", encoding="utf-8") as f:
+        for i in range(start, end):
+            f.write(json.dumps({"i": i}) + "\n")
+
+
+def _ids(lines):
+    return [json.loads(raw)["i"] for _, raw in lines]
+
+
+def _setup(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    rotator = LogRotator(
+        max_bytes=0, max_age_s=0, block_bytes=4096, level=1, retention_days=0, retention_bytes=0
+    )
+    _write(path, 0, 50)
+    rotator.finish(path, rotator.rotate(path))  # 압축 세그먼트
+    _write(path, 50, 100)
+    rotator.rotate(path)  # 압축 전 세그먼트
+    _write(path, 100, 150)
+    return path, rotator, SegmentedLog(path)
+
+
+def test_iter_lines_survives_rotation_mid_scan(tmp_path):
+    path, rotator, log = _setup(tmp_path)
+    it = log.iter_lines(0)
+    lines = [next(it) for _ in range(10)]
+    rotator.rotate(path)
+    _write(path, 150, 160)
+    lines += list(it)
+
+    assert _ids(lines) == list(range(150))
+    for offset, raw in lines:
+        assert log.read_at(offset, len(raw) + 1)[:-1] == raw
+    assert _ids(log.iter_lines(0)) == list(range(160))
+
+
+def test_iter_lines_reverse_survives_rotation_mid_scan(tmp_path):
+    path, rotator, log = _setup(tmp_path)
+    it = log.iter_lines_reverse()
+    lines = [next(it) for _ in range(3)]
+    rotator.rotate(path)
+    _write(path, 150, 160)
+    lines += list(it)
+
+    assert _ids(lines) == list(range(149, -1, -1))
+    for offset, raw in lines:
+        assert log.read_at(offset, len(raw) + 1)[:-1] == raw